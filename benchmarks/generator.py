@@ -0,0 +1,54 @@
+"""
+Synthetic logger data for benchmarks and golden checks.
+
+Readings follow a daily temperature cycle (warmest mid-afternoon) with a slow
+seasonal drift, and relative humidity that moves against temperature plus a
+multi-week damp/dry cycle. Gaps drop runs of readings the way a logger with a
+flat battery does. Everything is generated with NumPy from a seeded RNG, so
+the same arguments always give the same data and 10M rows take seconds.
+"""
+import numpy as np
+import pandas as pd
+
+#column names as different logger vendors export them
+HEADERS = {
+    'standard': ('Timestamp', 'Temperature', 'Humidity'),
+    'vendor_local': ('Local Date/Time', 'Temperature (°C)', 'RH (%)'),
+    'vendor_utc': ('UTC Date/Time', 'Temp(°C)', 'Relative Humidity (%)'),
+    'short': ('time', 'temp', 'rh'),
+}
+
+
+"""
+DataFrame of `rows` readings every `interval_minutes`, with timestamps as text like a CSV export.
+`gap_rate` is the chance that a reading is followed by a gap of `gap_length` missing readings.
+"""
+def generate_readings(rows, interval_minutes=10, gap_rate=0.0, gap_length=36, seed=0,
+                      header='standard', start='2024-01-01'):
+    rng = np.random.default_rng(seed)
+    steps = np.ones(rows, dtype=np.int64)
+    if gap_rate:
+        steps[rng.random(rows) < gap_rate] += gap_length
+    steps[0] = 0
+    minutes = np.cumsum(steps) * interval_minutes
+    times = np.datetime64(start, 'm') + minutes.astype('timedelta64[m]')
+
+    hours = minutes / 60.0
+    day_phase = 2 * np.pi * ((hours % 24) - 9) / 24
+    days = hours / 24
+    temperature = (17 + 4 * np.sin(day_phase) + 3 * np.sin(2 * np.pi * days / 365)
+                   + rng.normal(0, 0.5, rows))
+    humidity = (80 - 1.5 * (temperature - 17) + 8 * np.sin(2 * np.pi * days / 30)
+                + rng.normal(0, 2, rows))
+
+    timestamp_col, temperature_col, humidity_col = HEADERS[header]
+    return pd.DataFrame({
+        timestamp_col: np.char.replace(np.datetime_as_string(times, unit='m'), 'T', ' '),
+        temperature_col: temperature.round(1),
+        humidity_col: np.clip(humidity, 0, 100).round(1),
+    })
+
+
+"""The generated readings as CSV bytes"""
+def generate_csv(rows, **kwargs):
+    return generate_readings(rows, **kwargs).to_csv(index=False).encode()
@@ -0,0 +1,107 @@
+"""
+Golden outputs for the mould index.
+
+golden.json holds the final index and timeframe of a few generated datasets as
+computed by the reference (iterrows) engine. `check_golden` runs every other
+way of computing the index on the same data and reports any result that is
+more than TOLERANCE percentage points away, so a faster engine can't quietly
+change the numbers.
+"""
+import json
+import os
+import tempfile
+
+from mould_calculator.ingest import analyse_file, read_standardized, stream_analysis
+from mould_calculator.rollups import reading_frame
+from mould_calculator.sidecar import write_sidecar
+from mould_calculator.state import MouldIndexState
+from mould_calculator.utils import analyse_dataframe, process_mold_index, process_sensors, standardize_dataframe
+
+from .generator import generate_readings
+
+GOLDEN_PATH = os.path.join(os.path.dirname(__file__), 'golden.json')
+TOLERANCE = 1e-6
+#the reference engine is only re-run on cases up to this size
+REFERENCE_MAX_ROWS = 5000
+
+GOLDEN_CASES = {
+    'hourly_standard': {'readings': {'rows': 2000, 'interval_minutes': 60}},
+    'ten_minute_gaps': {'readings': {'rows': 5000, 'interval_minutes': 10, 'gap_rate': 0.002,
+                                     'header': 'vendor_local', 'seed': 1}},
+    'minute_short_header': {'readings': {'rows': 20000, 'interval_minutes': 1, 'header': 'short', 'seed': 2}},
+    'hourly_window_7d': {'readings': {'rows': 3000, 'interval_minutes': 60, 'header': 'vendor_utc', 'seed': 3},
+                         'rolling_window': 7},
+}
+
+
+def _csv(df, directory):
+    path = os.path.join(directory, 'readings.csv')
+    df.to_csv(path, index=False)
+    return path
+
+
+def _sidecar(df, rolling_window, directory):
+    path = _csv(df, directory)
+    write_sidecar(path, read_standardized(path))
+    return analyse_file(path, rolling_window)['mould_index']
+
+
+def _matrix(df, rolling_window, directory):
+    return process_sensors(df.assign(sensor_id='golden'), rolling_window, with_series=False)['golden']['mould_index']
+
+
+#every way of computing the final index: name -> fn(raw frame, rolling_window, scratch directory)
+ENGINES = {
+    'reference': lambda df, rw, d: process_mold_index(df, rw, engine='reference')[0],
+    'vectorized': lambda df, rw, d: process_mold_index(df, rw)[0],
+    'analyse_dataframe': lambda df, rw, d: analyse_dataframe(df, rw)['mould_index'],
+    'streaming': lambda df, rw, d: stream_analysis(_csv(df, d), rw, chunksize=997)['mould_index'],
+    'sidecar': _sidecar,
+    'state': lambda df, rw, d: MouldIndexState.from_frame(df, rw)[0].mould_index,
+    'matrix': _matrix,
+    'rollups': lambda df, rw, d: reading_frame(standardize_dataframe(df), rw)['M'].iloc[-1] / 6 * 100,
+}
+
+
+def load_golden(path=GOLDEN_PATH):
+    with open(path) as f:
+        return json.load(f)
+
+
+"""Compute golden.json from the reference engine"""
+def write_golden(path=GOLDEN_PATH):
+    golden = {}
+    for name, case in GOLDEN_CASES.items():
+        mould_index, _, used_timeframe, _ = process_mold_index(
+            generate_readings(**case['readings']), case.get('rolling_window'), engine='reference'
+        )
+        golden[name] = {'mould_index': mould_index, 'used_timeframe': used_timeframe}
+    with open(path, 'w') as f:
+        json.dump(golden, f, indent=2)
+        f.write('\n')
+    return golden
+
+
+"""Run the engines on the golden cases; returns a list of failure messages (empty when all match)"""
+def check_golden(golden=None, cases=None, engines=None):
+    golden = golden or load_golden()
+    failures = []
+    for name in cases or GOLDEN_CASES:
+        case = GOLDEN_CASES[name]
+        expected = golden[name]
+        rolling_window = case.get('rolling_window')
+        for engine in engines or ENGINES:
+            if engine == 'reference' and case['readings']['rows'] > REFERENCE_MAX_ROWS:
+                continue
+            with tempfile.TemporaryDirectory() as directory:
+                try:
+                    mould_index = ENGINES[engine](generate_readings(**case['readings']), rolling_window, directory)
+                except Exception as e:
+                    failures.append(f"{name}/{engine}: {type(e).__name__}: {e}")
+                    continue
+            if mould_index is None or abs(mould_index - expected['mould_index']) > TOLERANCE:
+                failures.append(f"{name}/{engine}: {mould_index} != golden {expected['mould_index']}")
+        _, _, used_timeframe, _ = process_mold_index(generate_readings(**case['readings']), rolling_window)
+        if used_timeframe != expected['used_timeframe']:
+            failures.append(f"{name}: timeframe {used_timeframe!r} != golden {expected['used_timeframe']!r}")
+    return failures
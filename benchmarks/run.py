@@ -0,0 +1,257 @@
+"""
+Benchmarks for the mould index pipeline.
+
+    python -m benchmarks.run                                   # 1k and 100k rows, print a table
+    python -m benchmarks.run --sizes 1000,1000000 --output benchmarks/baseline.json
+    python -m benchmarks.run --compare benchmarks/baseline.json --threshold 0.25
+    python -m benchmarks.run --golden                          # check every engine against golden.json
+    python -m benchmarks.run --write-golden                    # recompute golden.json (reference engine)
+
+Each case is timed --repeat times (the best run counts) and run once more
+under tracemalloc for its peak memory. The view cases post the generated CSV
+to the upload page and then load the result page with a cold result cache,
+against a throwaway test database, so DATABASE_URL must be set as for the
+test suite. --compare exits with status 1 when a case is slower or uses more
+memory than the baseline by more than the threshold.
+"""
+import argparse
+import gc
+import gzip
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mould_risk_calculator.settings')
+
+import django  # noqa: E402
+
+django.setup()
+
+import numpy as np  # noqa: E402
+import pandas as pd  # noqa: E402
+from django.core.files.uploadedfile import SimpleUploadedFile  # noqa: E402
+from django.db import connection  # noqa: E402
+from django.test import Client  # noqa: E402
+from django.test.utils import override_settings, setup_test_environment  # noqa: E402
+
+from mould_calculator.cache import get_result_cache  # noqa: E402
+from mould_calculator.ingest import read_standardized  # noqa: E402
+from mould_calculator.resample import Resampling  # noqa: E402
+from mould_calculator.utils import compute_mould_result, mould_score, process_mold_index, standardize_dataframe  # noqa: E402
+
+from .generator import generate_csv, generate_readings  # noqa: E402
+from .golden import check_golden, write_golden  # noqa: E402
+
+DEFAULT_SIZES = (1000, 100_000)
+#changes smaller than this are noise, whatever the ratio
+MIN_SECONDS = 0.005
+MIN_PEAK_MB = 1.0
+
+
+class ViewHarness:
+    """Test database, scratch media/cache directories and a client for the view cases"""
+    def __enter__(self):
+        setup_test_environment()
+        self.old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 64 * 1024 * 1024,
+            },
+        )
+        self.settings.enable()
+        self.client = Client()
+        return self
+
+    def __exit__(self, *exc):
+        self.settings.disable()
+        self.tmp.cleanup()
+        connection.creation.destroy_test_db(self.old_name, verbosity=0)
+
+    def upload(self, csv):
+        response = self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('bench.csv', csv, content_type='text/csv'),
+        })
+        assert response.status_code == 302, f"upload failed with status {response.status_code}"
+
+    def result(self):
+        get_result_cache().clear()
+        response = self.client.get('/result/')
+        assert response.status_code == 200, f"result page failed with status {response.status_code}"
+
+
+"""
+Score a CSV with `python -m mould_calculator` in a fresh interpreter: the cold start a cron job
+or gateway pays per file. Runs without Django settings so nothing can lean on them.
+"""
+def cli_cold_start(path):
+    env = {key: value for key, value in os.environ.items() if key not in ('DJANGO_SETTINGS_MODULE', 'DATABASE_URL')}
+    env['PYTHONPATH'] = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    subprocess.run([sys.executable, '-m', 'mould_calculator', path], check=True, env=env, stdout=subprocess.DEVNULL)
+
+
+"""The benchmark cases for one dataset size: name -> (setup() -> argument, run(argument))"""
+def build_cases(rows, harness, scratch):
+    frame = generate_readings(rows)
+    csv = generate_csv(rows)
+    csv_path = os.path.join(scratch, f'readings-{rows}.csv')
+    with open(csv_path, 'wb') as f:
+        f.write(csv)
+    gzip_path = os.path.join(scratch, f'readings-{rows}.csv.gz')
+    with gzip.open(gzip_path, 'wb', compresslevel=6) as f:
+        f.write(csv)
+    standardized = standardize_dataframe(frame.copy())
+    mould_index = process_mold_index(frame.copy())[0]
+
+    cases = {
+        'standardize_dataframe': (frame.copy, standardize_dataframe),
+        'process_mold_index': (frame.copy, process_mold_index),
+        'mould_score': (frame.copy, lambda data: mould_score(mould_index, data)),
+        'process_mold_index_standardized': (lambda: standardized, process_mold_index),
+        'compute_mould_result_score': (lambda: standardized, lambda data: mould_score(compute_mould_result(data))),
+        #wall time of a whole process; its memory isn't visible to tracemalloc here
+        'cli_cold_start': (lambda: csv_path, cli_cold_start),
+        #decompressing while parsing should cost little next to the parsing itself
+        'read_standardized': (lambda: csv_path, read_standardized),
+        'read_standardized_gzip': (lambda: gzip_path, read_standardized),
+        'process_mold_index_resampled_60min': (lambda: standardized,
+                                               lambda data: process_mold_index(data, resampling=Resampling(60))),
+    }
+    if harness is not None:
+        cases['upload_view'] = (lambda: csv, harness.upload)
+        cases['result_view'] = (lambda: harness.upload(csv), lambda _: harness.result())
+    return cases
+
+
+def measure(setup, run, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        argument = setup()
+        gc.collect()
+        start = time.perf_counter()
+        run(argument)
+        best = min(best, time.perf_counter() - start)
+
+    argument = setup()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        run(argument)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return {'seconds': best, 'peak_mb': peak / (1024 * 1024)}
+
+
+def run_benchmarks(sizes, repeat, views=True, only=None):
+    results = {}
+    harness = ViewHarness() if views else None
+    if harness is not None:
+        harness.__enter__()
+    scratch = tempfile.TemporaryDirectory()
+    try:
+        for rows in sizes:
+            for name, (setup, run) in build_cases(rows, harness, scratch.name).items():
+                if only and name not in only:
+                    continue
+                result = measure(setup, run, repeat)
+                results[f'{name}[{rows}]'] = dict(result, case=name, rows=rows)
+                print(f"{name:<34}{rows:>10}  {result['seconds']:>9.4f}s  {result['peak_mb']:>9.1f} MB", flush=True)
+    finally:
+        scratch.cleanup()
+        if harness is not None:
+            harness.__exit__(None, None, None)
+    return results
+
+
+def environment():
+    return {
+        'created': datetime.now(timezone.utc).isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pandas': pd.__version__,
+        'django': django.get_version(),
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'cpus': os.cpu_count(),
+    }
+
+
+"""Regression messages for results that are slower or bigger than the baseline by more than `threshold`"""
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        before = baseline.get(key)
+        if before is None:
+            continue
+        for metric, floor in (('seconds', MIN_SECONDS), ('peak_mb', MIN_PEAK_MB)):
+            old, new = before[metric], result[metric]
+            if new > old * (1 + threshold) and new - old > floor:
+                regressions.append(f"{key} {metric}: {old:.4f} -> {new:.4f} (+{(new / old - 1) * 100:.0f}%)")
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the mould index pipeline")
+    parser.add_argument('--sizes', help="Comma-separated row counts (default: 1000,100000, or the baseline's)")
+    parser.add_argument('--repeat', type=int, default=3, help="Timed runs per case; the best one counts")
+    parser.add_argument('--cases', help="Comma-separated case names to run (default: all)")
+    parser.add_argument('--no-views', action='store_true', help="Skip the upload/result view cases")
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', metavar='BASELINE', help="Compare with a results file; exit 1 on regressions")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Allowed slowdown/growth ratio for --compare")
+    parser.add_argument('--golden', action='store_true', help="Check every engine against golden.json")
+    parser.add_argument('--write-golden', action='store_true', help="Recompute golden.json with the reference engine")
+    options = parser.parse_args(argv)
+
+    if options.write_golden:
+        for name, expected in write_golden().items():
+            print(f"{name:<24}{expected['mould_index']:.9f}  {expected['used_timeframe']}")
+        return 0
+    if options.golden:
+        failures = check_golden()
+        for failure in failures:
+            print(failure)
+        print("golden outputs match" if not failures else f"{len(failures)} golden mismatches")
+        return 1 if failures else 0
+
+    baseline = None
+    if options.compare:
+        with open(options.compare) as f:
+            baseline = json.load(f)
+    if options.sizes:
+        sizes = [int(size) for size in options.sizes.split(',')]
+    elif baseline is not None:
+        sizes = sorted({result['rows'] for result in baseline['results'].values()})
+    else:
+        sizes = list(DEFAULT_SIZES)
+    only = set(options.cases.split(',')) if options.cases else None
+
+    results = run_benchmarks(sizes, options.repeat, views=not options.no_views, only=only)
+    if options.output:
+        with open(options.output, 'w') as f:
+            json.dump({'environment': environment(), 'results': results}, f, indent=2)
+            f.write('\n')
+
+    if baseline is not None:
+        regressions = compare(results, baseline['results'], options.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if regressions:
+            return 1
+        print(f"no regressions beyond {options.threshold:.0%}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
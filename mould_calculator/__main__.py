@@ -0,0 +1,97 @@
+"""
+Score logger CSVs from the command line, without Django or a database:
+
+    python -m mould_calculator readings.csv more.csv          # JSON array, one summary per input (even for one)
+    cat readings.csv | python -m mould_calculator --format csv
+    python -m mould_calculator --format jsonl --resample 10 /data/*.csv
+
+`-` (or no file at all) reads standard input. Exit status is 0 when every input
+was scored, 1 when any failed and 2 for usage errors. Only the standard library
+is imported until the first input is scored.
+"""
+import argparse
+import json
+import sys
+import time
+
+from . import api
+
+FIELDS = ('source', 'ok', 'mould_index', 'risk_level', 'status', 'current_temperature',
+          'current_humidity', 'used_timeframe', 'worst_sensor', 'error')
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='python -m mould_calculator', description="Score mould risk of logger CSVs")
+    parser.add_argument('files', nargs='*', help="CSV files to score; '-' or nothing reads standard input")
+    parser.add_argument('--format', choices=('json', 'jsonl', 'csv'), default='json', help="Output format")
+    parser.add_argument('--rolling-window', type=int, help="Days of readings to analyse (default: whole dataset)")
+    parser.add_argument('--resample', type=float, metavar='MINUTES', help="Simulate on a grid of this many minutes")
+    parser.add_argument('--gap-policy', choices=('mask', 'interpolate', 'segment'), default='interpolate',
+                        help="How resampling treats gaps")
+    parser.add_argument('--max-gap-minutes', type=float, default=60, help="Longest gap resampling interpolates over")
+    parser.add_argument('--chunksize', type=int, default=api.DEFAULT_CHUNKSIZE, help="Rows per chunk for large files")
+    parser.add_argument('--timing', action='store_true', help="Add the seconds each input took to its result")
+    return parser
+
+
+"""Score one input; failures become a result with ok false and the error"""
+def score_source(source, options, resampling):
+    started = time.perf_counter()
+    result = {'source': source, 'ok': False}
+    try:
+        if source == '-':
+            summary = api.score_stream(sys.stdin, options.rolling_window, resampling)
+        else:
+            summary = api.score_file(source, options.rolling_window, resampling, chunksize=options.chunksize)
+    except Exception as e:
+        summary = None
+        result['error'] = str(e)
+    if summary is None:
+        result.setdefault('error', "Could not calculate mould index from the provided data.")
+    else:
+        result.update(summary, ok=True)
+    if options.timing:
+        result['seconds'] = round(time.perf_counter() - started, 6)
+    return result
+
+
+def main(argv=None, stdout=None):
+    stdout = stdout or sys.stdout
+    options = build_parser().parse_args(argv)
+    sources = options.files or ['-']
+    if sources.count('-') > 1:
+        print("standard input can only be read once", file=sys.stderr)
+        return 2
+    try:
+        resampling = api.resampling(options.resample, options.gap_policy, options.max_gap_minutes) \
+            if options.resample else None
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 2
+
+    fields = FIELDS + (('seconds',) if options.timing else ())
+    writer = None
+    if options.format == 'csv':
+        import csv
+        writer = csv.DictWriter(stdout, fieldnames=fields, extrasaction='ignore')
+        writer.writeheader()
+
+    results = []
+    for source in sources:
+        result = score_source(source, options, resampling)
+        results.append(result)
+        #jsonl and csv write each result as soon as it's ready
+        if options.format == 'jsonl':
+            stdout.write(json.dumps(result, default=str) + "\n")
+        elif writer is not None:
+            writer.writerow(result)
+        stdout.flush()
+    if options.format == 'json':
+        #always an array, so consumers don't depend on how many inputs were given
+        json.dump(results, stdout, default=str, indent=2)
+        stdout.write("\n")
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
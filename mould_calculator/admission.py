@@ -0,0 +1,212 @@
+"""
+Admission control for heavy requests: uploads, batch analyses, and result
+pages and risk surfaces, which may run an analysis when nothing is cached.
+
+A handful of large uploads would otherwise occupy every worker while cheap
+pages wait behind them. `middleware.admission_middleware` admits a request
+to one of the MOULD_ADMISSION['VIEWS'] (URL name -> HTTP methods) only when
+it can take, without waiting:
+
+1. a slot of this process (a semaphore of PROCESS_SLOTS);
+2. one of the user's USER_SLOTS slot files. Anonymous users are identified by
+   their session or, before they have one, their CSRF cookie; requests with
+   neither skip this limit, since their address may be a proxy's, shared by
+   everyone behind it. Both cookies are in the client's hands, so a client
+   that drops them gets a fresh identity: for anonymous clients the per-user
+   limit only keeps well-behaved browsers from piling up requests;
+3. for anonymous requests, one of the ANONYMOUS_SLOTS slot files shared by all
+   of them, which bounds what anonymous clients can hold together however
+   they rotate their cookies;
+4. one of the GLOBAL_SLOTS slot files shared by every worker on the host.
+
+Conditional requests a view can answer with 304 don't need a slot: the
+middleware runs the view's registered precondition (see
+`middleware.admission_precondition`) first and sends its 304 without
+admitting the request.
+
+Slot files live in SLOT_DIRECTORY and are held with a non-blocking flock, so
+they are shared across gunicorn workers, and the kernel frees them when a
+worker dies. A request over the user's limit gets 429, one that finds the
+process or host saturated gets 503, both with Retry-After, instead of queueing
+without limit.
+
+Request bodies larger than MAX_UPLOAD_BYTES are refused before they are read:
+by their Content-Length in the middleware (413), and, for bodies sent without
+one, by `SizeLimitUploadHandler`, which stops the upload as soon as the limit
+is crossed.
+"""
+import fcntl
+import hashlib
+import os
+import random
+import threading
+
+from django.conf import settings
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+DEFAULTS = {
+    'VIEWS': {
+        'uploadpage': ('POST',),
+        'batch_analysis': ('POST',),
+        'result': ('GET',),
+        'risk_surface': ('GET',),
+    },
+    'MAX_UPLOAD_BYTES': None,
+    'PROCESS_SLOTS': None,
+    'USER_SLOTS': None,
+    'GLOBAL_SLOTS': None,
+    'ANONYMOUS_SLOTS': None,
+    'SLOT_DIRECTORY': None,
+    'RETRY_AFTER': 10,
+}
+
+
+"""settings.MOULD_ADMISSION over the defaults; None disables a limit"""
+def admission_options():
+    return {**DEFAULTS, **getattr(settings, 'MOULD_ADMISSION', {})}
+
+
+class SlotPool:
+    """
+    `size` flock-ed files named `name`-N.lock in `directory`, shared by every process on the host.
+    """
+    def __init__(self, directory, name, size):
+        self.paths = [os.path.join(directory, f"{name}-{index}.lock") for index in range(size)]
+
+    def acquire(self):
+        """File descriptor holding a free slot, or None when all are taken"""
+        os.makedirs(os.path.dirname(self.paths[0]), exist_ok=True)
+        #a random start spreads the probes over the slots
+        start = random.randrange(len(self.paths))
+        for path in self.paths[start:] + self.paths[:start]:
+            fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                os.close(fd)
+                continue
+            return fd
+        return None
+
+    @staticmethod
+    def release(fd):
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+
+
+class Rejected(Exception):
+    """
+    Why a request was not admitted: the HTTP status and message to answer with.
+    """
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+class Admission:
+    """
+    The slots one admitted request holds; release them when it is done.
+    """
+    def __init__(self):
+        self.semaphore = None
+        self.fds = []
+
+    def release(self):
+        for fd in self.fds:
+            SlotPool.release(fd)
+        self.fds = []
+        if self.semaphore is not None:
+            self.semaphore.release()
+            self.semaphore = None
+
+
+_process_slots = None
+_process_slots_lock = threading.Lock()
+
+
+def process_semaphore(size):
+    global _process_slots
+    if _process_slots is None:
+        with _process_slots_lock:
+            if _process_slots is None:
+                _process_slots = threading.BoundedSemaphore(size)
+    return _process_slots
+
+
+@receiver(setting_changed)
+def _reset_process_slots(setting, **kwargs):
+    global _process_slots
+    if setting == 'MOULD_ADMISSION':
+        _process_slots = None
+
+
+"""Reject a declared body size over MAX_UPLOAD_BYTES; returns nothing when the size is fine or unknown"""
+def check_content_length(content_length, options=None):
+    options = options or admission_options()
+    limit = options['MAX_UPLOAD_BYTES']
+    try:
+        declared = int(content_length)
+    except (TypeError, ValueError):
+        return
+    if limit is not None and declared > limit:
+        raise Rejected(413, f"Uploads are limited to {limit / (1024 * 1024):g} MB.")
+
+
+"""
+Take the process, user and host slots for a heavy request, or raise Rejected.
+`user_key` identifies the user (or anonymous session) for the per-user limit;
+None skips that limit. `anonymous` requests also take an ANONYMOUS_SLOTS slot.
+"""
+def admit(user_key, options=None, anonymous=False):
+    options = options or admission_options()
+    admission = Admission()
+    try:
+        if options['PROCESS_SLOTS']:
+            semaphore = process_semaphore(options['PROCESS_SLOTS'])
+            if not semaphore.acquire(blocking=False):
+                raise Rejected(503, "The server is busy with other analyses, please try again shortly.")
+            admission.semaphore = semaphore
+        directory = options['SLOT_DIRECTORY']
+        if directory and options['USER_SLOTS'] and user_key is not None:
+            #keys can hold anything (session keys, cookies); the digest is a safe file name
+            name = 'user-' + hashlib.sha256(user_key.encode()).hexdigest()[:16]
+            fd = SlotPool(directory, name, options['USER_SLOTS']).acquire()
+            if fd is None:
+                raise Rejected(429, "You already have analyses running, please wait for them to finish.")
+            admission.fds.append(fd)
+        if directory and anonymous and options['ANONYMOUS_SLOTS']:
+            fd = SlotPool(directory, 'anonymous', options['ANONYMOUS_SLOTS']).acquire()
+            if fd is None:
+                raise Rejected(503, "The server is busy with other analyses, please try again shortly.")
+            admission.fds.append(fd)
+        if directory and options['GLOBAL_SLOTS']:
+            fd = SlotPool(directory, 'global', options['GLOBAL_SLOTS']).acquire()
+            if fd is None:
+                raise Rejected(503, "The server is busy with other analyses, please try again shortly.")
+            admission.fds.append(fd)
+    except Exception:
+        admission.release()
+        raise
+    return admission
+
+
+class SizeLimitUploadHandler(FileUploadHandler):
+    """
+    Stops a multipart upload once MAX_UPLOAD_BYTES have arrived, without reading the rest.
+    The view sees `request.upload_too_large` and no file.
+    """
+    def handle_raw_input(self, input_data, META, content_length, boundary, encoding=None):
+        self.limit = admission_options()['MAX_UPLOAD_BYTES']
+        self.received = 0
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.limit is not None and self.received > self.limit:
+            self.request.upload_too_large = True
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
@@ -0,0 +1,35 @@
+"""
+Scoring logger data from scripts, without Django.
+
+Importing this module is cheap: pandas, NumPy and the model are only imported
+on the first call, so `python -m mould_calculator` and scripts that import it
+start fast and pay for pandas only when they actually score something. Nothing
+here reads Django settings; the defaults are the web app's defaults.
+"""
+#same as MOULD_STREAMING_THRESHOLD and ingest.DEFAULT_CHUNKSIZE, repeated so importing this stays light
+DEFAULT_STREAMING_THRESHOLD = 20 * 1024 * 1024
+DEFAULT_CHUNKSIZE = 100_000
+
+
+"""A resample.Resampling for score_file/score_stream (see resample.py for the gap policies)"""
+def resampling(interval_minutes, gap_policy='interpolate', max_gap_minutes=60):
+    from .resample import Resampling, validate_resampling
+    return validate_resampling(Resampling(interval_minutes, gap_policy, max_gap_minutes))
+
+
+"""
+Risk summary of a CSV file, the same dict the result page shows, or None when the data
+can't be analysed. Files of at least `streaming_threshold` bytes are read in chunks.
+"""
+def score_file(path, rolling_window=None, resampling=None, streaming_threshold=DEFAULT_STREAMING_THRESHOLD,
+               chunksize=DEFAULT_CHUNKSIZE):
+    from .ingest import analyse_file
+    return analyse_file(path, rolling_window, streaming_threshold, chunksize, resampling)
+
+
+"""Risk summary of CSV data read from a path or file object such as sys.stdin, or None when it can't be analysed"""
+def score_stream(stream, rolling_window=None, resampling=None):
+    import pandas as pd
+
+    from .utils import analyse_dataframe
+    return analyse_dataframe(pd.read_csv(stream), rolling_window, resampling)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MouldCalculatorConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'mould_calculator'
+
+    def ready(self):
+        from django.conf import settings
+
+        from . import metrics, signals  # noqa: F401
+        metrics.configure(getattr(settings, 'MOULD_METRICS_DIR', None))
@@ -0,0 +1,79 @@
+"""
+Analysis of archived logger files for bulk import.
+
+`find_archive_files` walks a directory tree for logger CSVs and
+`analyse_archive_file` does everything for one file that doesn't need the
+database: hash it, skip it when that hash was imported before, analyse it,
+compute its daily/weekly rollups and copy it (with its binary sidecar) into
+the uploads directory under a name derived from the hash. The
+`import_archive` command runs it on a process pool and writes the results in
+batches. Like batch.py, this module does not import Django.
+"""
+import fnmatch
+import os
+import shutil
+
+from .ingest import DEFAULT_CHUNKSIZE, file_digest, read_schema, read_standardized
+from .rollups import analyse_readings, compute_rollups
+from .sidecar import write_sidecar
+
+DEFAULT_PATTERNS = ('*.csv',)
+#MouldAnalysis.file is a 100 character FileField
+MAX_STORED_NAME = 100
+
+_known_hashes = frozenset()
+
+
+"""Files under `root` matching any of `patterns` (case-insensitive), in a stable order"""
+def find_archive_files(root, patterns=DEFAULT_PATTERNS):
+    patterns = [pattern.lower() for pattern in patterns]
+    for directory, subdirectories, filenames in os.walk(root):
+        subdirectories.sort()
+        for filename in sorted(filenames):
+            if any(fnmatch.fnmatch(filename.lower(), pattern) for pattern in patterns):
+                yield os.path.join(directory, filename)
+
+
+"""Process pool initializer: hashes of files that are already imported"""
+def init_worker(known_hashes):
+    global _known_hashes
+    _known_hashes = frozenset(known_hashes)
+
+
+"""Storage name for an archived file: `prefix` plus the start of its hash and as much of its name as fits"""
+def stored_name(prefix, content_hash, filename):
+    head = f"{prefix.rstrip('/')}/{content_hash[:16]}_"
+    return head + filename[-(MAX_STORED_NAME - len(head)):]
+
+
+"""
+Analyse one archive file and copy it into `media_root`/`prefix`. Returns a
+JSON-ready document: 'skipped' for hashes imported before, 'ok' False with an
+'error' when the file can't be analysed, otherwise the summary, row count,
+rollups ({period: {start: values}}) and the storage name of the copy.
+"""
+def analyse_archive_file(path, media_root, prefix, resampling=None, chunksize=DEFAULT_CHUNKSIZE):
+    result = {'path': path, 'ok': False, 'skipped': False}
+    try:
+        result['content_hash'] = content_hash = file_digest(path)
+        if content_hash in _known_hashes:
+            result['skipped'] = True
+            return result
+        #check the header first so a bad file reports why, not just that it failed
+        read_schema(path)
+        standardized = read_standardized(path, chunksize)
+        summary, frame = analyse_readings(standardized, resampling=resampling)
+        rollups = {period: table.to_dict(orient='index') for period, table in compute_rollups(frame).items()}
+
+        name = stored_name(prefix, content_hash, os.path.basename(path))
+        stored_path = os.path.join(media_root, name)
+        os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+        shutil.copyfile(path, stored_path)
+        write_sidecar(stored_path, standardized, mould_index=frame['M'].to_numpy(),
+                      series_timestamps=None if resampling is None else frame['Timestamp'])
+    except Exception as e:
+        result['error'] = str(e)
+        return result
+
+    result.update(ok=True, summary=summary, rows=len(standardized), rollups=rollups, stored_name=name)
+    return result
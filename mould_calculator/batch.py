@@ -0,0 +1,169 @@
+"""
+Batch analysis of many sensors at once.
+
+`analyse_batch` takes (sensor name, CSV path) pairs and spreads the per-file
+analysis over a process pool, so a building's worth of loggers is analysed in
+parallel instead of one upload at a time. Each sensor is analysed on its own:
+a file that fails (bad columns, unreadable CSV) is reported in its own result
+and the rest of the batch carries on. A crashed worker breaks the whole pool,
+so the files it left unfinished are retried once on a fresh pool, and files
+that still crash are run one at a time to find the one that kills its worker.
+
+Workers are spawned, not forked: the batch view runs inside a server process
+with threads of its own, and a forked child would inherit their locks.
+
+The result is one JSON-ready document per sensor, in input order, plus a
+building-level summary with the worst sensor and the risk level distribution.
+Zip members are extracted through ingest.LimitedStream, so a member that
+expands past MAX_COMPRESSION_RATIO is reported as failed instead of filling
+the disk. This module does not import Django; the batch view passes in the settings.
+"""
+import io
+import multiprocessing
+import os
+import shutil
+import zipfile
+from collections import Counter, namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from .ingest import (DEFAULT_CHUNKSIZE, MAX_COMPRESSION_RATIO, LimitedStream, analyse_file, archive_members,
+                     read_schema)
+
+RISK_LEVELS = ('Low', 'Moderate', 'High')
+COPY_BUFFER_SIZE = 1024 * 1024
+
+#a sensor file to analyse, or the reason it can't be (`error`, with no path)
+Source = namedtuple('Source', ['sensor', 'path', 'error'], defaults=(None,))
+
+
+"""Analysis of one sensor file; failures are returned as an error document instead of raised"""
+def analyse_sensor(sensor, path, rolling_window=None, streaming_threshold=None, chunksize=DEFAULT_CHUNKSIZE):
+    try:
+        #check the header first so a bad file reports why, not just that it failed
+        read_schema(path)
+        summary = analyse_file(path, rolling_window, streaming_threshold, chunksize)
+    except Exception as e:
+        return {'sensor': sensor, 'ok': False, 'error': str(e)}
+    if summary is None:
+        return {'sensor': sensor, 'ok': False, 'error': "Could not calculate mould index from the provided data."}
+    return dict(summary, sensor=sensor, ok=True)
+
+
+def _analyse_sensor_args(args):
+    return analyse_sensor(*args)
+
+
+"""
+Run tasks `indices` on a fresh pool of up to `processes` spawned workers.
+Returns ({index: result}, [indices left unfinished because the pool broke]).
+"""
+def _pool_round(tasks, indices, processes):
+    done = {}
+    lost = []
+    with ProcessPoolExecutor(max_workers=min(processes, len(indices)),
+                             mp_context=multiprocessing.get_context('spawn')) as executor:
+        #one file per task: sensor files differ a lot in size, so don't pre-batch them
+        futures = {index: executor.submit(_analyse_sensor_args, tasks[index]) for index in indices}
+        for index, future in futures.items():
+            try:
+                done[index] = future.result()
+            except BrokenProcessPool:
+                lost.append(index)
+    return done, lost
+
+
+"""Building-level summary of per-sensor results"""
+def building_summary(results):
+    analysed = [result for result in results if result['ok']]
+    distribution = Counter(result['risk_level'] for result in analysed)
+    worst = max(analysed, key=lambda result: result['mould_index'], default=None)
+    return {
+        'sensors': len(results),
+        'analysed': len(analysed),
+        'failed': len(results) - len(analysed),
+        'worst_sensor': None if worst is None else {
+            'sensor': worst['sensor'],
+            'mould_index': worst['mould_index'],
+            'risk_level': worst['risk_level'],
+        },
+        'risk_levels': {level: distribution.get(level, 0) for level in RISK_LEVELS},
+    }
+
+
+"""
+Analyse CSV paths, (sensor name, CSV path) pairs or Sources on up to `processes` worker
+processes (all cores by default; 1 runs in the calling process). Plain paths are
+named after their file; Sources with an error are reported without analysis.
+Returns {'sensors': [per-sensor results in input order], 'summary': building summary}.
+"""
+def analyse_batch(sources, processes=None, rolling_window=None, streaming_threshold=None,
+                  chunksize=DEFAULT_CHUNKSIZE):
+    sources = [Source(os.path.basename(source), source) if isinstance(source, (str, os.PathLike)) else Source(*source)
+               for source in sources]
+    tasks = [(source.sensor, source.path, rolling_window, streaming_threshold, chunksize) for source in sources]
+    runnable = [index for index, source in enumerate(sources) if source.error is None]
+    done = {index: {'sensor': source.sensor, 'ok': False, 'error': source.error}
+            for index, source in enumerate(sources) if source.error is not None}
+    processes = min(processes or os.cpu_count() or 1, len(runnable))
+
+    if processes <= 1:
+        done.update((index, _analyse_sensor_args(tasks[index])) for index in runnable)
+    else:
+        analysed, lost = _pool_round(tasks, runnable, processes)
+        done.update(analysed)
+        if lost:
+            #a crash fails every unfinished task of the pool, not just its own: retry them once
+            retried, lost = _pool_round(tasks, lost, processes)
+            done.update(retried)
+        for index in lost:
+            #still crashing: alone in a pool, only the task that kills its worker fails
+            solo, crashed = _pool_round(tasks, [index], 1)
+            done.update(solo)
+            if crashed:
+                done[index] = {'sensor': tasks[index][0], 'ok': False, 'error': "Worker process stopped unexpectedly."}
+    results = [done[index] for index in range(len(tasks))]
+    return {'sensors': results, 'summary': building_summary(results)}
+
+
+def _target(directory, index, name):
+    return os.path.join(directory, f"{index:05d}_{os.path.basename(name)}")
+
+
+def _copy_to(directory, index, name, source):
+    path = _target(directory, index, name)
+    with open(path, 'wb') as out:
+        shutil.copyfileobj(source, out, COPY_BUFFER_SIZE)
+    return path
+
+
+"""Extract a zip member into `directory`; a member that expands past MAX_COMPRESSION_RATIO becomes a Source with an error"""
+def _extract_member(directory, index, archive, member):
+    limit = max(member.compress_size, 1) * MAX_COMPRESSION_RATIO
+    path = _target(directory, index, member.filename)
+    try:
+        with archive.open(member) as source:
+            _copy_to(directory, index, member.filename, io.BufferedReader(LimitedStream(source, limit)))
+    except ValueError as e:
+        if os.path.exists(path):
+            os.remove(path)
+        return Source(member.filename, None, str(e))
+    return Source(member.filename, path)
+
+
+"""
+Write uploaded files into `directory`, unpacking zip archives; returns a Source per file.
+`files` are (name, file object) pairs. Sensors inside a zip are named by their path in the archive.
+"""
+def collect_sources(files, directory):
+    sources = []
+    for name, fileobj in files:
+        if zipfile.is_zipfile(fileobj):
+            fileobj.seek(0)
+            with zipfile.ZipFile(fileobj) as archive:
+                for member in archive_members(archive):
+                    sources.append(_extract_member(directory, len(sources), archive, member))
+        else:
+            fileobj.seek(0)
+            sources.append(Source(name, _copy_to(directory, len(sources), name, fileobj)))
+    return sources
@@ -0,0 +1,260 @@
+"""
+Content-addressed cache for computed mould analyses.
+
+Results are keyed by the SHA-256 of the uploaded file plus the engine
+parameters (rolling window and ALGORITHM_VERSION), so the same dataset is only
+computed once no matter how often its result page is viewed. There are two
+tiers: a per-process LRU in memory and a shared on-disk tier under
+MOULD_RESULT_CACHE['DIRECTORY'] that evicts least recently used entries once it
+grows past MAX_BYTES. Disk entries live in a directory per algorithm version;
+directories of other versions are removed when the tier is opened.
+"""
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+from .ingest import DEFAULT_CHUNKSIZE, analyse_file, file_digest
+from .resample import DEFAULT_GAP_POLICY, DEFAULT_MAX_GAP_MINUTES, Resampling, validate_resampling
+from .utils import ALGORITHM_VERSION, analyse_dataframe
+
+logger = logging.getLogger(__name__)
+
+"""Cache key for a dataset and the engine parameters it was computed with"""
+def result_key(content_hash, rolling_window=None, resampling=None):
+    params = f"{ALGORITHM_VERSION}:{rolling_window}:{content_hash}"
+    if resampling is not None:
+        params += ":{}:{}:{}".format(*resampling)
+    return hashlib.sha256(params.encode()).hexdigest()
+
+
+"""The resample.Resampling configured by MOULD_RESAMPLE, or None when uploads are simulated row by row"""
+def configured_resampling():
+    options = getattr(settings, 'MOULD_RESAMPLE', None) or {}
+    if not options.get('INTERVAL_MINUTES'):
+        return None
+    return validate_resampling(Resampling(
+        options['INTERVAL_MINUTES'],
+        options.get('GAP_POLICY', DEFAULT_GAP_POLICY),
+        options.get('MAX_GAP_MINUTES', DEFAULT_MAX_GAP_MINUTES),
+    ))
+
+
+class MemoryLRU:
+    """
+    Thread-safe in-process LRU keyed by result key.
+    """
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+class DiskLRU:
+    """
+    JSON files shared between worker processes, evicted by last access time once over max_bytes.
+    """
+    def __init__(self, directory, max_bytes, version=ALGORITHM_VERSION):
+        self.root = directory
+        self.directory = os.path.join(directory, f"v{version}")
+        self.max_bytes = max_bytes
+        self._size = None
+        self._lock = threading.Lock()
+        self._drop_stale_versions()
+
+    def _drop_stale_versions(self):
+        if not os.path.isdir(self.root):
+            return
+        for name in os.listdir(self.root):
+            path = os.path.join(self.root, name)
+            if path != self.directory and os.path.isdir(path):
+                shutil.rmtree(path, ignore_errors=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key[:2], f"{key}.json")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path) as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = json.dumps(value)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        with self._lock:
+            if self._size is None:
+                self._size = self._scan_size()
+            else:
+                self._size += len(data)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _entries(self):
+        for dirpath, _, filenames in os.walk(self.directory):
+            for name in filenames:
+                if name.endswith('.json'):
+                    path = os.path.join(dirpath, name)
+                    try:
+                        stat = os.stat(path)
+                    except OSError:
+                        continue
+                    yield stat.st_mtime, stat.st_size, path
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    def _evict(self):
+        #other processes write here too, so re-read the real sizes before deleting
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * 0.9
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+                total -= size
+            except OSError:
+                pass
+        self._size = total
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+        self._size = 0
+
+
+class ResultCache:
+    """
+    Memory tier in front of a disk tier, with hit/miss counters.
+    """
+    def __init__(self, memory, disk=None):
+        self.memory = memory
+        self.disk = disk
+        self.stats = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        value = self.memory.get(key)
+        if value is not None:
+            self.stats['memory_hits'] += 1
+            return value
+        if self.disk is not None:
+            value = self.disk.get(key)
+            if value is not None:
+                self.stats['disk_hits'] += 1
+                self.memory.set(key, value)
+                return value
+        self.stats['misses'] += 1
+        return None
+
+    def set(self, key, value):
+        self.memory.set(key, value)
+        if self.disk is not None:
+            try:
+                self.disk.set(key, value)
+            except OSError as e:
+                logger.warning("Could not write result cache entry: %s", e)
+
+    def get_or_compute(self, key, compute):
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            if value is not None:
+                self.set(key, value)
+        return value
+
+    def clear(self):
+        self.memory.clear()
+        if self.disk is not None:
+            self.disk.clear()
+
+
+_result_cache = None
+_result_cache_lock = threading.Lock()
+
+
+"""Process-wide ResultCache configured from settings.MOULD_RESULT_CACHE"""
+def get_result_cache():
+    global _result_cache
+    if _result_cache is None:
+        with _result_cache_lock:
+            if _result_cache is None:
+                options = getattr(settings, 'MOULD_RESULT_CACHE', {})
+                directory = options.get('DIRECTORY')
+                disk = DiskLRU(directory, options.get('MAX_BYTES', 64 * 1024 * 1024)) if directory else None
+                _result_cache = ResultCache(MemoryLRU(options.get('MEMORY_ENTRIES', 256)), disk)
+    return _result_cache
+
+
+@receiver(setting_changed)
+def _reset_result_cache(setting, **kwargs):
+    global _result_cache
+    if setting == 'MOULD_RESULT_CACHE':
+        _result_cache = None
+
+
+"""
+Analysis summary for a stored CSV, computed only when it is not cached yet.
+Pass `standardized` when the caller already has the standardized readings in hand,
+or `summary` when it has computed the analysis itself and only wants it cached.
+"""
+def cached_analysis(path, content_hash=None, rolling_window=None, standardized=None, summary=None):
+    if content_hash is None:
+        content_hash = file_digest(path)
+    resampling = configured_resampling()
+    key = result_key(content_hash, rolling_window, resampling)
+
+    def compute():
+        if summary is not None:
+            return summary
+        if standardized is not None:
+            return analyse_dataframe(standardized, rolling_window, resampling)
+        return analyse_file(
+            path,
+            rolling_window,
+            streaming_threshold=getattr(settings, 'MOULD_STREAMING_THRESHOLD', None),
+            chunksize=getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE),
+            resampling=resampling,
+        )
+
+    return get_result_cache().get_or_compute(key, compute)
@@ -0,0 +1,52 @@
+"""
+Bounded thread pool for the pandas/NumPy work of async views.
+
+Async views hand parsing and simulation to `run_compute`, which runs them on
+at most MOULD_COMPUTE_THREADS threads. Requests beyond that wait on the event
+loop without holding a thread, so one ASGI worker keeps answering fast
+requests while slow uploads compute. The caller's context variables (such as
+the active pipeline trace) are carried into the thread. Work handed to the
+pool must not touch the database; use sync_to_async for that.
+"""
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+
+_executor = None
+_lock = threading.Lock()
+
+
+def compute_threads():
+    return getattr(settings, 'MOULD_COMPUTE_THREADS', None) or min(4, os.cpu_count() or 1)
+
+
+def get_executor():
+    global _executor
+    with _lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=compute_threads(), thread_name_prefix='mould-compute')
+        return _executor
+
+
+@receiver(setting_changed)
+def _reset_executor(setting, **kwargs):
+    global _executor
+    if setting == 'MOULD_COMPUTE_THREADS':
+        with _lock:
+            if _executor is not None:
+                _executor.shutdown(wait=False)
+            _executor = None
+
+
+"""Run `fn(*args, **kwargs)` on the compute pool and await its result"""
+async def run_compute(fn, *args, **kwargs):
+    context = contextvars.copy_context()
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), functools.partial(context.run, fn, *args, **kwargs))
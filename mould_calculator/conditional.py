@@ -0,0 +1,68 @@
+"""
+HTTP validators for the result page and the JSON endpoints behind it.
+
+What these pages show depends only on the stored file (its content hash),
+the algorithm version and the resampling configuration, all known without
+reading the file. A strong ETag built from them and the analysis id therefore
+identifies a response, and Last-Modified is the upload time. Views check the
+validators before they read or compute anything and answer 304 when the
+client's copy is current (Django's `condition` for sync views, `not_modified`
+for async ones).
+
+The data belongs to one user, so the views also send Cache-Control: private,
+no-cache and Vary: Cookie (Django's cache_control and vary_on_cookie). Browsers
+keep a copy but revalidate it on every use, and shared caches never hand it
+to someone else.
+"""
+import hashlib
+import os
+from datetime import datetime, timezone
+
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+from .cache import configured_resampling, result_key
+from .utils import ALGORITHM_VERSION
+
+
+"""A strong ETag (a quoted digest) of `parts`"""
+def strong_etag(*parts):
+    return '"' + hashlib.sha256(":".join(map(str, parts)).encode()).hexdigest()[:32] + '"'
+
+
+"""ETag of a view of one dataset (`variant` tells its pages apart), or None when its content hash is unknown"""
+def dataset_etag(variant, analysis_id, content_hash):
+    if not content_hash:
+        return None
+    return strong_etag(variant, analysis_id or 'anonymous', result_key(content_hash, None, configured_resampling()))
+
+
+"""ETag of a set of analyses, from their ids and content hashes"""
+def analyses_etag(variant, analyses):
+    return strong_etag(variant, ALGORITHM_VERSION, *sorted(f"{pk}/{content_hash}" for pk, content_hash in analyses))
+
+
+"""Modification time of a file as an aware datetime, or None when it is missing"""
+def file_modified(path):
+    try:
+        return datetime.fromtimestamp(os.path.getmtime(path), tz=timezone.utc)
+    except OSError:
+        return None
+
+
+"""The 304 (or 412) response for a conditional request whose copy is current, or None to build the page"""
+def not_modified(request, etag, last_modified):
+    timestamp = int(last_modified.timestamp()) if last_modified is not None else None
+    response = get_conditional_response(request, etag=etag, last_modified=timestamp)
+    if response is None:
+        return None
+    return with_validators(response, etag, last_modified)
+
+
+"""Add the ETag and Last-Modified headers to a response"""
+def with_validators(response, etag, last_modified):
+    if etag is not None:
+        response.headers.setdefault('ETag', etag)
+    if last_modified is not None:
+        response.headers.setdefault('Last-Modified', http_date(last_modified.timestamp()))
+    return response
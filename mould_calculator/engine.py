@@ -0,0 +1,145 @@
+"""
+Array-based mould index engine.
+
+Works on plain NumPy columns instead of DataFrame rows: rolling averages come
+from cumulative sums, RH_crit and the growth/decay coefficients are computed
+for the whole column at once, and only the bounded M recurrence (which depends
+on the previous M) is left as a scalar loop. For many sensors on one time grid
+the same steps run on (time x sensor) matrices, and the recurrence advances all
+sensors with one vector operation per time step.
+
+It reproduces calculate_rh_crit/calculate_dMdt from utils.py. The final index
+agrees with the reference iterrows engine to within 1e-6 percentage points, and
+a smoothed series value can only differ by one rounding step (0.01) when M lands
+on a rounding boundary.
+"""
+import math
+
+import numpy as np
+import pandas as pd
+
+#step codes produced by growth_decay_coefficients
+DECAY = 0
+GROWTH = 1
+STALLED = 2
+
+
+"""Trailing mean over the last `window_points` values (fewer at the start); 2-D input is averaged per column"""
+def rolling_means(values, window_points):
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    csum = np.empty((n + 1,) + values.shape[1:])
+    csum[0] = 0.0
+    np.cumsum(values, axis=0, out=csum[1:])
+    upper = np.arange(1, n + 1)
+    lower = np.maximum(upper - window_points, 0)
+    counts = (upper - lower).reshape((n,) + (1,) * (values.ndim - 1))
+    return (csum[upper] - csum[lower]) / counts
+
+
+"""Elementwise version of utils.calculate_rh_crit"""
+def rh_crit_array(temp):
+    temp = np.asarray(temp, dtype=float)
+    return np.where(temp <= 20, 80 + (-0.5 * (20 - temp)), 80.0)
+
+
+"""Classify every step as growth/decay and precompute the parts that do not depend on M"""
+def growth_decay_coefficients(avg_rh, rh_crit, time_delta_hours):
+    avg_rh = np.asarray(avg_rh, dtype=float)
+    rh_crit = np.asarray(rh_crit, dtype=float)
+    scale = np.asarray(time_delta_hours, dtype=float) / 24.0
+
+    rh_diff = avg_rh - rh_crit
+    growing = avg_rh >= rh_crit
+
+    with np.errstate(invalid='ignore', over='ignore'):
+        decay = np.where(rh_diff > -10, -0.001 * np.abs(rh_diff), -0.0005) * scale
+
+    codes = np.where(growing, GROWTH, DECAY).astype(np.int8)
+    #calculate_dMdt returns 0 for non-positive RH and for nan/inf steps
+    codes[growing & (avg_rh <= 0)] = STALLED
+    codes[~np.isfinite(scale)] = STALLED
+    codes[~growing & ~np.isfinite(decay)] = STALLED
+
+    return codes, np.where(codes == DECAY, decay, 0.0), scale
+
+
+"""Run the bounded M recurrence; returns M after every step"""
+def simulate(codes, decay, scale, M=0.1):
+    exp = math.exp
+    out = []
+    append = out.append
+    for code, d, s in zip(codes.tolist(), decay.tolist(), scale.tolist()):
+        if code == GROWTH:
+            k1 = 0.22 if M < 1 else 0.33
+            k2 = 1 - exp(2.3 * (M - 6))
+            if k2 < 0:
+                k2 = 0
+            M = M + k1 * k2 * s
+        elif code == DECAY:
+            M = M + d
+        if M > 6:
+            M = 6
+        elif M < 0:
+            M = 0
+        append(M)
+    return np.array(out, dtype=float)
+
+
+"""
+Run the M recurrence for a (time x sensor) matrix of step coefficients, advancing
+every sensor at once per time step; returns the (time x sensor) M values.
+"""
+def simulate_matrix(codes, decay, scale, M=0.1):
+    steps, sensors = codes.shape
+    if sensors == 1:
+        #the scalar kernel is faster than per-step array calls for a single column
+        return simulate(codes[:, 0], decay[:, 0], scale[:, 0], M).reshape(steps, 1)
+
+    growth = codes == GROWTH
+    out = np.empty((steps, sensors))
+    M = np.full(sensors, M, dtype=float)
+    k1 = np.empty(sensors)
+    k2 = np.empty(sensors)
+    for t in range(steps):
+        np.copyto(k1, np.where(M < 1, 0.22, 0.33))
+        np.exp(2.3 * (M - 6), out=k2)
+        np.subtract(1, k2, out=k2)
+        np.maximum(k2, 0, out=k2)
+        #decay is already zero wherever the step isn't a decay step
+        M = np.where(growth[t], M + k1 * k2 * scale[t], M + decay[t])
+        np.clip(M, 0, 6, out=M)
+        out[t] = M
+    return out
+
+
+"""Round M to 2 decimals and smooth it with the same 5-point rolling mean as the reference engine"""
+def smooth_series(trajectory, window=5):
+    if np.ndim(trajectory) == 2:
+        rounded = pd.DataFrame(np.round(trajectory, 2))
+        return rounded.rolling(window=window, min_periods=1).mean().round(2).to_numpy()
+    rounded = pd.Series(np.round(trajectory, 2))
+    return rounded.rolling(window=window, min_periods=1).mean().round(2).to_numpy()
+
+
+"""Compute the M trajectory for windowed readings; returns an array of M values"""
+def mould_index_trajectory(rh, temp, time_delta_hours, window_points, M=0.1):
+    rh = np.asarray(rh, dtype=float)
+    if window_points <= 0 or len(rh) == 0:
+        return np.empty(0)
+    avg_rh = rolling_means(rh, window_points)
+    avg_temp = rolling_means(temp, window_points)
+    codes, decay, scale = growth_decay_coefficients(avg_rh, rh_crit_array(avg_temp), time_delta_hours)
+    return simulate(codes, decay, scale, M)
+
+
+"""Matrix version of mould_index_trajectory for sensors sharing one time grid; rh/temp are (time x sensor)"""
+def mould_index_matrix(rh, temp, time_delta_hours, window_points, M=0.1):
+    rh = np.asarray(rh, dtype=float)
+    if window_points <= 0 or len(rh) == 0:
+        return np.empty((0,) + rh.shape[1:])
+    avg_rh = rolling_means(rh, window_points)
+    avg_temp = rolling_means(temp, window_points)
+    time_delta_hours = np.broadcast_to(np.asarray(time_delta_hours, dtype=float)[:, None], rh.shape)
+    codes, decay, scale = growth_decay_coefficients(avg_rh, rh_crit_array(avg_temp), time_delta_hours)
+    return simulate_matrix(codes, decay, scale, M)
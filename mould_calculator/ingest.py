@@ -0,0 +1,433 @@
+"""
+Chunked CSV ingestion with bounded memory.
+
+`stream_analysis` reads a stored CSV in fixed-size `read_csv` chunks instead of
+loading it whole. A first pass over the chunks collects what process_mold_index
+needs to know up front (first/last timestamp and the sampling intervals, kept
+as a histogram rather than a list). A second pass standardizes each chunk and
+feeds it into a MouldIndexState, so the mould index carries across chunk
+boundaries. Peak memory depends on the chunk size and the rolling window, not
+on the file size.
+
+The streamed path expects readings in time order, which is how loggers export
+them. If a file turns out to be unsorted, `stream_analysis` returns None and
+the caller falls back to the in-memory path.
+
+`stream_to_sidecar` does the same for uploads, which also need the binary
+sidecar, the per-reading M series and the rollups: the first pass appends the
+chunks to the sidecar arrays, and the second simulates from their memory map.
+
+Files may be gzip, bz2, xz or zip compressed. The format is detected from the
+magic bytes, not the name. Files are stored as uploaded and decompressed as a
+stream while they are read, so a compressed file is never expanded in memory
+or on disk. The stream stops with a ValueError once it has produced more than
+MAX_COMPRESSION_RATIO times the compressed size, so a decompression bomb is
+never parsed past that point.
+"""
+import bz2
+import gzip
+import hashlib
+import io
+import lzma
+import math
+import os
+import struct
+import zipfile
+from collections import Counter
+from contextlib import ExitStack, contextmanager
+from datetime import timedelta
+
+import numpy as np
+import pandas as pd
+
+from .state import MouldIndexState
+from .tracing import stage
+from .schema import resolve_schema
+from .rollups import combine_rollups, compute_rollups
+from .sidecar import SidecarWriter, arrays_frame, load_standardized, sidecar_meta, write_sidecar
+from .utils import (READING_COLUMNS, STANDARDIZED_ATTR, analyse_dataframe, build_standardized, has_several_sensors,
+                    risk_level_for)
+
+DEFAULT_CHUNKSIZE = 100_000
+SAMPLE_ROWS = 100
+HASH_CHUNK_SIZE = 1024 * 1024
+#leading bytes of the compressed formats accepted for uploads
+MAGIC_NUMBERS = ((b'\x1f\x8b', 'gzip'), (b'BZh', 'bz2'), (b'\xfd7zXZ\x00', 'xz'), (b'PK\x03\x04', 'zip'))
+#bz2 and xz don't record their uncompressed size; logger CSVs compress about this well
+ASSUMED_COMPRESSION_RATIO = 10
+#logger CSVs rarely compress better than 20:1; bombs reach 1000:1 and more
+MAX_COMPRESSION_RATIO = 100
+OPENERS = {'gzip': gzip.open, 'bz2': bz2.open, 'xz': lzma.open}
+
+
+class UnsortedInput(Exception):
+    pass
+
+
+class LimitedStream(io.RawIOBase):
+    """
+    Binary stream over a decompressing reader that raises ValueError once more than `limit` bytes come out.
+    """
+    def __init__(self, stream, limit):
+        self.stream = stream
+        self.limit = limit
+        self.produced = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = self.stream.readinto(buffer)
+        self.produced += count
+        if self.produced > self.limit:
+            raise ValueError(f"The file decompresses to more than {MAX_COMPRESSION_RATIO} times its size, "
+                             "which is not a plausible data file.")
+        return count
+
+
+"""SHA-256 of a file path or file object, read in chunks"""
+def file_digest(source):
+    digest = hashlib.sha256()
+    if hasattr(source, 'chunks'):
+        for chunk in source.chunks():
+            digest.update(chunk)
+        return digest.hexdigest()
+    with open(source, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+"""Compression of a file from its magic bytes: 'gzip', 'bz2', 'xz', 'zip', or None for plain text"""
+def detect_compression(path):
+    with open(path, 'rb') as f:
+        head = f.read(6)
+    return next((compression for magic, compression in MAGIC_NUMBERS if head.startswith(magic)), None)
+
+
+"""Data files in a zip archive, leaving out folders and the metadata macOS adds"""
+def archive_members(archive):
+    return [member for member in archive.infolist()
+            if not member.is_dir() and member.filename.lower().endswith('.csv')
+            and not member.filename.startswith('__MACOSX/')]
+
+
+def _single_member(archive):
+    members = archive_members(archive)
+    if len(members) != 1:
+        raise ValueError(f"A zip upload must contain exactly one CSV file, found {len(members)}")
+    return members[0]
+
+
+"""
+A source to pass to pd.read_csv for a stored file: the path of a plain CSV, or a
+decompressing stream limited to MAX_COMPRESSION_RATIO times the file size. The
+stream is only valid inside the `with` block.
+"""
+@contextmanager
+def csv_source(path):
+    compression = detect_compression(path)
+    if compression is None:
+        yield path
+        return
+    limit = max(os.path.getsize(path), 1) * MAX_COMPRESSION_RATIO
+    with ExitStack() as stack:
+        if compression == 'zip':
+            archive = stack.enter_context(zipfile.ZipFile(path))
+            stream = stack.enter_context(archive.open(_single_member(archive)))
+        else:
+            stream = stack.enter_context(OPENERS[compression](path, 'rb'))
+        yield io.BufferedReader(LimitedStream(stream, limit))
+
+
+"""Size of a file once decompressed: recorded for gzip and zip, estimated for bz2 and xz"""
+def uncompressed_size(path):
+    compression = detect_compression(path)
+    size = os.path.getsize(path)
+    if compression == 'gzip' and size >= 4:
+        #ISIZE, the last four bytes, is the size modulo 2**32
+        with open(path, 'rb') as f:
+            f.seek(-4, os.SEEK_END)
+            return struct.unpack('<I', f.read(4))[0]
+    if compression == 'zip':
+        with zipfile.ZipFile(path) as archive:
+            return _single_member(archive).file_size
+    return size if compression is None else size * ASSUMED_COMPRESSION_RATIO
+
+
+"""
+Resolve the schema from the first rows of a CSV; returns it with the original names of its columns.
+The sensor/device id column is only kept `with_sensor`.
+"""
+def read_schema(path, with_sensor=False):
+    with csv_source(path) as source:
+        sample = pd.read_csv(source, nrows=SAMPLE_ROWS)
+    header = list(sample.columns)
+    sample.columns = sample.columns.str.lower().str.strip()
+    schema = resolve_schema(sample)
+    columns = [schema.timestamp, schema.temperature, schema.humidity]
+    if with_sensor and schema.sensor is not None:
+        columns.append(schema.sensor)
+    else:
+        #analysed as one series, so a sensor/device column is not read
+        schema = schema._replace(sensor=None)
+    lowered = list(sample.columns)
+    usecols = [header[lowered.index(col)] for col in columns]
+    return schema, usecols
+
+
+"""True when the CSV has a sensor/device id column with more than one id; only that column is read"""
+def is_multi_sensor(path, chunksize=DEFAULT_CHUNKSIZE):
+    schema, usecols = read_schema(path, with_sensor=True)
+    if schema.sensor is None:
+        return False
+    seen = set()
+    with csv_source(path) as source, \
+            pd.read_csv(source, usecols=usecols[-1:], dtype=str, chunksize=chunksize) as reader:
+        for chunk in reader:
+            seen.update(chunk.iloc[:, 0].dropna().str.strip())
+            seen.discard('')
+            if len(seen) > 1:
+                return True
+    return False
+
+
+"""Yield standardized, NaN-free chunks of a CSV in file order"""
+def iter_standardized_chunks(path, schema, usecols, chunksize=DEFAULT_CHUNKSIZE):
+    with csv_source(path) as source, pd.read_csv(source, usecols=usecols, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk.columns = chunk.columns.str.lower().str.strip()
+            yield build_standardized(chunk, schema).dropna(subset=READING_COLUMNS)
+
+
+"""Median of the sampling intervals (minutes) from a histogram of nanosecond deltas"""
+def median_interval_minutes(delta_counts):
+    total = sum(delta_counts.values())
+    if total == 0:
+        return 60.0
+    middle = [(total - 1) // 2, total // 2]
+    values = []
+    seen = 0
+    for delta, count in sorted(delta_counts.items()):
+        while middle and middle[0] < seen + count:
+            values.append(pd.Timedelta(delta, unit='ns').total_seconds() / 60.0)
+            middle.pop(0)
+        seen += count
+    median_interval = (values[0] + values[1]) / 2
+    if median_interval <= 0:
+        median_interval = 60.0
+    return median_interval
+
+
+"""First pass: row count, time range and sampling interval histogram. `on_chunk` sees every non-empty chunk"""
+def scan_timestamps(path, schema, usecols, chunksize=DEFAULT_CHUNKSIZE, on_chunk=None):
+    delta_counts = Counter()
+    first = last = None
+    rows = 0
+    for chunk in iter_standardized_chunks(path, schema, usecols, chunksize):
+        if chunk.empty:
+            continue
+        if on_chunk is not None:
+            on_chunk(chunk)
+        timestamps = chunk['Timestamp']
+        if last is not None:
+            if timestamps.iloc[0] < last:
+                raise UnsortedInput()
+            delta_counts[(timestamps.iloc[0] - last).value] += 1
+        elif first is None:
+            first = timestamps.iloc[0]
+        deltas = timestamps.diff().iloc[1:].to_numpy().astype('int64')
+        if (deltas < 0).any():
+            raise UnsortedInput()
+        delta_counts.update(Counter(deltas.tolist()))
+        last = timestamps.iloc[-1]
+        rows += len(chunk)
+    return rows, first, last, delta_counts
+
+
+"""
+Mould risk summary for a CSV on disk, computed chunk by chunk.
+Returns the same dict as utils.analyse_dataframe, or None for unsorted input.
+"""
+def stream_analysis(path, rolling_window=None, chunksize=DEFAULT_CHUNKSIZE):
+    schema, usecols = read_schema(path)
+    with stage('standardize') as scan_stage:
+        try:
+            rows, first, last, delta_counts = scan_timestamps(path, schema, usecols, chunksize)
+        except UnsortedInput:
+            return None
+        scan_stage.rows = rows
+    if rows == 0:
+        raise ValueError("No valid data after standardization")
+    rolling_window, rolling_queue_maxlen, cutoff_time, median_interval = stream_window(
+        first, last, delta_counts, rolling_window
+    )
+
+    #readings only leave the window if it is shorter than the input
+    state = MouldIndexState(rolling_queue_maxlen, default_time_delta_hours=median_interval / 60.0,
+                            track_window=rolling_queue_maxlen < rows)
+    first_recent = latest = None
+    with stage('simulation', rows=0) as simulation_stage:
+        for chunk in iter_standardized_chunks(path, schema, usecols, chunksize):
+            chunk = chunk[chunk['Timestamp'] >= cutoff_time]
+            if chunk.empty:
+                continue
+            if first_recent is None:
+                first_recent = chunk['Timestamp'].iloc[0]
+            latest = chunk.iloc[-1]
+            state.advance(chunk, skip_seen=False, with_series=False)
+            simulation_stage.rows += len(chunk)
+
+    return stream_summary(state, latest, rolling_window, first_recent, last)
+
+
+"""Window length (days), window size (readings), cutoff and median interval (minutes) from first-pass statistics"""
+def stream_window(first, last, delta_counts, rolling_window=None):
+    #same window rules as utils.prepare_window
+    median_interval = median_interval_minutes(delta_counts)
+    rolling_window_days = max(1, math.ceil((last - first).total_seconds() / (24 * 3600)))
+    if rolling_window is None:
+        rolling_window = rolling_window_days
+    else:
+        rolling_window = min(rolling_window, rolling_window_days)
+    rolling_queue_maxlen = int(rolling_window * (24 * 60) / median_interval)
+    return rolling_window, rolling_queue_maxlen, last - timedelta(days=rolling_window), median_interval
+
+
+"""Risk summary (as utils.analyse_dataframe) of a streamed analysis"""
+def stream_summary(state, latest, rolling_window, first_recent, last):
+    mould_index = state.mould_index
+    risk_level, status = risk_level_for(mould_index)
+    return {
+        'mould_index': float(mould_index),
+        'risk_level': risk_level,
+        'status': status,
+        'current_temperature': float(latest['Temperature']),
+        'current_humidity': float(latest['Humidity']),
+        'used_timeframe': f"Last {rolling_window} days ({first_recent.date()} to {last.date()})",
+    }
+
+
+"""
+Analyse a CSV with bounded memory while building its sidecar. The parsed chunks are
+appended to the sidecar arrays; the analysed window is then simulated from the
+memory-mapped sidecar in chunks, writing the M series next to the readings and rolling
+it up by day and week. Returns (risk summary, rollups as rollups.compute_rollups), or
+None when the file is unsorted or its timestamps can't be stored.
+"""
+def stream_to_sidecar(path, rolling_window=None, chunksize=DEFAULT_CHUNKSIZE):
+    schema, usecols = read_schema(path)
+    writer = SidecarWriter(path)
+    try:
+        with stage('standardize') as scan_stage:
+            try:
+                rows, first, last, delta_counts = scan_timestamps(path, schema, usecols, chunksize, writer.append)
+            except UnsortedInput:
+                writer.abort()
+                return None
+            scan_stage.rows = rows
+        if not writer.storable:
+            writer.abort()
+            return None
+        if rows == 0:
+            raise ValueError("No valid data after standardization")
+        rolling_window, rolling_queue_maxlen, cutoff_time, median_interval = stream_window(
+            first, last, delta_counts, rolling_window
+        )
+
+        arrays = writer.readings()
+        #sidecar timestamps are UTC (or naive) nanoseconds, like Timestamp.value
+        start = int(np.searchsorted(arrays['timestamp'], cutoff_time.value))
+        series = writer.series(rows - start)
+        state = MouldIndexState(rolling_queue_maxlen, default_time_delta_hours=median_interval / 60.0,
+                                track_window=rolling_queue_maxlen < rows)
+        rollups = None
+        with stage('simulation', rows=rows - start):
+            for offset in range(start, rows, chunksize):
+                chunk = arrays_frame(arrays, offset, offset + chunksize)
+                trajectory = state.trajectory(chunk)
+                series[offset - start:offset - start + len(chunk)] = trajectory
+                ticks = np.asarray(arrays['timestamp'][max(offset - 1, start):offset + len(chunk)])
+                hours = np.diff(ticks) / 3.6e12
+                if offset == start:
+                    hours = np.concatenate(([median_interval / 60.0], hours))
+                rollups = combine_rollups(rollups, compute_rollups(chunk.assign(M=trajectory, Hours=hours)))
+        series.flush()
+        first_recent = arrays_frame(arrays, start, start + 1)['Timestamp'].iloc[0]
+        summary = stream_summary(state, chunk.iloc[-1], rolling_window, first_recent, last)
+        writer.commit()
+    except Exception:
+        writer.abort()
+        raise
+    return summary, rollups
+
+
+"""
+Standardized frame for a whole CSV, built chunk by chunk so only the typed columns are held;
+`with_sensor` adds the 'Sensor' column of multi-sensor files.
+"""
+def read_standardized(path, chunksize=DEFAULT_CHUNKSIZE, with_sensor=False):
+    schema, usecols = read_schema(path, with_sensor)
+    chunks = list(iter_standardized_chunks(path, schema, usecols, chunksize))
+    standardized = pd.concat(chunks, ignore_index=True).sort_values('Timestamp')
+    standardized.attrs[STANDARDIZED_ATTR] = True
+    return standardized
+
+
+"""
+Readings of a CSV analysed as one series: all of them, or for a file with several sensors
+those of the sensor at highest risk. Returns (standardized frame, sensors summary as
+utils.sensors_summary or None). `multi_sensor` is is_multi_sensor(path) when already known.
+"""
+def series_readings(path, chunksize=DEFAULT_CHUNKSIZE, multi_sensor=None):
+    if multi_sensor is None:
+        multi_sensor = is_multi_sensor(path, chunksize)
+    standardized = read_standardized(path, chunksize, with_sensor=multi_sensor)
+    if not has_several_sensors(standardized):
+        return standardized, None
+    sensors = analyse_dataframe(standardized)
+    if sensors is None:
+        raise ValueError("Could not calculate mould index from the provided data.")
+    worst = standardized[standardized['Sensor'].astype(str) == sensors['worst_sensor']].drop(columns='Sensor')
+    worst.attrs[STANDARDIZED_ATTR] = True
+    return worst, sensors
+
+
+"""Standardized frame from the binary sidecar, parsing the CSV (and writing the sidecar) only when needed"""
+def load_or_build_standardized(path, chunksize=DEFAULT_CHUNKSIZE):
+    standardized = load_standardized(path)
+    if standardized is None:
+        standardized, sensors = series_readings(path, chunksize)
+        write_sidecar(path, standardized, sensor=None if sensors is None else sensors['worst_sensor'])
+    return standardized
+
+
+"""
+Analyse a stored CSV. A fresh binary sidecar is used when there is one; otherwise the
+CSV is streamed in chunks when it is at least `streaming_threshold` bytes (uncompressed)
+and read whole when it is smaller. Resampled analyses need every reading, so they read the
+typed columns chunk by chunk instead of streaming, and so do files with several sensors,
+which are analysed per sensor (see utils.analyse_dataframe).
+"""
+def analyse_file(path, rolling_window=None, streaming_threshold=None, chunksize=DEFAULT_CHUNKSIZE, resampling=None):
+    meta = sidecar_meta(path)
+    if meta is not None and 'sensor' in meta:
+        multi_sensor = meta['sensor'] is not None
+    else:
+        #no sidecar, or one written before files with several sensors were told apart
+        multi_sensor = is_multi_sensor(path, chunksize)
+    if multi_sensor:
+        #every sensor's readings are needed at once for the (time x sensor) matrices
+        return analyse_dataframe(read_standardized(path, chunksize, with_sensor=True), rolling_window, resampling)
+    standardized = load_standardized(path)
+    if standardized is not None:
+        return analyse_dataframe(standardized, rolling_window, resampling)
+    if resampling is not None:
+        return analyse_dataframe(read_standardized(path, chunksize), rolling_window, resampling)
+    if streaming_threshold is not None and uncompressed_size(path) >= streaming_threshold:
+        summary = stream_analysis(path, rolling_window, chunksize)
+        if summary is not None:
+            return summary
+    with csv_source(path) as source:
+        data = pd.read_csv(source)
+    return analyse_dataframe(data, rolling_window)
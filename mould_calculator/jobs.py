@@ -0,0 +1,112 @@
+"""
+Database-backed queue for upload analyses.
+
+An upload creates an AnalysisJob row and returns straight away; the
+`run_mould_workers` command runs a small pool of worker processes that claim
+queued jobs and analyse them. Claiming is a conditional UPDATE (queued ->
+running), so two workers never run the same job. Running jobs write a heartbeat
+while they work; a job whose heartbeat is older than `stale_after` seconds
+belongs to a worker that died and is put back on the queue (or failed once it
+has used up MAX_ATTEMPTS).
+"""
+import logging
+import os
+import socket
+import threading
+from datetime import timedelta
+
+from django.core.files.storage import default_storage
+from django.db import connection
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AnalysisJob
+from .metrics import count_failure
+from .uploads import analyse_upload
+
+logger = logging.getLogger(__name__)
+
+MAX_ATTEMPTS = 3
+HEARTBEAT_INTERVAL = 30
+
+
+"""Queue a saved upload for analysis on behalf of the requesting user or session"""
+def enqueue_upload(request, file_path, filename, content_hash):
+    if not request.session.session_key:
+        #anonymous jobs are owned by the session, so it needs a key now
+        request.session.save()
+    user = request.user if request.user.is_authenticated else None
+    return AnalysisJob.objects.create(
+        user=user,
+        session_key=request.session.session_key,
+        filename=filename,
+        file_path=file_path,
+        content_hash=content_hash,
+    )
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+"""Claim the oldest queued job for `worker`; returns None when the queue is empty"""
+def claim_next_job(worker):
+    while True:
+        job_id = (AnalysisJob.objects.filter(status=AnalysisJob.QUEUED)
+                  .order_by('created_at').values_list('id', flat=True).first())
+        if job_id is None:
+            return None
+        claimed = AnalysisJob.objects.filter(id=job_id, status=AnalysisJob.QUEUED).update(
+            status=AnalysisJob.RUNNING, worker=worker, progress=0, heartbeat_at=timezone.now(),
+            attempts=F('attempts') + 1)
+        if claimed:
+            return AnalysisJob.objects.select_related('user').get(id=job_id)
+        #another worker got there first
+
+
+"""Requeue running jobs without a heartbeat for `stale_after` seconds; returns (requeued, failed)"""
+def requeue_stale_jobs(stale_after):
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    stale = AnalysisJob.objects.filter(status=AnalysisJob.RUNNING, heartbeat_at__lt=cutoff)
+    failed = stale.filter(attempts__gte=MAX_ATTEMPTS).update(
+        status=AnalysisJob.FAILED, error="Worker stopped while processing the file.", finished_at=timezone.now())
+    requeued = stale.filter(attempts__lt=MAX_ATTEMPTS).update(
+        status=AnalysisJob.QUEUED, worker='', progress=0, heartbeat_at=None)
+    if requeued or failed:
+        logger.warning("Requeued %s stale jobs, failed %s", requeued, failed)
+    return requeued, failed
+
+
+def _beat(job_id, stop):
+    try:
+        while not stop.wait(HEARTBEAT_INTERVAL):
+            AnalysisJob.objects.filter(id=job_id).update(heartbeat_at=timezone.now())
+    finally:
+        #the thread has its own connection
+        connection.close()
+
+
+"""Analyse a claimed job and record the outcome on it"""
+def run_job(job):
+    def progress(percent, stage=None):
+        AnalysisJob.objects.filter(id=job.id).update(progress=percent, heartbeat_at=timezone.now())
+
+    #keep the heartbeat fresh during long stages so the job isn't mistaken for a dead one
+    stop = threading.Event()
+    beat = threading.Thread(target=_beat, args=(job.id, stop), daemon=True)
+    beat.start()
+    try:
+        full_path = os.path.join(default_storage.location, job.file_path)
+        analysis, _ = analyse_upload(full_path, job.filename, job.content_hash, user=job.user, progress=progress)
+    except Exception as e:
+        logger.warning("Job %s failed: %s", job.id, e)
+        count_failure('job')
+        job.status, job.error = AnalysisJob.FAILED, str(e)
+    else:
+        job.status, job.progress, job.analysis = AnalysisJob.DONE, 100, analysis
+    finally:
+        stop.set()
+        beat.join()
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'progress', 'error', 'analysis', 'finished_at'])
+    return job
@@ -0,0 +1,49 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mould_calculator.cache import configured_resampling
+from mould_calculator.ingest import DEFAULT_CHUNKSIZE, load_or_build_standardized
+from mould_calculator.models import MouldAnalysis
+from mould_calculator.rollups import compute_rollups, reading_frame
+from mould_calculator.sidecar import load_series, write_sidecar
+from mould_calculator.uploads import store_rollups
+from mould_calculator.utils import simulation_readings
+
+
+class Command(BaseCommand):
+    help = "Compute daily/weekly rollups and the stored mould index series for analyses that have none"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Recompute rollups for every analysis")
+
+    def handle(self, *args, **options):
+        chunksize = getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE)
+        resampling = configured_resampling()
+        analyses = MouldAnalysis.objects.exclude(file='').only('id', 'file')
+        if not options['force']:
+            analyses = analyses.filter(rollups__isnull=True)
+        built = failed = 0
+
+        for analysis in analyses.distinct().iterator():
+            path = analysis.file.path
+            if not os.path.exists(path):
+                self.stderr.write(f"Analysis {analysis.id}: file {path} is missing")
+                failed += 1
+                continue
+            try:
+                standardized = load_or_build_standardized(path, chunksize)
+                readings, _ = simulation_readings(standardized, resampling)
+                stored = load_series(path)
+                frame = reading_frame(readings, mould_index=None if stored is None else stored[1])
+                store_rollups(analysis, compute_rollups(frame))
+                if stored is None:
+                    write_sidecar(path, standardized, mould_index=frame['M'].to_numpy(),
+                                  series_timestamps=None if resampling is None else frame['Timestamp'])
+                built += 1
+            except Exception as e:
+                self.stderr.write(f"Analysis {analysis.id}: {e}")
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built rollups for {built} analyses, failed {failed}"))
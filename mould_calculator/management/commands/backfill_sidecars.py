@@ -0,0 +1,40 @@
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from mould_calculator.ingest import DEFAULT_CHUNKSIZE, read_standardized
+from mould_calculator.models import MouldAnalysis
+from mould_calculator.sidecar import remove_sidecar, sidecar_meta, write_sidecar
+
+
+class Command(BaseCommand):
+    help = "Write binary sidecars for analyses whose sidecar is missing, outdated or stale"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help="Rebuild every sidecar, even fresh ones")
+
+    def handle(self, *args, **options):
+        chunksize = getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE)
+        built = skipped = failed = 0
+
+        for analysis in MouldAnalysis.objects.exclude(file='').only('id', 'file').iterator():
+            path = analysis.file.path
+            if not os.path.exists(path):
+                self.stderr.write(f"Analysis {analysis.id}: file {path} is missing")
+                failed += 1
+                continue
+            if not options['force'] and sidecar_meta(path) is not None:
+                skipped += 1
+                continue
+            try:
+                if write_sidecar(path, read_standardized(path, chunksize)):
+                    built += 1
+                else:
+                    remove_sidecar(path)
+                    skipped += 1
+            except Exception as e:
+                self.stderr.write(f"Analysis {analysis.id}: {e}")
+                failed += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Built {built} sidecars, skipped {skipped}, failed {failed}"))
@@ -0,0 +1,152 @@
+import multiprocessing
+import os
+import time
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from mould_calculator.archive import DEFAULT_PATTERNS, analyse_archive_file, find_archive_files, init_worker
+from mould_calculator.cache import configured_resampling
+from mould_calculator.ingest import DEFAULT_CHUNKSIZE
+from mould_calculator.models import AnalysisRollup, MouldAnalysis, MouldSummary
+from mould_calculator.sidecar import remove_sidecar
+
+ARCHIVE_PREFIX = 'uploads/archive'
+
+
+class Command(BaseCommand):
+    help = (
+        "Analyse every logger CSV under a directory on a process pool and import them as analyses "
+        "of one user. Files whose content was imported before are skipped, so an interrupted import "
+        "can simply be run again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help="Directory tree to import")
+        parser.add_argument('--user', required=True, help="Username the analyses are assigned to")
+        parser.add_argument('--processes', type=int, default=None,
+                            help="Worker processes (default: MOULD_BATCH_PROCESSES, or one per CPU core)")
+        parser.add_argument('--batch-size', type=int, default=200, help="Analyses written per transaction")
+        parser.add_argument('--pattern', action='append', dest='patterns',
+                            help=f"Filename pattern to import, repeatable (default: {', '.join(DEFAULT_PATTERNS)})")
+
+    def handle(self, *args, **options):
+        try:
+            user = User.objects.get(username=options['user'])
+        except User.DoesNotExist:
+            raise CommandError(f"No user named {options['user']!r}")
+        root = options['directory']
+        if not os.path.isdir(root):
+            raise CommandError(f"{root} is not a directory")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be at least 1")
+
+        paths = list(find_archive_files(root, options['patterns'] or DEFAULT_PATTERNS))
+        #the content hashes of earlier imports (and uploads) are the resume record
+        known = set(MouldAnalysis.objects.filter(user=user).exclude(content_hash='')
+                    .values_list('content_hash', flat=True))
+        processes = min(options['processes'] or getattr(settings, 'MOULD_BATCH_PROCESSES', None)
+                        or os.cpu_count() or 1, max(len(paths), 1))
+        chunksize = getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE)
+        task_args = (default_storage.location, ARCHIVE_PREFIX, configured_resampling(), chunksize)
+        self.stdout.write(f"Importing {len(paths)} files from {root} for {user.username} on {processes} processes")
+
+        self.counts = Counter()
+        self.started = time.monotonic()
+        pending = []
+        #content hash -> storage name of the copy imported in this run
+        imported = {}
+        for result in self.results(paths, task_args, known, processes):
+            self.counts['files'] += 1
+            if result['ok'] and result['content_hash'] in known:
+                #the same content twice in this run: workers copy before they can know, so drop the second copy
+                result['skipped'] = True
+                if result['stored_name'] != imported.get(result['content_hash']):
+                    default_storage.delete(result['stored_name'])
+                    remove_sidecar(default_storage.path(result['stored_name']))
+            if result['skipped']:
+                self.counts['skipped'] += 1
+            elif not result['ok']:
+                self.counts['failed'] += 1
+                self.stderr.write(f"{result['path']}: {result['error']}")
+            else:
+                known.add(result['content_hash'])
+                imported[result['content_hash']] = result['stored_name']
+                self.counts['rows'] += result['rows']
+                pending.append(result)
+                if len(pending) >= options['batch_size']:
+                    self.write_batch(user, root, pending)
+                    pending = []
+            if self.counts['files'] % options['batch_size'] == 0 and self.counts['files'] < len(paths):
+                self.report(len(paths))
+        if pending:
+            self.write_batch(user, root, pending)
+        #bulk_create skips the signal handlers, so the dashboard summary is rebuilt once the analyses are in
+        MouldSummary.rebuild(user.id)
+        self.report(len(paths))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {self.counts['imported']} files, skipped {self.counts['skipped']}, failed {self.counts['failed']}"
+        ))
+
+    def results(self, paths, task_args, known, processes):
+        if processes <= 1:
+            init_worker(known)
+            for path in paths:
+                yield analyse_archive_file(path, *task_args)
+            return
+        #spawned workers never share this process's database connection, which stays open for the whole import
+        with ProcessPoolExecutor(max_workers=processes, mp_context=multiprocessing.get_context('spawn'),
+                                 initializer=init_worker, initargs=(known,)) as executor:
+            futures = {executor.submit(analyse_archive_file, path, *task_args): path for path in paths}
+            for future in as_completed(futures):
+                try:
+                    yield future.result()
+                except BrokenProcessPool:
+                    yield {'path': futures[future], 'ok': False, 'skipped': False,
+                           'error': "Worker process stopped unexpectedly."}
+
+    def write_batch(self, user, root, results):
+        analyses = [
+            MouldAnalysis(
+                user=user,
+                filename=os.path.relpath(result['path'], root)[-200:],
+                file=result['stored_name'],
+                temperature=result['summary']['current_temperature'],
+                humidity=result['summary']['current_humidity'],
+                mould_index=result['summary']['mould_index'],
+                risk_level=result['summary']['risk_level'],
+                risk_message=result['summary']['status'],
+                content_hash=result['content_hash'],
+            )
+            for result in results
+        ]
+        with transaction.atomic():
+            analyses = MouldAnalysis.objects.bulk_create(analyses)
+            if any(analysis.pk is None for analysis in analyses):
+                #backends that can't return ids from a bulk insert
+                ids = dict(MouldAnalysis.objects.filter(
+                    user=user, content_hash__in=[result['content_hash'] for result in results]
+                ).values_list('content_hash', 'id'))
+                for analysis in analyses:
+                    analysis.pk = ids[analysis.content_hash]
+            AnalysisRollup.objects.bulk_create([
+                AnalysisRollup(analysis=analysis, period=period, start=start, **values)
+                for analysis, result in zip(analyses, results)
+                for period, table in result['rollups'].items()
+                for start, values in table.items()
+            ], batch_size=500)
+        self.counts['imported'] += len(analyses)
+
+    def report(self, total):
+        elapsed = max(time.monotonic() - self.started, 1e-9)
+        self.stdout.write(
+            f"{self.counts['files']}/{total} files: {self.counts['imported']} imported, "
+            f"{self.counts['skipped']} skipped, {self.counts['failed']} failed | "
+            f"{self.counts['files'] / elapsed:.1f} files/s, {self.counts['rows'] / elapsed:,.0f} rows/s"
+        )
@@ -0,0 +1,60 @@
+import multiprocessing
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from mould_calculator.jobs import claim_next_job, requeue_stale_jobs, run_job, worker_name
+
+
+def _work(stop, poll_interval, stale_after):
+    #children must not reuse the parent's database connections
+    connections.close_all()
+    #the parent decides when to stop; a job that has started is always finished
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    name = worker_name()
+    while not stop.is_set():
+        requeue_stale_jobs(stale_after)
+        job = claim_next_job(name)
+        if job is None:
+            stop.wait(poll_interval)
+            continue
+        run_job(job)
+    connections.close_all()
+
+
+class Command(BaseCommand):
+    help = "Run worker processes that analyse queued uploads"
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=2, help="Number of worker processes")
+        parser.add_argument('--poll-interval', type=float, default=1.0, help="Seconds to wait when the queue is empty")
+        parser.add_argument('--stale-after', type=int, default=getattr(settings, 'MOULD_JOB_STALE_AFTER', 300),
+                            help="Requeue running jobs without a heartbeat for this many seconds")
+
+    def handle(self, *args, **options):
+        stop = multiprocessing.Event()
+        #only flag the signal here: setting the Event inside the handler can deadlock on its lock
+        signalled = []
+        signal.signal(signal.SIGTERM, lambda signum, frame: signalled.append(signum))
+        signal.signal(signal.SIGINT, lambda signum, frame: signalled.append(signum))
+
+        connections.close_all()
+        workers = [
+            multiprocessing.Process(target=_work, args=(stop, options['poll_interval'], options['stale_after']))
+            for _ in range(options['processes'])
+        ]
+        for worker in workers:
+            worker.start()
+        self.stdout.write(f"Started {len(workers)} workers")
+
+        while not signalled and any(worker.is_alive() for worker in workers):
+            time.sleep(0.5)
+        self.stdout.write("Stopping workers")
+        stop.set()
+        for worker in workers:
+            worker.join()
+        self.stdout.write(self.style.SUCCESS("Workers stopped"))
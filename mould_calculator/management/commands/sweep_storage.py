@@ -0,0 +1,54 @@
+import json
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from mould_calculator.storage import storage_options, sweep_storage
+
+
+def megabytes(size):
+    return f"{size / 1024 / 1024:.1f} MB"
+
+
+class Command(BaseCommand):
+    help = (
+        "Delete expired anonymous uploads from temp/ and evict the least recently used sidecars and "
+        "chart pyramids of users (and the whole store) over their MOULD_STORAGE quotas"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help="Report what would be reclaimed without deleting")
+        parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+        parser.add_argument('--every', type=int, default=None,
+                            help="Keep running and sweep every this many seconds (a background sweeper)")
+
+    def handle(self, *args, **options):
+        if options['every'] is not None and options['every'] < 1:
+            raise CommandError("--every must be at least 1 second")
+        while True:
+            self.sweep(options)
+            if options['every'] is None:
+                return
+            time.sleep(options['every'])
+
+    def sweep(self, options):
+        report = sweep_storage(dry_run=options['dry_run'])
+        if options['json']:
+            self.stdout.write(json.dumps(report))
+            return
+        settings = storage_options()
+        self.stdout.write(
+            f"temp/ (TTL {settings['TEMP_TTL']}s): {report['temp']['files']} files, {megabytes(report['temp']['bytes'])}"
+        )
+        self.stdout.write(
+            f"user quota: {report['user_quota']['files']} artefacts of {report['users_over_quota']} users, "
+            f"{megabytes(report['user_quota']['bytes'])}"
+        )
+        self.stdout.write(
+            f"global quota: {report['global_quota']['files']} artefacts, {megabytes(report['global_quota']['bytes'])}"
+        )
+        verb = "Would reclaim" if options['dry_run'] else "Reclaimed"
+        self.stdout.write(self.style.SUCCESS(
+            f"{verb} {megabytes(report['reclaimed_bytes'])}; "
+            f"storage {megabytes(report['used_before'])} -> {megabytes(report['used_after'])}"
+        ))
@@ -0,0 +1,247 @@
+"""
+Counters and histograms exported in the Prometheus text format on /metrics.
+
+Recording is cheap enough to leave on under load: label values are passed
+positionally, histogram buckets are found with bisect, and the only lock is an
+uncontended one around a dict update. Nothing here imports Django or
+prometheus_client, so the pipeline modules can record into it directly.
+
+Each process keeps its own values. With several gunicorn workers, set
+MOULD_METRICS_DIR: every process then writes a JSON snapshot of its values
+into that directory from a background thread every FLUSH_INTERVAL seconds
+(and at exit), never from a request, and /metrics adds up its own values and
+the snapshots of all other processes, dead ones included, so counters
+survive worker restarts. Empty the directory when the server starts
+(`wipe_directory` in gunicorn's `on_starting` hook), like prometheus_client's
+multiprocess mode.
+
+What is recorded:
+
+- mould_http_request_duration_seconds / mould_http_requests_total per URL
+  name, method and status (middleware.metrics_middleware);
+- mould_upload_bytes, the size of uploaded files;
+- mould_pipeline_stage_seconds and mould_pipeline_rows_total per pipeline
+  stage (tracing.stage), so rows per second of the simulation is
+  rate(mould_pipeline_rows_total{stage="simulation"}[5m]) /
+  rate(mould_pipeline_stage_seconds_sum{stage="simulation"}[5m]);
+- mould_pipeline_failures_total, errors swallowed by the pipeline's broad
+  `except` blocks, per function;
+- mould_admission_rejections_total, heavy requests refused with 413, 429 or
+  503 by admission control (admission.py).
+"""
+import atexit
+import bisect
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+#1 KB to 1 GB in factors of 4
+SIZE_BUCKETS = tuple(1024.0 * 4 ** power for power in range(11))
+FLUSH_INTERVAL = 1.0
+
+_lock = threading.Lock()
+_registry = {}
+_directory = None
+_snapshot_name = None
+_flusher = None
+
+
+class Metric:
+    """
+    A counter (`buckets` None) or histogram keyed by a tuple of label values.
+    """
+    def __init__(self, name, help, labels=(), buckets=None):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets) if buckets is not None else None
+        self.values = {}
+        _registry[name] = self
+
+    @property
+    def kind(self):
+        return 'counter' if self.buckets is None else 'histogram'
+
+    def inc(self, amount=1, *labels):
+        with _lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+        _ensure_flusher()
+
+    def observe(self, value, *labels):
+        """Histogram cells are [count per bucket..., count above the last bucket, sum]"""
+        index = bisect.bisect_left(self.buckets, value)
+        with _lock:
+            cell = self.values.get(labels)
+            if cell is None:
+                cell = self.values[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            cell[index] += 1
+            cell[-1] += value
+        _ensure_flusher()
+
+
+"""A counter: `.inc(amount, *label_values)`"""
+def counter(name, help, labels=()):
+    return Metric(name, help, labels)
+
+
+"""A histogram: `.observe(value, *label_values)`"""
+def histogram(name, help, labels=(), buckets=LATENCY_BUCKETS):
+    return Metric(name, help, labels, buckets)
+
+
+REQUEST_SECONDS = histogram('mould_http_request_duration_seconds', "Request latency by URL name",
+                            ('view', 'method'))
+REQUESTS = counter('mould_http_requests_total', "Requests by URL name and status", ('view', 'method', 'status'))
+UPLOAD_BYTES = histogram('mould_upload_bytes', "Size of uploaded files", buckets=SIZE_BUCKETS)
+STAGE_SECONDS = histogram('mould_pipeline_stage_seconds', "Wall time of mould index pipeline stages", ('stage',))
+STAGE_ROWS = counter('mould_pipeline_rows_total', "Rows processed by mould index pipeline stages", ('stage',))
+FAILURES = counter('mould_pipeline_failures_total', "Errors caught inside the mould index pipeline", ('function',))
+ADMISSION_REJECTIONS = counter('mould_admission_rejections_total', "Heavy requests refused by admission control",
+                               ('status',))
+
+
+"""Count an error caught by one of the pipeline's broad except blocks"""
+def count_failure(function):
+    FAILURES.inc(1, function)
+
+
+def _snapshot():
+    with _lock:
+        return {name: [[list(labels), list(value) if isinstance(value, list) else value]
+                       for labels, value in metric.values.items()]
+                for name, metric in _registry.items() if metric.values}
+
+
+def _flush_loop():
+    while True:
+        time.sleep(FLUSH_INTERVAL)
+        flush()
+
+
+def _ensure_flusher():
+    #started on first use, so a forked worker gets its own thread
+    global _flusher
+    if _directory is None or _flusher is not None:
+        return
+    with _lock:
+        if _flusher is None:
+            _flusher = threading.Thread(target=_flush_loop, name='metrics-flush', daemon=True)
+            _flusher.start()
+
+
+"""Write this process's snapshot into the metrics directory, if one is configured"""
+def flush():
+    global _snapshot_name
+    if _directory is None:
+        return
+    if _snapshot_name is None:
+        _snapshot_name = f"{os.getpid()}-{uuid.uuid4().hex[:8]}.json"
+    path = os.path.join(_directory, _snapshot_name)
+    tmp_path = f"{path}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(_snapshot(), f)
+        os.replace(tmp_path, path)
+    except OSError:
+        pass
+
+
+"""Share metrics between processes through `directory` (None: this process only)"""
+def configure(directory):
+    global _directory
+    if directory is not None:
+        os.makedirs(directory, exist_ok=True)
+    _directory = directory
+    flush()
+    _ensure_flusher()
+
+
+"""Delete the snapshots in a metrics directory; call it once when the server starts"""
+def wipe_directory(directory):
+    if not os.path.isdir(directory):
+        return
+    for name in os.listdir(directory):
+        if name.endswith('.json'):
+            os.remove(os.path.join(directory, name))
+
+
+def _reset_after_fork():
+    #a forked worker starts from zero under its own snapshot file
+    global _lock, _snapshot_name, _flusher
+    _lock = threading.Lock()
+    _snapshot_name = None
+    _flusher = None
+    for metric in _registry.values():
+        metric.values = {}
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+atexit.register(flush)
+
+
+def _add(total, value):
+    if isinstance(value, list):
+        return [a + b for a, b in zip(total, value)] if len(total) == len(value) else total
+    return total + value
+
+
+"""Values of every metric across processes: {name: {label values: value}}"""
+def collect():
+    #this process's own values are read from memory, so a scrape doesn't write anything
+    snapshots = [_snapshot()]
+    if _directory is not None:
+        for name in sorted(os.listdir(_directory)):
+            if not name.endswith('.json') or name == _snapshot_name:
+                continue
+            try:
+                with open(os.path.join(_directory, name)) as f:
+                    snapshots.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+    merged = {name: {} for name in _registry}
+    for snapshot in snapshots:
+        for name, entries in snapshot.items():
+            if name not in merged:
+                continue
+            for labels, value in entries:
+                labels = tuple(labels)
+                merged[name][labels] = _add(merged[name][labels], value) if labels in merged[name] else value
+    return merged
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values)) + ([extra] if extra else [])
+    if not pairs:
+        return ''
+    escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, value in pairs)
+    return '{' + ','.join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + '}'
+
+
+def _format_value(value):
+    return '+Inf' if value == math.inf else repr(float(value)) if isinstance(value, float) else str(value)
+
+
+"""All metrics in the Prometheus text exposition format (version 0.0.4)"""
+def render():
+    lines = []
+    for name, values in collect().items():
+        metric = _registry[name]
+        lines.append(f"# HELP {name} {metric.help}")
+        lines.append(f"# TYPE {name} {metric.kind}")
+        for labels, value in sorted(values.items()):
+            if metric.buckets is None:
+                lines.append(f"{name}{_format_labels(metric.labels, labels)} {_format_value(value)}")
+                continue
+            cumulative = 0
+            for bound, count in zip(metric.buckets + (math.inf,), value[:-1]):
+                cumulative += count
+                le = ('le', _format_value(float(bound)) if bound != math.inf else '+Inf')
+                lines.append(f"{name}_bucket{_format_labels(metric.labels, labels, le)} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(metric.labels, labels)} {_format_value(float(value[-1]))}")
+            lines.append(f"{name}_count{_format_labels(metric.labels, labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
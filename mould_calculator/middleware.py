@@ -0,0 +1,148 @@
+"""
+Request middleware: latency and counts per URL name for /metrics (see
+metrics.py) and admission control for heavy requests (see admission.py).
+
+Requests are labelled with their URL name rather than the path, so ids in
+URLs don't create a series per object; requests that match no URL are
+counted as 'unmatched'.
+"""
+import time
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.http import JsonResponse
+from django.urls import Resolver404, resolve
+from django.utils.decorators import sync_and_async_middleware
+
+from .admission import Rejected, admission_options, admit, check_content_length
+from .metrics import ADMISSION_REJECTIONS, REQUEST_SECONDS, REQUESTS
+
+
+def record_request(request, response, seconds):
+    match = getattr(request, 'resolver_match', None)
+    view = (match.url_name or match.view_name) if match is not None else 'unmatched'
+    REQUEST_SECONDS.observe(seconds, view, request.method)
+    REQUESTS.inc(1, view, request.method, str(response.status_code))
+
+
+"""Time every request; works for sync and async views without a thread switch"""
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            started = time.perf_counter()
+            response = await get_response(request)
+            record_request(request, response, time.perf_counter() - started)
+            return response
+    else:
+        def middleware(request):
+            started = time.perf_counter()
+            response = get_response(request)
+            record_request(request, response, time.perf_counter() - started)
+            return response
+    return middleware
+
+
+#URL name -> check(request) that returns a 304 response for a current conditional request, or None
+preconditions = {}
+
+
+"""
+Register `check(request)` for a heavy view: when it answers a conditional request with a
+response (a 304), that response is sent without taking an admission slot
+"""
+def admission_precondition(url_name):
+    def register(check):
+        preconditions[url_name] = check
+        return check
+    return register
+
+
+"""URL name of a heavy request, or None"""
+def heavy_view(request, options):
+    try:
+        url_name = resolve(request.path_info).url_name
+    except Resolver404:
+        return None
+    return url_name if request.method in options['VIEWS'].get(url_name, ()) else None
+
+
+"""The registered precondition of a conditional GET/HEAD for `url_name`, or None when there is nothing to check"""
+def precondition(request, url_name):
+    if request.method not in ('GET', 'HEAD'):
+        return None
+    if 'If-None-Match' not in request.headers and 'If-Modified-Since' not in request.headers:
+        return None
+    return preconditions.get(url_name)
+
+
+"""Who a request counts against for the per-user limit, or None when nothing identifies the client"""
+def user_key(request, user):
+    if user.is_authenticated:
+        return f"user:{user.pk}"
+    if request.session.session_key:
+        return f"session:{request.session.session_key}"
+    #the CSRF cookie is set with the upload form, before there is a session
+    csrf_cookie = request.COOKIES.get(settings.CSRF_COOKIE_NAME)
+    if csrf_cookie:
+        return f"csrf:{csrf_cookie}"
+    return None
+
+
+def rejection(error, options):
+    ADMISSION_REJECTIONS.inc(1, str(error.status))
+    response = JsonResponse({'error': str(error)}, status=error.status)
+    if error.status in (429, 503):
+        response['Retry-After'] = str(options['RETRY_AFTER'])
+    return response
+
+
+"""
+Admit heavy requests only while there are free slots, before their body is read;
+goes after AuthenticationMiddleware, which it needs for the per-user limit
+"""
+@sync_and_async_middleware
+def admission_middleware(get_response):
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            options = admission_options()
+            url_name = heavy_view(request, options)
+            if url_name is None:
+                return await get_response(request)
+            check = precondition(request, url_name)
+            if check is not None:
+                response = await sync_to_async(check)(request)
+                if response is not None:
+                    return response
+            try:
+                check_content_length(request.META.get('CONTENT_LENGTH'), options)
+                user = await request.auser()
+                admission = admit(user_key(request, user), options, anonymous=not user.is_authenticated)
+            except Rejected as e:
+                return rejection(e, options)
+            try:
+                return await get_response(request)
+            finally:
+                admission.release()
+    else:
+        def middleware(request):
+            options = admission_options()
+            url_name = heavy_view(request, options)
+            if url_name is None:
+                return get_response(request)
+            check = precondition(request, url_name)
+            if check is not None:
+                response = check(request)
+                if response is not None:
+                    return response
+            try:
+                check_content_length(request.META.get('CONTENT_LENGTH'), options)
+                admission = admit(user_key(request, request.user), options,
+                                  anonymous=not request.user.is_authenticated)
+            except Rejected as e:
+                return rejection(e, options)
+            try:
+                return get_response(request)
+            finally:
+                admission.release()
+    return middleware
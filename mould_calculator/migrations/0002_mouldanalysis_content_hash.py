@@ -0,0 +1,18 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mould_calculator', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mouldanalysis',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:45
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('mould_calculator', '0003_analysisjob'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MouldSummary',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='mould_summary', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('total', models.PositiveIntegerField(default=0)),
+                ('low_count', models.PositiveIntegerField(default=0)),
+                ('moderate_count', models.PositiveIntegerField(default=0)),
+                ('high_count', models.PositiveIntegerField(default=0)),
+                ('latest_id', models.BigIntegerField(blank=True, null=True)),
+                ('latest_index', models.FloatField(blank=True, null=True)),
+                ('latest_at', models.DateTimeField(blank=True, null=True)),
+                ('previous_id', models.BigIntegerField(blank=True, null=True)),
+                ('previous_index', models.FloatField(blank=True, null=True)),
+                ('worst_id', models.BigIntegerField(blank=True, null=True)),
+                ('worst_index', models.FloatField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='mouldanalysis',
+            index=models.Index(fields=['user', '-uploaded_at', '-id'], name='analysis_user_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='mouldanalysis',
+            index=models.Index(fields=['user', '-mould_index', '-id'], name='analysis_user_worst_idx'),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 5.1.2 on 2026-10-18 08:47
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('mould_calculator', '0004_dashboard_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('period', models.CharField(choices=[('day', 'Day'), ('week', 'Week')], max_length=4)),
+                ('start', models.DateField()),
+                ('readings', models.PositiveIntegerField()),
+                ('hours', models.FloatField()),
+                ('m_min', models.FloatField()),
+                ('m_mean', models.FloatField()),
+                ('m_max', models.FloatField()),
+                ('rh_min', models.FloatField()),
+                ('rh_mean', models.FloatField()),
+                ('rh_max', models.FloatField()),
+                ('temp_min', models.FloatField()),
+                ('temp_mean', models.FloatField()),
+                ('temp_max', models.FloatField()),
+                ('hours_above_rh_crit', models.FloatField()),
+                ('analysis', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='rollups', to='mould_calculator.mouldanalysis')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('analysis', 'period', 'start'), name='rollup_analysis_period_start')],
+            },
+        ),
+    ]
@@ -1,3 +1,5 @@
+import uuid
+
 from django.db import models
 from django.contrib.auth.models import User
 
@@ -12,15 +14,161 @@ class MouldAnalysis(models.Model):
     mould_index = models.FloatField()
     risk_level = models.CharField(max_length=100)
     risk_message=models.TextField()
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        indexes = [
+            #dashboard pages walk this index with a (uploaded_at, id) cursor
+            models.Index(fields=['user', '-uploaded_at', '-id'], name='analysis_user_recent_idx'),
+            models.Index(fields=['user', '-mould_index', '-id'], name='analysis_user_worst_idx'),
+        ]
 
     def __str__(self):
         return f"{self.filename} ({self.risk_level})"
-    
-    
 
 
+class AnalysisRollup(models.Model):
+    """Daily or weekly aggregate of an analysis, written with the analysis (see rollups.py)"""
+    DAY = 'day'
+    WEEK = 'week'
+    PERIOD_CHOICES = [(DAY, 'Day'), (WEEK, 'Week')]
+
+    analysis = models.ForeignKey(MouldAnalysis, on_delete=models.CASCADE, related_name='rollups')
+    period = models.CharField(max_length=4, choices=PERIOD_CHOICES)
+    start = models.DateField()
+    readings = models.PositiveIntegerField()
+    hours = models.FloatField()
+    m_min = models.FloatField()
+    m_mean = models.FloatField()
+    m_max = models.FloatField()
+    rh_min = models.FloatField()
+    rh_mean = models.FloatField()
+    rh_max = models.FloatField()
+    temp_min = models.FloatField()
+    temp_mean = models.FloatField()
+    temp_max = models.FloatField()
+    hours_above_rh_crit = models.FloatField()
+
+    class Meta:
+        constraints = [
+            #also the index for range queries within an analysis
+            models.UniqueConstraint(fields=['analysis', 'period', 'start'], name='rollup_analysis_period_start'),
+        ]
+
+    def __str__(self):
+        return f"{self.analysis_id} {self.period} {self.start}"
+
+
+class MouldSummary(models.Model):
+    """
+    Per-user dashboard figures, kept up to date by the MouldAnalysis signal
+    handlers instead of being aggregated on every dashboard view.
+    """
+    LEVEL_FIELDS = {'Low': 'low_count', 'Moderate': 'moderate_count', 'High': 'high_count'}
+
+    user = models.OneToOneField(User, on_delete=models.CASCADE, primary_key=True, related_name='mould_summary')
+    total = models.PositiveIntegerField(default=0)
+    low_count = models.PositiveIntegerField(default=0)
+    moderate_count = models.PositiveIntegerField(default=0)
+    high_count = models.PositiveIntegerField(default=0)
+    latest_id = models.BigIntegerField(null=True, blank=True)
+    latest_index = models.FloatField(null=True, blank=True)
+    latest_at = models.DateTimeField(null=True, blank=True)
+    previous_id = models.BigIntegerField(null=True, blank=True)
+    previous_index = models.FloatField(null=True, blank=True)
+    worst_id = models.BigIntegerField(null=True, blank=True)
+    worst_index = models.FloatField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    @property
+    def trend(self):
+        """Change of the mould index since the analysis before the latest one"""
+        if self.latest_index is None or self.previous_index is None:
+            return None
+        return self.latest_index - self.previous_index
+
+    def record(self, analysis):
+        self.total += 1
+        self._count(analysis.risk_level, 1)
+        if self.latest_at is None or (analysis.uploaded_at, analysis.id) >= (self.latest_at, self.latest_id):
+            self.previous_id, self.previous_index = self.latest_id, self.latest_index
+            self.latest_id, self.latest_index, self.latest_at = analysis.id, analysis.mould_index, analysis.uploaded_at
+        if self.worst_index is None or analysis.mould_index > self.worst_index:
+            self.worst_id, self.worst_index = analysis.id, analysis.mould_index
 
+    def forget(self, analysis):
+        self.total = max(0, self.total - 1)
+        self._count(analysis.risk_level, -1)
+        analyses = MouldAnalysis.objects.filter(user_id=self.user_id).exclude(id=analysis.id)
+        #only removing one of the two latest or the worst analysis needs an (indexed) lookup
+        if analysis.id in (self.latest_id, self.previous_id):
+            self._set_latest(analyses)
+        if analysis.id == self.worst_id:
+            self._set_worst(analyses)
 
+    def _count(self, risk_level, change):
+        field = self.LEVEL_FIELDS.get(risk_level)
+        if field is not None:
+            setattr(self, field, max(0, getattr(self, field) + change))
 
+    def _set_latest(self, analyses):
+        recent = list(analyses.order_by('-uploaded_at', '-id').values('id', 'mould_index', 'uploaded_at')[:2])
+        latest = recent[0] if recent else {'id': None, 'mould_index': None, 'uploaded_at': None}
+        self.latest_id, self.latest_index, self.latest_at = latest['id'], latest['mould_index'], latest['uploaded_at']
+        previous = recent[1] if len(recent) > 1 else {'id': None, 'mould_index': None}
+        self.previous_id, self.previous_index = previous['id'], previous['mould_index']
 
+    def _set_worst(self, analyses):
+        worst = analyses.order_by('-mould_index', '-id').values('id', 'mould_index').first()
+        self.worst_id, self.worst_index = (worst['id'], worst['mould_index']) if worst else (None, None)
 
+    @classmethod
+    def rebuild(cls, user_id):
+        """Recompute a user's summary from their analyses (first use, or after bulk changes)"""
+        analyses = MouldAnalysis.objects.filter(user_id=user_id)
+        summary = cls(user_id=user_id)
+        for row in analyses.values('risk_level').annotate(count=models.Count('id')).order_by():
+            summary.total += row['count']
+            summary._count(row['risk_level'], row['count'])
+        summary._set_latest(analyses)
+        summary._set_worst(analyses)
+        summary.save()
+        return summary
+
+    def __str__(self):
+        return f"Summary for {self.user} ({self.total} analyses)"
+
+
+class AnalysisJob(models.Model):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [(QUEUED, 'Queued'), (RUNNING, 'Running'), (DONE, 'Done'), (FAILED, 'Failed')]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True)
+    session_key = models.CharField(max_length=40, blank=True, default='')
+    filename = models.CharField(max_length=200)
+    file_path = models.CharField(max_length=500)
+    content_hash = models.CharField(max_length=64)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    progress = models.PositiveSmallIntegerField(default=0)
+    error = models.TextField(blank=True, default='')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    worker = models.CharField(max_length=100, blank=True, default='')
+    analysis = models.ForeignKey(MouldAnalysis, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    heartbeat_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'created_at'])]
+
+    def is_owned_by(self, request):
+        if self.user_id is not None:
+            return request.user.is_authenticated and request.user.id == self.user_id
+        return bool(self.session_key) and self.session_key == request.session.session_key
+
+    def __str__(self):
+        return f"{self.filename} ({self.status}, {self.progress}%)"
@@ -0,0 +1,104 @@
+"""
+Progress of running uploads for the Server-Sent Events stream.
+
+upload.js picks a random token, opens /uploads/<token>/events/ and posts the
+file with that token as `progress_token`. The upload view publishes every
+stage (saving, parsing, simulating, storing) to the board, and the events
+view streams each change until the upload is done or has failed.
+
+The upload and its event stream usually land on different worker processes,
+so with MOULD_PROGRESS_DIR set the board keeps each token's state in a small
+JSON file there, shared by every worker on the host (the same approach as the
+admission slot files). Without it the board lives in the process's memory,
+which is only enough for a single worker.
+"""
+import json
+import os
+import threading
+import time
+
+from django.conf import settings
+
+#finished or abandoned uploads are forgotten after this many seconds
+PROGRESS_TTL = 600
+
+
+class ProgressBoard:
+    """
+    Token -> latest progress state, with a version per token that increases on every change.
+    `directory` overrides settings.MOULD_PROGRESS_DIR.
+    """
+    def __init__(self, ttl=PROGRESS_TTL, directory=None):
+        self.ttl = ttl
+        self.directory = directory
+        self._states = {}
+        self._lock = threading.Lock()
+
+    def _shared_directory(self):
+        return self.directory or getattr(settings, 'MOULD_PROGRESS_DIR', None)
+
+    def publish(self, token, **state):
+        directory = self._shared_directory()
+        if directory is None:
+            now = time.monotonic()
+            with self._lock:
+                version = self._states.get(token, (0, None, None))[0] + 1
+                self._states[token] = (version, now, state)
+                stale = [key for key, (_, updated, _) in self._states.items() if now - updated > self.ttl]
+                for key in stale:
+                    del self._states[key]
+            return
+
+        os.makedirs(directory, exist_ok=True)
+        version = self.snapshot(token)[0] + 1
+        path = os.path.join(directory, f"{token}.json")
+        #write and rename, so readers in other processes never see half a state
+        tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp, 'w') as f:
+            json.dump({'version': version, 'state': state}, f)
+        os.replace(tmp, path)
+        self._sweep(directory)
+
+    def snapshot(self, token):
+        """(version, state) of a token, or (0, None) when nothing was published for it"""
+        directory = self._shared_directory()
+        if directory is None:
+            with self._lock:
+                version, _, state = self._states.get(token, (0, None, None))
+                return version, state
+        try:
+            with open(os.path.join(directory, f"{token}.json")) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return 0, None
+        return data['version'], data['state']
+
+    def _sweep(self, directory):
+        now = time.time()
+        for entry in os.scandir(directory):
+            try:
+                if now - entry.stat().st_mtime > self.ttl:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
+
+    def clear(self):
+        with self._lock:
+            self._states.clear()
+        directory = self._shared_directory()
+        if directory is not None and os.path.isdir(directory):
+            for entry in os.scandir(directory):
+                try:
+                    os.remove(entry.path)
+                except FileNotFoundError:
+                    pass
+
+
+progress_board = ProgressBoard()
+
+
+"""progress(percent, stage) callback that publishes running-stage updates for `token` (a no-op without one)"""
+def progress_reporter(token):
+    if token is None:
+        return lambda percent, stage=None: None
+    return lambda percent, stage=None: progress_board.publish(token, status='running', percent=percent, stage=stage)
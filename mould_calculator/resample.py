@@ -0,0 +1,111 @@
+"""
+Resampling of standardized readings onto a fixed time grid.
+
+High-frequency loggers produce far more rows than the mould model needs, and
+irregular sampling skews the rolling window, which is sized from the median
+interval. `resample_readings` averages the readings into buckets of
+`interval_minutes` (bucket start as the timestamp) with bincount, so the
+simulation runs on one row per bucket whatever the logger's rate.
+
+Buckets without readings are gaps, handled by the gap policy:
+
+- 'mask': empty buckets are left out and the simulation steps over them
+  with a longer time delta, as it does for gaps in raw data;
+- 'interpolate': gaps of up to `max_gap_minutes` are filled by linear
+  interpolation; longer gaps are masked;
+- 'segment': gaps longer than `max_gap_minutes` split the readings into
+  segments and only the latest segment is kept; shorter gaps are masked.
+
+Every call returns a report of what was done next to the resampled frame.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+GAP_POLICIES = ('mask', 'interpolate', 'segment')
+DEFAULT_GAP_POLICY = 'interpolate'
+DEFAULT_MAX_GAP_MINUTES = 60
+
+Resampling = namedtuple('Resampling', ['interval_minutes', 'gap_policy', 'max_gap_minutes'],
+                        defaults=(DEFAULT_GAP_POLICY, DEFAULT_MAX_GAP_MINUTES))
+
+
+"""Check a Resampling, raising ValueError for unusable settings"""
+def validate_resampling(resampling):
+    if not resampling.interval_minutes or resampling.interval_minutes <= 0:
+        raise ValueError("Resampling interval must be a positive number of minutes")
+    if resampling.gap_policy not in GAP_POLICIES:
+        raise ValueError(f"Unknown gap policy: {resampling.gap_policy}")
+    if resampling.max_gap_minutes < 0:
+        raise ValueError("max_gap_minutes must not be negative")
+    return resampling
+
+
+def _epoch_nanoseconds(timestamps):
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        #mixed UTC offsets stay as objects after parsing
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    index = pd.DatetimeIndex(timestamps)
+    return index.as_unit('ns').asi8, index.tz
+
+
+def _filled_positions(occupied, missing, fill):
+    counts = missing[fill]
+    starts = np.repeat(occupied[:-1][fill] + 1, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    return starts + offsets
+
+
+"""
+Resample a standardized frame (sorted by Timestamp) onto `resampling.interval_minutes` buckets.
+Returns (resampled Timestamp/Temperature/Humidity frame, report dict).
+"""
+def resample_readings(standardized, resampling):
+    validate_resampling(resampling)
+    step = int(round(resampling.interval_minutes * 60 * 1e9))
+    max_missing = int(resampling.max_gap_minutes // resampling.interval_minutes)
+
+    ns, tz = _epoch_nanoseconds(standardized['Timestamp'])
+    origin = (ns.min() // step) * step if len(ns) else 0
+    positions = (ns - origin) // step
+    occupied, inverse, counts = np.unique(positions, return_inverse=True, return_counts=True)
+    temperature = np.bincount(inverse, weights=standardized['Temperature'].to_numpy(dtype=float)) / counts
+    humidity = np.bincount(inverse, weights=standardized['Humidity'].to_numpy(dtype=float)) / counts
+
+    missing = np.diff(occupied) - 1
+    gaps = missing > 0
+    long_gaps = missing > max_missing
+    report = {
+        'interval_minutes': resampling.interval_minutes,
+        'gap_policy': resampling.gap_policy,
+        'max_gap_minutes': resampling.max_gap_minutes,
+        'input_rows': len(standardized),
+        'gaps': int(gaps.sum()),
+        'long_gaps': int(long_gaps.sum()),
+        'longest_gap_minutes': float(missing.max(initial=0) * resampling.interval_minutes),
+        'interpolated_buckets': 0,
+        'segments': int(long_gaps.sum()) + 1 if len(occupied) else 0,
+        'dropped_rows': 0,
+    }
+
+    if resampling.gap_policy == 'interpolate':
+        filled = _filled_positions(occupied, missing, gaps & ~long_gaps)
+        if len(filled):
+            grid = np.sort(np.concatenate([occupied, filled]))
+            temperature = np.interp(grid, occupied, temperature)
+            humidity = np.interp(grid, occupied, humidity)
+            occupied = grid
+            report['interpolated_buckets'] = len(filled)
+    elif resampling.gap_policy == 'segment' and long_gaps.any():
+        first = int(np.flatnonzero(long_gaps)[-1]) + 1
+        report['dropped_rows'] = int(counts[:first].sum())
+        occupied, temperature, humidity = occupied[first:], temperature[first:], humidity[first:]
+
+    timestamps = pd.DatetimeIndex(origin + occupied * step)
+    if tz is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(tz)
+    resampled = pd.DataFrame({'Timestamp': timestamps, 'Temperature': temperature, 'Humidity': humidity})
+    report['output_rows'] = len(resampled)
+    report['reduction'] = round(len(standardized) / len(resampled), 2) if len(resampled) else None
+    return resampled, report
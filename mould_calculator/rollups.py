@@ -0,0 +1,134 @@
+"""
+Daily and weekly rollups of an analysed dataset.
+
+`reading_frame` runs the model once over the analysed window (or takes the M
+series stored in the sidecar) and returns one
+row per reading: the mould index M, temperature, humidity and the hours the
+reading stands for. `compute_rollups` groups those rows by local calendar day
+and by week (starting on Monday) into min/mean/max of M, RH and temperature
+plus the hours spent at or above RH_crit. The rollups are stored with the
+analysis, so range queries and comparisons between analyses never go back to
+the readings. `combine_rollups` merges the rollups of consecutive parts of a
+window, so a long window can be rolled up one chunk at a time.
+`analyse_readings` derives the risk summary from the same run as the frame.
+"""
+import numpy as np
+import pandas as pd
+
+from .engine import mould_index_trajectory, rh_crit_array
+from .utils import prepare_window, risk_summary, simulation_readings
+
+PERIODS = ('day', 'week')
+ROLLUP_FIELDS = (
+    'readings', 'hours',
+    'm_min', 'm_mean', 'm_max',
+    'rh_min', 'rh_mean', 'rh_max',
+    'temp_min', 'temp_mean', 'temp_max',
+    'hours_above_rh_crit',
+)
+
+
+"""
+Per-reading M, temperature, humidity and hours over the analysed window of a standardized frame.
+`mould_index` is the stored M series of that window (sidecar.load_series); the model only runs
+when there is none or it doesn't cover the window.
+"""
+def reading_frame(standardized, rolling_window=None, mould_index=None):
+    return _window_frame(standardized, rolling_window, mould_index)[0]
+
+
+def _window_frame(standardized, rolling_window=None, mould_index=None):
+    recent_data, time_delta_hours, rolling_queue_maxlen, used_timeframe, _ = prepare_window(standardized, rolling_window)
+    humidity = recent_data['Humidity'].to_numpy(dtype=float)
+    temperature = recent_data['Temperature'].to_numpy(dtype=float)
+    hours = time_delta_hours.to_numpy(dtype=float)
+    if mould_index is not None and len(mould_index) == len(humidity):
+        trajectory = np.asarray(mould_index, dtype=float)
+    else:
+        trajectory = mould_index_trajectory(humidity, temperature, hours, rolling_queue_maxlen)
+    if len(trajectory) != len(humidity):
+        #no simulation steps: M stays at its starting value, as in analyse_dataframe
+        trajectory = np.full(len(humidity), 0.1)
+    frame = pd.DataFrame({
+        'Timestamp': recent_data['Timestamp'].reset_index(drop=True),
+        'M': trajectory,
+        'Temperature': temperature,
+        'Humidity': humidity,
+        'Hours': hours,
+    })
+    return frame, used_timeframe
+
+
+"""
+Risk summary and reading_frame of a standardized frame from a single run of the model. With a
+resample.Resampling both come from the resampled readings, so the summary, the stored series and
+the rollups agree. Raises ValueError when the data can't be analysed.
+"""
+def analyse_readings(standardized, rolling_window=None, resampling=None):
+    if standardized.empty:
+        raise ValueError("No valid data after standardization")
+    readings, resample_report = simulation_readings(standardized, resampling)
+    frame, used_timeframe = _window_frame(readings, rolling_window)
+    return risk_summary(float(frame['M'].iloc[-1]), standardized, used_timeframe, resample_report), frame
+
+
+def _local_days(timestamps):
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        #mixed UTC offsets stay as objects after parsing
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    if timestamps.dt.tz is not None:
+        #group by the logger's wall-clock dates
+        timestamps = timestamps.dt.tz_localize(None)
+    return timestamps.dt.normalize()
+
+
+"""Rollups of a reading_frame; returns {period: DataFrame indexed by period start date, one column per ROLLUP_FIELDS}"""
+def compute_rollups(frame):
+    days = _local_days(frame['Timestamp'])
+    above = frame['Humidity'].to_numpy() >= rh_crit_array(frame['Temperature'])
+    values = pd.DataFrame({
+        'M': frame['M'],
+        'RH': frame['Humidity'],
+        'T': frame['Temperature'],
+        'hours': frame['Hours'],
+        'above': frame['Hours'] * above,
+    })
+    starts = {
+        'day': days,
+        'week': days - pd.to_timedelta(days.dt.weekday, unit='D'),
+    }
+
+    rollups = {}
+    for period in PERIODS:
+        grouped = values.groupby(starts[period].to_numpy())
+        table = grouped.agg(
+            readings=('M', 'size'), hours=('hours', 'sum'),
+            m_min=('M', 'min'), m_mean=('M', 'mean'), m_max=('M', 'max'),
+            rh_min=('RH', 'min'), rh_mean=('RH', 'mean'), rh_max=('RH', 'max'),
+            temp_min=('T', 'min'), temp_mean=('T', 'mean'), temp_max=('T', 'max'),
+            hours_above_rh_crit=('above', 'sum'),
+        )
+        table.index = pd.DatetimeIndex(table.index).date
+        rollups[period] = table[list(ROLLUP_FIELDS)]
+    return rollups
+
+
+"""
+Rollups of a window from those of two consecutive parts of it (`first` may be None).
+Counts and hours add up, minima and maxima combine and means are weighted by readings.
+"""
+def combine_rollups(first, second):
+    if first is None:
+        return second
+    means = [field for field in ROLLUP_FIELDS if field.endswith('_mean')]
+    aggregations = {field: 'sum' for field in ('readings', 'hours', 'hours_above_rh_crit')}
+    aggregations.update({field: field[field.rindex('_') + 1:] for field in ROLLUP_FIELDS if field.endswith(('_min', '_max'))})
+    combined = {}
+    for period in PERIODS:
+        table = pd.concat([first[period], second[period]])
+        grouped = table.groupby(level=0)
+        merged = grouped.agg(aggregations)
+        weighted = table[means].mul(table['readings'], axis=0).groupby(level=0).sum()
+        merged[means] = weighted.div(merged['readings'], axis=0)
+        combined[period] = merged[list(ROLLUP_FIELDS)]
+    return combined
@@ -0,0 +1,144 @@
+"""
+Column mapping and timestamp format resolution for logger CSVs.
+
+Vendors send the same headers every time, so the resolved column mapping and
+the datetime format are cached under a signature of the (lower-cased) header.
+On a cache hit timestamps are parsed with the explicit format; if a file with a
+known header uses a different format, parsing falls back to pandas inference
+and the cached format is dropped.
+"""
+import threading
+import warnings
+from collections import OrderedDict, namedtuple
+
+import pandas as pd
+from pandas.tseries.api import guess_datetime_format
+
+from .tracing import current_trace
+
+TIMESTAMP_COLUMNS = [
+    'timestamp', 'local date/time', 'utc date/time', 'date/time', 'date',
+    'time', 'datetime', 'measurement time'
+]
+
+TEMPERATURE_COLUMNS = [
+    'temperature', 'temperature (°c)', 'temperature (c)', 'temperature (ºc)',
+    'heat index (°c)', 'temp', 'temp(°c)', 'temp(c)', 'temp °c', 'temp c',
+    't(°c)', 't(c)', 't °c', 't c'
+]
+
+HUMIDITY_COLUMNS = [
+    'humidity', 'humidity (%)', 'relative humidity', 'rh (%)', 'rh',
+    'humidity%', 'rh%', 'relative humidity (%)', 'humidity level'
+]
+
+#long-format exports from multi-sensor systems name the logger of each reading
+SENSOR_COLUMNS = [
+    'sensor_id', 'sensor id', 'sensor', 'device_id', 'device id', 'device',
+    'logger_id', 'logger id', 'logger', 'serial', 'station'
+]
+
+SCHEMA_CACHE_SIZE = 256
+
+Schema = namedtuple('Schema', ['signature', 'timestamp', 'temperature', 'humidity', 'datetime_format', 'sensor'],
+                    defaults=(None,))
+
+_schemas = OrderedDict()
+_schemas_lock = threading.Lock()
+schema_cache_stats = {'hits': 0, 'misses': 0}
+
+
+"""Find the timestamp, temperature and humidity columns among lower-cased column names"""
+def resolve_columns(columns):
+    timestamp_col = next((col for col in columns if any(name in col for name in TIMESTAMP_COLUMNS)), None)
+    temperature_col = next((col for col in columns if any(name in col for name in TEMPERATURE_COLUMNS)), None)
+    humidity_col = next((col for col in columns if any(name in col for name in HUMIDITY_COLUMNS)), None)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.event('columns', available=list(columns), timestamp=timestamp_col,
+                    temperature=temperature_col, humidity=humidity_col)
+
+    if not all([timestamp_col, temperature_col, humidity_col]):
+        missing_cols = []
+        if not timestamp_col: missing_cols.append("Timestamp")
+        if not temperature_col: missing_cols.append("Temperature")
+        if not humidity_col: missing_cols.append("Humidity")
+        raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+
+    return timestamp_col, temperature_col, humidity_col
+
+
+"""Find the optional sensor/device id column among the columns not already used for readings"""
+def resolve_sensor_column(columns, used):
+    return next((col for col in columns if col not in used and any(name in col for name in SENSOR_COLUMNS)), None)
+
+
+"""Cache key for a CSV header"""
+def header_signature(columns):
+    return "\x1f".join(str(col) for col in columns)
+
+
+"""Guess the strftime format of a timestamp column from its first non-empty value"""
+def guess_timestamp_format(values):
+    if not (pd.api.types.is_object_dtype(values) or pd.api.types.is_string_dtype(values)):
+        return None
+    first = values.dropna()
+    if first.empty:
+        return None
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        return guess_datetime_format(str(first.iloc[0]))
+
+
+"""Column mapping and datetime format for a frame with lower-cased column names"""
+def resolve_schema(df):
+    signature = header_signature(df.columns)
+    with _schemas_lock:
+        schema = _schemas.get(signature)
+        if schema is not None:
+            _schemas.move_to_end(signature)
+            schema_cache_stats['hits'] += 1
+        else:
+            schema_cache_stats['misses'] += 1
+    cached = schema is not None
+
+    if not cached:
+        timestamp_col, temperature_col, humidity_col = resolve_columns(df.columns)
+        sensor_col = resolve_sensor_column(df.columns, (timestamp_col, temperature_col, humidity_col))
+        schema = Schema(signature, timestamp_col, temperature_col, humidity_col,
+                        guess_timestamp_format(df[timestamp_col]), sensor_col)
+        _store(schema)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.event('schema', cached=cached, timestamp=schema.timestamp, temperature=schema.temperature,
+                    humidity=schema.humidity, datetime_format=schema.datetime_format, sensor=schema.sensor)
+    return schema
+
+
+def _store(schema):
+    with _schemas_lock:
+        _schemas[schema.signature] = schema
+        _schemas.move_to_end(schema.signature)
+        while len(_schemas) > SCHEMA_CACHE_SIZE:
+            _schemas.popitem(last=False)
+
+
+"""Parse a timestamp column, using the schema's explicit format when there is one"""
+def parse_timestamps(values, schema):
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values
+    if schema.datetime_format is not None:
+        try:
+            return pd.to_datetime(values, format=schema.datetime_format)
+        except (ValueError, TypeError):
+            #same header, different format: forget it and let pandas infer
+            _store(schema._replace(datetime_format=None))
+    return pd.to_datetime(values)
+
+
+def clear_schema_cache():
+    with _schemas_lock:
+        _schemas.clear()
+        schema_cache_stats.update(hits=0, misses=0)
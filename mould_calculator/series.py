@@ -0,0 +1,223 @@
+"""
+Downsampled time series for charts.
+
+A dataset's full-resolution series (smoothed mould index M, temperature and
+humidity against epoch seconds) is turned once into a pyramid of coarser
+levels. Level 0 holds every reading; each further level aggregates
+PYRAMID_FACTOR times more level 0 readings per bucket into min, max and
+mean, until a level has at most MIN_LEVEL_POINTS buckets. Pyramids are
+stored as memory-mapped .npy files in a directory per content hash, so
+zooming in or out only reads the slice of the best-fitting level and trims
+it to the requested number of points. The mould model is not run again, and
+not even for the build when the upload's sidecar holds its M series.
+
+Responses are columnar: parallel arrays and integer epoch seconds instead
+of one dict per point.
+"""
+import os
+import shutil
+
+import numpy as np
+import pandas as pd
+
+from .engine import mould_index_trajectory, smooth_series
+from .sidecar import load_series, touch
+from .utils import ALGORITHM_VERSION, prepare_window
+
+SERIES = ('mould_index', 'temperature', 'humidity')
+STATS = ('min', 'max', 'mean')
+METHODS = ('minmax', 'lttb')
+PYRAMID_FACTOR = 4
+MIN_LEVEL_POINTS = 256
+DEFAULT_POINTS = 1000
+MAX_POINTS = 10_000
+
+
+"""Epoch seconds (UTC) of a timestamp column"""
+def epoch_seconds(timestamps):
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        #mixed UTC offsets stay as objects after parsing
+        timestamps = pd.to_datetime(timestamps, utc=True)
+    index = pd.DatetimeIndex(timestamps)
+    if index.tz is not None:
+        index = index.tz_convert('UTC').tz_localize(None)
+    return index.as_unit('s').asi8
+
+
+"""
+Full-resolution series of a standardized frame, over the same window as the analysis.
+`mould_index` is the stored M series of that window (sidecar.load_series); the model only runs
+when there is none or it doesn't cover the window.
+"""
+def build_series(standardized, rolling_window=None, mould_index=None):
+    recent_data, time_delta_hours, rolling_queue_maxlen, _, _ = prepare_window(standardized, rolling_window)
+    if mould_index is not None and len(mould_index) == len(recent_data):
+        trajectory = np.asarray(mould_index, dtype=float)
+    else:
+        trajectory = mould_index_trajectory(
+            recent_data['Humidity'].to_numpy(dtype=float),
+            recent_data['Temperature'].to_numpy(dtype=float),
+            time_delta_hours.to_numpy(dtype=float),
+            rolling_queue_maxlen,
+        )
+    return {
+        't': epoch_seconds(recent_data['Timestamp']),
+        'mould_index': smooth_series(trajectory),
+        'temperature': recent_data['Temperature'].to_numpy(dtype=float),
+        'humidity': recent_data['Humidity'].to_numpy(dtype=float),
+    }
+
+
+def _aggregate(t, columns, starts):
+    counts = np.diff(np.append(starts, len(t)))
+    level = {'t': t[starts]}
+    for name, values in columns.items():
+        level[f'{name}_min'] = np.minimum.reduceat(values, starts)
+        level[f'{name}_max'] = np.maximum.reduceat(values, starts)
+        level[f'{name}_mean'] = np.add.reduceat(values, starts) / counts
+    return level
+
+
+"""Multi-resolution levels of a full-resolution series; returns a flat dict of named arrays"""
+def build_pyramid(series):
+    t = series['t']
+    arrays = {'L0_t': t}
+    for name in SERIES:
+        arrays[f'L0_{name}'] = series[name]
+
+    level, bucket = 0, 1
+    while len(t) > MIN_LEVEL_POINTS * bucket:
+        level += 1
+        bucket *= PYRAMID_FACTOR
+        starts = np.arange(0, len(t), bucket)
+        for key, values in _aggregate(t, {name: series[name] for name in SERIES}, starts).items():
+            arrays[f'L{level}_{key}'] = values
+    return arrays
+
+
+def pyramid_dir(directory, content_hash):
+    return os.path.join(directory, f"v{ALGORITHM_VERSION}", content_hash)
+
+
+"""Write pyramid arrays as .npy files, swapping the directory in so readers never see a partial pyramid"""
+def save_pyramid(path, arrays):
+    tmp = f"{path}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for key, values in arrays.items():
+        np.save(os.path.join(tmp, f"{key}.npy"), np.ascontiguousarray(values))
+    shutil.rmtree(path, ignore_errors=True)
+    os.replace(tmp, path)
+
+
+"""Memory-mapped pyramid arrays, or None when the pyramid hasn't been built"""
+def load_pyramid(path):
+    try:
+        names = os.listdir(path)
+    except OSError:
+        return None
+    touch(path)
+    return {name[:-4]: np.load(os.path.join(path, name), mmap_mode='r') for name in names if name.endswith('.npy')}
+
+
+"""
+Stored pyramid for `content_hash`, building and saving it from `standardized_source()` if needed.
+The build reuses the M series stored in the sidecar of `source_path` when it has one.
+"""
+def load_or_build_pyramid(directory, content_hash, standardized_source, rolling_window=None, source_path=None):
+    path = pyramid_dir(directory, content_hash)
+    pyramid = load_pyramid(path)
+    if pyramid is None:
+        stored = load_series(source_path) if source_path is not None and rolling_window is None else None
+        mould_index = None if stored is None else stored[1]
+        save_pyramid(path, build_pyramid(build_series(standardized_source(), rolling_window, mould_index)))
+        pyramid = load_pyramid(path)
+    return pyramid
+
+
+def _levels(pyramid):
+    return sum(1 for key in pyramid if key.endswith('_t'))
+
+
+def _level(pyramid, level):
+    if level == 0:
+        columns = {}
+        for name in SERIES:
+            values = pyramid[f'L0_{name}']
+            columns.update({f'{name}_{stat}': values for stat in STATS})
+        return pyramid['L0_t'], columns
+    return pyramid[f'L{level}_t'], {f'{name}_{stat}': pyramid[f'L{level}_{name}_{stat}']
+                                    for name in SERIES for stat in STATS}
+
+
+"""
+Indices picked by Largest-Triangle-Three-Buckets: `threshold` points of (x, y) that
+keep the visual shape of the line. Always keeps the first and last point; `threshold` must be at least 3.
+"""
+def lttb(x, y, threshold):
+    n = len(x)
+    if threshold >= n:
+        return np.arange(n)
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    picked = np.empty(threshold, dtype=int)
+    picked[0], picked[-1] = 0, n - 1
+    a = 0
+    for i in range(threshold - 2):
+        start, end = edges[i], edges[i + 1]
+        #average of the next bucket (or the last point) is the third triangle corner
+        next_end = edges[i + 2] if i + 2 < len(edges) else n
+        avg_x = x[end:next_end].mean()
+        avg_y = y[end:next_end].mean()
+        areas = np.abs((x[a] - avg_x) * (y[start:end] - y[a]) - (x[a] - x[start:end]) * (avg_y - y[a]))
+        a = start + int(np.argmax(areas))
+        picked[i + 1] = a
+    return picked
+
+
+"""
+Downsample a pyramid to at most `points` points between epoch seconds `start` and `end`.
+Uses the finest level that has at most PYRAMID_FACTOR * points buckets in the range.
+'minmax' returns min/max envelopes per series; 'lttb' returns one value per point,
+picked by LTTB on the mould index.
+"""
+def query_pyramid(pyramid, start=None, end=None, points=DEFAULT_POINTS, method='minmax'):
+    if method not in METHODS:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    points = max(3, min(int(points), MAX_POINTS))
+
+    levels = _levels(pyramid)
+    for level in range(levels):
+        t = pyramid[f'L{level}_t']
+        lo = 0 if start is None else int(np.searchsorted(t, start, side='left'))
+        hi = len(t) if end is None else int(np.searchsorted(t, end, side='right'))
+        if hi - lo <= PYRAMID_FACTOR * points or level == levels - 1:
+            break
+    t, columns = _level(pyramid, level)
+    #bucket containing `start` starts before it
+    if level > 0 and start is not None and 0 < lo and (lo == len(t) or t[lo] > start):
+        lo -= 1
+    t = t[lo:hi]
+    columns = {key: values[lo:hi] for key, values in columns.items()}
+
+    payload = {'method': method, 'level': level}
+    if method == 'lttb':
+        picked = lttb(t, columns['mould_index_mean'], points)
+        payload['t'] = t[picked].tolist()
+        for name in SERIES:
+            payload[name] = columns[f'{name}_mean'][picked].tolist()
+        return payload
+
+    if len(t) > points:
+        starts = np.linspace(0, len(t), points, endpoint=False).astype(int)
+        minima = {name: np.minimum.reduceat(columns[f'{name}_min'], starts) for name in SERIES}
+        maxima = {name: np.maximum.reduceat(columns[f'{name}_max'], starts) for name in SERIES}
+        t = t[starts]
+    else:
+        minima = {name: columns[f'{name}_min'] for name in SERIES}
+        maxima = {name: columns[f'{name}_max'] for name in SERIES}
+    payload['t'] = t.tolist()
+    for name in SERIES:
+        payload[name] = {'min': minima[name].tolist(), 'max': maxima[name].tolist()}
+    return payload
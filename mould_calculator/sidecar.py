@@ -0,0 +1,269 @@
+"""
+Binary sidecar storage for standardized readings.
+
+Next to an uploaded CSV we keep a `<name>.mould/` directory with the
+standardized columns as plain .npy arrays (int64 epoch nanoseconds and float64
+temperature/humidity) plus a small meta.json. Reading a dataset back is a
+memory-map of those arrays instead of a CSV parse. The sidecar is ignored and
+rebuilt when its version is outdated or the source file changed.
+
+Temperature and humidity stay float64, so analyses from the sidecar produce
+exactly the same index as analyses from the CSV. The sidecar can also hold the
+computed mould index series (M per reading of the analysed window, float32 for
+charts and rollups, with its own timestamps when the upload was resampled); it is
+tied to ALGORITHM_VERSION and ignored after a bump. For a file with several sensors
+the sidecar holds the readings of the sensor at highest risk and names it in its meta.
+
+Large files don't have to be read whole: `SidecarWriter` appends standardized
+chunks to the arrays as they are parsed and memory-maps the result, so the
+analysis and the M series can be computed from the sidecar afterwards.
+"""
+import json
+import os
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+
+from .utils import ALGORITHM_VERSION, STANDARDIZED_ATTR
+
+SIDECAR_VERSION = 1
+SIDECAR_SUFFIX = '.mould'
+COLUMNS = ('timestamp', 'temperature', 'humidity')
+DTYPES = {'timestamp': 'int64', 'temperature': 'float64', 'humidity': 'float64'}
+
+
+"""Directory holding the sidecar of a source file"""
+def sidecar_dir(source_path):
+    return f"{source_path}{SIDECAR_SUFFIX}"
+
+
+def _source_fingerprint(source_path):
+    stat = os.stat(source_path)
+    return {'source_size': stat.st_size, 'source_mtime_ns': stat.st_mtime_ns}
+
+
+def _meta(source_path, rows, tz, series_rows=None, sensor=None):
+    meta = dict(_source_fingerprint(source_path), version=SIDECAR_VERSION, rows=rows, tz=tz, sensor=sensor)
+    if series_rows is not None:
+        meta.update(series_rows=series_rows, algorithm_version=ALGORITHM_VERSION)
+    return meta
+
+
+"""Sidecar arrays and time zone of a standardized frame, or None when its timestamps can't be stored"""
+def column_arrays(standardized):
+    timestamps = standardized['Timestamp']
+    if not pd.api.types.is_datetime64_any_dtype(timestamps):
+        #mixed UTC offsets parse to objects; keep using the CSV for those files
+        return None
+
+    tz = None
+    if getattr(timestamps.dt, 'tz', None) is not None:
+        tz = str(timestamps.dt.tz)
+        timestamps = timestamps.dt.tz_convert('UTC').dt.tz_localize(None)
+
+    arrays = {
+        'timestamp': timestamps.dt.as_unit('ns').to_numpy().view('int64'),
+        'temperature': standardized['Temperature'].to_numpy(dtype='float64'),
+        'humidity': standardized['Humidity'].to_numpy(dtype='float64'),
+    }
+    return arrays, tz
+
+
+"""
+Write the sidecar for a standardized frame; returns False when the timestamps can't be stored.
+`mould_index` is the M series of the last len(mould_index) readings, if it should be kept too;
+`series_timestamps` are its own timestamps when it was simulated on other readings (resampled ones).
+`sensor` is the id of the sensor whose readings `standardized` holds, for files with several sensors.
+"""
+def write_sidecar(source_path, standardized, mould_index=None, series_timestamps=None, sensor=None):
+    columns = column_arrays(standardized)
+    if columns is None:
+        return False
+    arrays, tz = columns
+    meta = _meta(source_path, len(standardized), tz, sensor=sensor)
+    if mould_index is not None:
+        arrays['mould_index'] = np.asarray(mould_index, dtype='float32')
+        meta = _meta(source_path, len(standardized), tz, series_rows=len(mould_index), sensor=sensor)
+        if series_timestamps is not None:
+            series_columns = column_arrays(pd.DataFrame({'Timestamp': series_timestamps, 'Temperature': np.nan,
+                                                         'Humidity': np.nan}))
+            if series_columns is None:
+                return False
+            arrays['series_timestamp'] = series_columns[0]['timestamp']
+            meta['series_timestamps'] = True
+
+    #build in a temporary directory and swap it in, so readers never see half a sidecar
+    target = sidecar_dir(source_path)
+    tmp = f"{target}.{os.getpid()}.tmp"
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    for name, values in arrays.items():
+        np.save(os.path.join(tmp, f"{name}.npy"), np.ascontiguousarray(values))
+    with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+        json.dump(meta, f)
+    shutil.rmtree(target, ignore_errors=True)
+    os.replace(tmp, target)
+    return True
+
+
+def _array_header(name, rows):
+    return {'descr': np.lib.format.dtype_to_descr(np.dtype(DTYPES[name])), 'fortran_order': False, 'shape': (rows,)}
+
+
+class SidecarWriter:
+    """
+    Builds the sidecar of `source_path` from standardized chunks in time order, one chunk at a
+    time. `readings()` memory-maps the arrays written so far, `series(rows)` adds a writable
+    M series, `commit()` swaps the sidecar in and `abort()` throws it away.
+    """
+    def __init__(self, source_path):
+        self.source_path = source_path
+        self.target = sidecar_dir(source_path)
+        self.tmp = f"{self.target}.{os.getpid()}.{threading.get_ident()}.tmp"
+        shutil.rmtree(self.tmp, ignore_errors=True)
+        os.makedirs(self.tmp)
+        #.npy files whose header is rewritten with the final row count; numpy pads headers so the length stays the same
+        self.files = {}
+        for name in COLUMNS:
+            f = open(os.path.join(self.tmp, f"{name}.npy"), 'wb')
+            np.lib.format.write_array_header_1_0(f, _array_header(name, 0))
+            self.files[name] = f
+        self.rows = 0
+        self.tz = None
+        self.storable = True
+        self.series_rows = None
+
+    def append(self, standardized):
+        """Append a chunk; returns False, and ignores every later chunk, once timestamps can't be stored"""
+        columns = column_arrays(standardized) if self.storable else None
+        if columns is None or (self.rows and columns[1] != self.tz):
+            self.storable = False
+            return False
+        arrays, self.tz = columns
+        for name, f in self.files.items():
+            f.write(np.ascontiguousarray(arrays[name]).tobytes())
+        self.rows += len(standardized)
+        return True
+
+    def readings(self):
+        """Finish the reading arrays and memory-map them like load_arrays"""
+        for name, f in self.files.items():
+            header_end = f.tell() - self.rows * np.dtype(DTYPES[name]).itemsize
+            f.seek(0)
+            np.lib.format.write_array_header_1_0(f, _array_header(name, self.rows))
+            if f.tell() != header_end:
+                raise ValueError("Sidecar array header changed size")
+            f.close()
+        self.files = {}
+        arrays = {name: np.load(os.path.join(self.tmp, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+        arrays['tz'] = self.tz
+        return arrays
+
+    def series(self, rows):
+        """Writable memory-mapped M series (float32) for the last `rows` readings"""
+        self.series_rows = rows
+        return np.lib.format.open_memmap(os.path.join(self.tmp, 'mould_index.npy'), mode='w+', dtype='float32',
+                                         shape=(rows,))
+
+    def commit(self):
+        with open(os.path.join(self.tmp, 'meta.json'), 'w') as f:
+            json.dump(_meta(self.source_path, self.rows, self.tz, self.series_rows), f)
+        shutil.rmtree(self.target, ignore_errors=True)
+        os.replace(self.tmp, self.target)
+
+    def abort(self):
+        for f in self.files.values():
+            f.close()
+        self.files = {}
+        shutil.rmtree(self.tmp, ignore_errors=True)
+
+
+"""Sidecar metadata if the sidecar exists, matches SIDECAR_VERSION and the source is unchanged"""
+def sidecar_meta(source_path):
+    try:
+        with open(os.path.join(sidecar_dir(source_path), 'meta.json')) as f:
+            meta = json.load(f)
+        fingerprint = _source_fingerprint(source_path)
+    except (OSError, ValueError):
+        return None
+    if meta.get('version') != SIDECAR_VERSION:
+        return None
+    if any(meta.get(key) != value for key, value in fingerprint.items()):
+        return None
+    return meta
+
+
+"""Mark a sidecar or pyramid directory as just used; storage.py evicts the least recently used ones first"""
+def touch(directory):
+    try:
+        os.utime(directory)
+    except OSError:
+        pass
+
+
+"""Memory-mapped sidecar columns, or None when there is no usable sidecar"""
+def load_arrays(source_path):
+    meta = sidecar_meta(source_path)
+    if meta is None:
+        return None
+    directory = sidecar_dir(source_path)
+    try:
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode='r') for name in COLUMNS}
+    except (OSError, ValueError):
+        return None
+    touch(directory)
+    arrays['tz'] = meta['tz']
+    return arrays
+
+
+"""Standardized frame of rows `start`:`stop` of sidecar arrays (as returned by load_arrays)"""
+def arrays_frame(arrays, start=0, stop=None):
+    timestamps = pd.to_datetime(np.asarray(arrays['timestamp'][start:stop]).view('datetime64[ns]'))
+    if arrays['tz'] is not None:
+        timestamps = timestamps.tz_localize('UTC').tz_convert(arrays['tz'])
+    standardized = pd.DataFrame({
+        'Timestamp': timestamps,
+        'Temperature': np.asarray(arrays['temperature'][start:stop]),
+        'Humidity': np.asarray(arrays['humidity'][start:stop]),
+    })
+    standardized.attrs[STANDARDIZED_ATTR] = True
+    return standardized
+
+
+"""Standardized frame read from the sidecar, or None when there is no usable sidecar"""
+def load_standardized(source_path):
+    arrays = load_arrays(source_path)
+    if arrays is None:
+        return None
+    return arrays_frame(arrays)
+
+
+"""Stored (epoch ns timestamps, M) series, memory-mapped, or None when the sidecar has no current series"""
+def load_series(source_path):
+    meta = sidecar_meta(source_path)
+    if meta is None or meta.get('algorithm_version') != ALGORITHM_VERSION:
+        return None
+    directory = sidecar_dir(source_path)
+    try:
+        if meta.get('series_timestamps'):
+            timestamps = np.load(os.path.join(directory, 'series_timestamp.npy'), mmap_mode='r')
+        else:
+            timestamps = np.load(os.path.join(directory, 'timestamp.npy'), mmap_mode='r')
+        mould_index = np.load(os.path.join(directory, 'mould_index.npy'), mmap_mode='r')
+    except (OSError, ValueError):
+        return None
+    touch(directory)
+    return timestamps[len(timestamps) - meta['series_rows']:], mould_index
+
+
+def remove_sidecar(source_path):
+    shutil.rmtree(sidecar_dir(source_path), ignore_errors=True)
+
+
+"""Move the sidecar of a file that was moved from `source_path` to `target_path`, if it has one"""
+def move_sidecar(source_path, target_path):
+    if os.path.isdir(sidecar_dir(source_path)):
+        shutil.rmtree(sidecar_dir(target_path), ignore_errors=True)
+        shutil.move(sidecar_dir(source_path), sidecar_dir(target_path))
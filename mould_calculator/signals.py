@@ -0,0 +1,31 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import MouldAnalysis, MouldSummary
+
+
+@receiver(post_save, sender=MouldAnalysis)
+def record_analysis(sender, instance, created, **kwargs):
+    if not created or instance.user_id is None:
+        return
+    with transaction.atomic():
+        summary = MouldSummary.objects.select_for_update().filter(user_id=instance.user_id).first()
+        if summary is None:
+            #first analysis since summaries were added: start from everything the user has
+            MouldSummary.rebuild(instance.user_id)
+            return
+        summary.record(instance)
+        summary.save()
+
+
+@receiver(post_delete, sender=MouldAnalysis)
+def forget_analysis(sender, instance, **kwargs):
+    if instance.user_id is None:
+        return
+    with transaction.atomic():
+        #no summary means the user is being deleted too, or it will be rebuilt on first use
+        summary = MouldSummary.objects.select_for_update().filter(user_id=instance.user_id).first()
+        if summary is not None:
+            summary.forget(instance)
+            summary.save()
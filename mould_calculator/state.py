@@ -0,0 +1,211 @@
+"""
+Resumable mould index computation.
+
+MouldIndexState keeps everything the recurrence needs to continue where the
+last batch of readings stopped: the current M, the readings still inside the
+rolling window together with their running sums, the last timestamp and the
+last few rounded values used by the smoothing step. Appending readings costs
+time proportional to the number of new rows, not to the length of the history.
+
+The window size (in readings) is fixed when the state is created, so advancing
+a state over several batches gives the same result as a single pass over the
+concatenated readings with that window. When the caller knows no reading will
+ever leave the window (it is at least as long as the whole input), the state
+can be created with track_window=False and keeps only the running sums.
+"""
+from collections import deque
+from itertools import islice
+
+import numpy as np
+import pandas as pd
+
+from .engine import growth_decay_coefficients, rh_crit_array, simulate
+from .utils import is_standardized, prepare_window, standardize_dataframe
+
+SMOOTHING_WINDOW = 5
+STANDARD_COLUMNS = ['Timestamp', 'Temperature', 'Humidity']
+
+
+class MouldIndexState:
+    """
+    Serializable state of the mould index recurrence.
+    """
+    VERSION = 1
+
+    def __init__(self, window_points, default_time_delta_hours=1.0, M=0.1, rh_window=(), temp_window=(),
+                 last_timestamp=None, smoothing_tail=(), rows_processed=0, track_window=True,
+                 window_count=0, rh_sum=0.0, temp_sum=0.0):
+        self.window_points = int(window_points)
+        self.default_time_delta_hours = float(default_time_delta_hours)
+        self.M = M
+        self.track_window = track_window
+        maxlen = max(self.window_points, 0) if track_window else 0
+        self.rh_window = deque(rh_window, maxlen=maxlen)
+        self.temp_window = deque(temp_window, maxlen=maxlen)
+        if track_window:
+            self.window_count = len(self.rh_window)
+            self.rh_sum = float(sum(self.rh_window))
+            self.temp_sum = float(sum(self.temp_window))
+        else:
+            self.window_count = window_count
+            self.rh_sum = float(rh_sum)
+            self.temp_sum = float(temp_sum)
+        self.last_timestamp = pd.Timestamp(last_timestamp) if last_timestamp is not None else None
+        self.smoothing_tail = deque(smoothing_tail, maxlen=SMOOTHING_WINDOW - 1)
+        self.rows_processed = rows_processed
+
+    @classmethod
+    def from_frame(cls, data, rolling_window=None):
+        """
+        Build a state from a full dataset using the same window rules as process_mold_index.
+        Returns the state and the smoothed series for the windowed readings.
+        """
+        standardized_data = _standardized(data)
+        if standardized_data.empty:
+            raise ValueError("No valid data after standardization")
+        recent_data, _, rolling_queue_maxlen, _, median_interval = prepare_window(standardized_data, rolling_window)
+        state = cls(rolling_queue_maxlen, default_time_delta_hours=median_interval / 60.0)
+        series = state.advance(recent_data)
+        return state, series
+
+    @property
+    def mould_index(self):
+        """Current index as a percentage, like process_mold_index's first return value"""
+        return (self.M / 6) * 100
+
+    def advance(self, new_rows, skip_seen=True, with_series=True):
+        """
+        Process readings newer than the last seen timestamp and return their smoothed series.
+        With skip_seen=False rows are taken as-is (the caller guarantees they continue the stream);
+        with_series=False skips building the series and returns [].
+        """
+        standardized_data = _standardized(new_rows)
+        if skip_seen and self.last_timestamp is not None:
+            standardized_data = standardized_data[standardized_data['Timestamp'] > self.last_timestamp]
+        stepped = self._step(standardized_data)
+        if stepped is None or not with_series:
+            return []
+
+        labels = standardized_data['Timestamp'].dt.strftime("%Y-%m-%d %H:%M").tolist()
+        return [
+            {"timestamp": ts, "mould_index": value}
+            for ts, value in zip(labels, stepped[1].tolist())
+        ]
+
+    def trajectory(self, new_rows):
+        """
+        Process readings that continue the stream (taken as-is) and return their unsmoothed M,
+        one value per reading, like rollups.reading_frame.
+        """
+        standardized_data = _standardized(new_rows)
+        stepped = self._step(standardized_data)
+        if stepped is None:
+            return np.full(len(standardized_data), self.M)
+        return stepped[0]
+
+    def _step(self, standardized_data):
+        """Run the recurrence over standardized rows; returns their (M, smoothed M), or None when nothing was simulated"""
+        n = len(standardized_data)
+        if n == 0:
+            return None
+
+        timestamps = standardized_data['Timestamp']
+        rh = standardized_data['Humidity'].to_numpy(dtype=float)
+        temp = standardized_data['Temperature'].to_numpy(dtype=float)
+
+        time_delta_hours = timestamps.diff().dt.total_seconds().to_numpy() / 3600.0
+        if self.last_timestamp is None:
+            time_delta_hours[0] = self.default_time_delta_hours
+        else:
+            time_delta_hours[0] = (timestamps.iloc[0] - self.last_timestamp).total_seconds() / 3600.0
+
+        self.last_timestamp = timestamps.iloc[-1]
+        self.rows_processed += n
+        if self.window_points <= 0:
+            return None
+
+        if not self.track_window and self.window_count + n > self.window_points:
+            raise ValueError("Readings would leave a rolling window that is not being tracked")
+        avg_rh, self.rh_sum = self._window_means(self.rh_window, self.rh_sum, rh)
+        avg_temp, self.temp_sum = self._window_means(self.temp_window, self.temp_sum, temp)
+        self.window_count = min(self.window_count + n, self.window_points)
+        if self.track_window:
+            self.rh_window.extend(rh.tolist())
+            self.temp_window.extend(temp.tolist())
+
+        codes, decay, scale = growth_decay_coefficients(avg_rh, rh_crit_array(avg_temp), time_delta_hours)
+        trajectory = simulate(codes, decay, scale, self.M)
+        self.M = float(trajectory[-1])
+
+        rounded = np.round(trajectory, 2)
+        tail = len(self.smoothing_tail)
+        smoothed = pd.Series(np.concatenate([np.array(self.smoothing_tail, dtype=float), rounded]))
+        smoothed = smoothed.rolling(window=SMOOTHING_WINDOW, min_periods=1).mean().round(2).to_numpy()[tail:]
+        self.smoothing_tail.extend(rounded[-(SMOOTHING_WINDOW - 1):].tolist())
+        return trajectory, smoothed
+
+    def _window_means(self, window, window_sum, values):
+        """Trailing means for new values given the readings already in the window"""
+        n = len(values)
+        w = self.window_count
+        m = self.window_points
+
+        #values pushed out of the window as each new value arrives
+        first_leaving = max(0, m - w)
+        from_window = max(0, min(w, n - first_leaving))
+        leaving = np.zeros(n)
+        leaving[first_leaving:] = np.concatenate([
+            np.fromiter(islice(window, from_window), dtype=float, count=from_window),
+            values[:max(0, n - first_leaving - from_window)],
+        ])
+
+        sums = window_sum + np.cumsum(values - leaving)
+        counts = np.minimum(w + np.arange(1, n + 1), m)
+        return sums / counts, float(sums[-1])
+
+    def to_dict(self):
+        """JSON-serializable snapshot of the state"""
+        return {
+            'version': self.VERSION,
+            'window_points': self.window_points,
+            'default_time_delta_hours': self.default_time_delta_hours,
+            'M': self.M,
+            'rh_window': list(self.rh_window),
+            'temp_window': list(self.temp_window),
+            'last_timestamp': self.last_timestamp.isoformat() if self.last_timestamp is not None else None,
+            'smoothing_tail': list(self.smoothing_tail),
+            'rows_processed': self.rows_processed,
+            'track_window': self.track_window,
+            'window_count': self.window_count,
+            'rh_sum': self.rh_sum,
+            'temp_sum': self.temp_sum,
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        if data.get('version') != cls.VERSION:
+            raise ValueError(f"Unsupported MouldIndexState version: {data.get('version')}")
+        return cls(
+            window_points=data['window_points'],
+            default_time_delta_hours=data['default_time_delta_hours'],
+            M=data['M'],
+            rh_window=data['rh_window'],
+            temp_window=data['temp_window'],
+            last_timestamp=data['last_timestamp'],
+            smoothing_tail=data['smoothing_tail'],
+            rows_processed=data['rows_processed'],
+            track_window=data['track_window'],
+            window_count=data['window_count'],
+            rh_sum=data['rh_sum'],
+            temp_sum=data['temp_sum'],
+        )
+
+
+"""Standardize raw readings unless they already use the standard column names"""
+def _standardized(data):
+    if is_standardized(data):
+        return data
+    #already typed chunks (e.g. from ingest) skip the schema lookup; text timestamps still need parsing
+    if list(data.columns) == STANDARD_COLUMNS and pd.api.types.is_datetime64_any_dtype(data['Timestamp']):
+        return data.dropna().sort_values('Timestamp')
+    return standardize_dataframe(data)
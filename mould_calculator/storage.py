@@ -0,0 +1,197 @@
+"""
+Storage lifecycle for uploads and the files derived from them.
+
+Anonymous uploads stay in temp/, where only their session points at them.
+Authenticated uploads are moved into uploads/ once by `uploads.store_upload`,
+or point at the user's existing file with the same content. Everything else on
+disk can be rebuilt from those originals: the binary sidecars next to them
+(sidecar.py) and the chart pyramids under MOULD_SERIES_DIR (series.py). Both
+are touched when read, so their mtime is their last use.
+
+`sweep_storage` (the `sweep_storage` command) applies settings.MOULD_STORAGE:
+
+1. temp/ uploads older than TEMP_TTL seconds are deleted with their sidecars,
+   unless a queued or running job still needs them;
+2. users whose uploads and derived artefacts take more than USER_QUOTA_BYTES
+   lose their least recently used derived artefacts until they fit;
+3. if everything together takes more than GLOBAL_QUOTA_BYTES, the least
+   recently used derived artefacts of all users go the same way.
+
+The quotas never delete originals. Every step reports the files and bytes it
+reclaimed.
+"""
+import os
+import shutil
+import time
+from collections import namedtuple
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+
+from .models import AnalysisJob, MouldAnalysis
+from .series import pyramid_dir
+from .sidecar import SIDECAR_SUFFIX, sidecar_dir
+
+DEFAULTS = {'TEMP_TTL': 24 * 3600, 'USER_QUOTA_BYTES': None, 'GLOBAL_QUOTA_BYTES': None}
+
+Artefact = namedtuple('Artefact', ['path', 'bytes', 'last_used'])
+
+
+"""settings.MOULD_STORAGE over the defaults"""
+def storage_options():
+    return {**DEFAULTS, **getattr(settings, 'MOULD_STORAGE', {})}
+
+
+"""Bytes taken by a file, or by every file under a directory; 0 when it doesn't exist"""
+def path_size(path):
+    try:
+        if not os.path.isdir(path):
+            return os.path.getsize(path)
+        return sum(path_size(entry.path) for entry in os.scandir(path))
+    except OSError:
+        return 0
+
+
+def _artefact(path):
+    try:
+        last_used = os.stat(path).st_mtime
+    except OSError:
+        return None
+    return Artefact(path, path_size(path), last_used)
+
+
+def _delete(path):
+    if os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def _reclaimed(files=0, bytes=0):
+    return {'files': files, 'bytes': bytes}
+
+
+"""
+Delete temp/ uploads last written more than `ttl` seconds ago, with their
+sidecars, and sidecars whose upload is gone. Files of queued or running jobs
+are kept. Returns {'files', 'bytes'} reclaimed (or that would be, with `dry_run`).
+"""
+def sweep_temp(ttl, now=None, dry_run=False):
+    directory = os.path.join(default_storage.location, 'temp')
+    if not os.path.isdir(directory):
+        return _reclaimed()
+    now = time.time() if now is None else now
+    active = {
+        os.path.join(default_storage.location, path)
+        for path in AnalysisJob.objects.filter(status__in=[AnalysisJob.QUEUED, AnalysisJob.RUNNING])
+        .values_list('file_path', flat=True)
+    }
+    reclaimed = _reclaimed()
+    for entry in os.scandir(directory):
+        if entry.name.endswith(SIDECAR_SUFFIX):
+            #os.path.isdir, not the cached entry type: the sidecar of an upload swept earlier in this loop is gone
+            expired = os.path.isdir(entry.path) and not os.path.exists(entry.path[:-len(SIDECAR_SUFFIX)])
+            paths = [entry.path]
+        else:
+            try:
+                expired = now - entry.stat().st_mtime > ttl and entry.path not in active
+            except FileNotFoundError:
+                continue
+            paths = [entry.path, sidecar_dir(entry.path)]
+        if not expired:
+            continue
+        reclaimed['files'] += 1
+        for path in paths:
+            reclaimed['bytes'] += path_size(path)
+            if not dry_run:
+                _delete(path)
+    return reclaimed
+
+
+"""Stored upload paths and derived artefacts (sidecars, pyramids) of one user's analyses"""
+def user_storage(user_id):
+    rows = set(MouldAnalysis.objects.filter(user_id=user_id).exclude(file='').values_list('file', 'content_hash'))
+    originals = {default_storage.path(name) for name, _ in rows}
+    derived = [sidecar_dir(path) for path in originals]
+    series_dir = getattr(settings, 'MOULD_SERIES_DIR', None)
+    if series_dir:
+        derived += [pyramid_dir(series_dir, content_hash) for content_hash in {h for _, h in rows if h}]
+    return originals, [artefact for artefact in map(_artefact, derived) if artefact is not None]
+
+
+"""Every derived artefact on disk: sidecars under temp/ and uploads/, pyramids under MOULD_SERIES_DIR"""
+def derived_artefacts():
+    paths = []
+    for top in ('temp', 'uploads'):
+        for directory, subdirectories, _ in os.walk(os.path.join(default_storage.location, top)):
+            paths += [os.path.join(directory, name) for name in subdirectories if name.endswith(SIDECAR_SUFFIX)]
+            subdirectories[:] = [name for name in subdirectories if not name.endswith(SIDECAR_SUFFIX)]
+    series_dir = getattr(settings, 'MOULD_SERIES_DIR', None)
+    if series_dir and os.path.isdir(series_dir):
+        for version in os.scandir(series_dir):
+            if version.is_dir():
+                paths += [entry.path for entry in os.scandir(version.path) if entry.is_dir()]
+    return [artefact for artefact in map(_artefact, paths) if artefact is not None]
+
+
+"""Delete the least recently used `artefacts` until `used` bytes fit in `quota`; returns {'files', 'bytes'}"""
+def evict_lru(artefacts, used, quota, dry_run=False):
+    reclaimed = _reclaimed()
+    for artefact in sorted(artefacts, key=lambda artefact: artefact.last_used):
+        if used - reclaimed['bytes'] <= quota:
+            break
+        if not dry_run:
+            _delete(artefact.path)
+        reclaimed['files'] += 1
+        reclaimed['bytes'] += artefact.bytes
+    return reclaimed
+
+
+"""Bring one user's storage under USER_QUOTA_BYTES by evicting their derived artefacts; returns {'files', 'bytes'}"""
+def enforce_user_quota(user_id, quota=None, dry_run=False):
+    quota = storage_options()['USER_QUOTA_BYTES'] if quota is None else quota
+    if quota is None:
+        return _reclaimed()
+    originals, artefacts = user_storage(user_id)
+    used = sum(map(path_size, originals)) + sum(artefact.bytes for artefact in artefacts)
+    return evict_lru(artefacts, used, quota, dry_run)
+
+
+"""Bytes taken by uploads, temp files and pyramids together"""
+def storage_used():
+    used = sum(path_size(os.path.join(default_storage.location, top)) for top in ('temp', 'uploads'))
+    series_dir = getattr(settings, 'MOULD_SERIES_DIR', None)
+    return used + (path_size(series_dir) if series_dir else 0)
+
+
+"""Bring the whole store under GLOBAL_QUOTA_BYTES by evicting derived artefacts; returns {'files', 'bytes'}"""
+def enforce_global_quota(quota=None, dry_run=False):
+    quota = storage_options()['GLOBAL_QUOTA_BYTES'] if quota is None else quota
+    if quota is None:
+        return _reclaimed()
+    return evict_lru(derived_artefacts(), storage_used(), quota, dry_run)
+
+
+"""
+Run the TTL sweep and both quotas. Returns the report: reclaimed files and
+bytes per step, their total and the bytes in use before and after.
+"""
+def sweep_storage(dry_run=False, now=None):
+    options = storage_options()
+    report = {'used_before': storage_used()}
+    report['temp'] = sweep_temp(options['TEMP_TTL'], now, dry_run)
+    report['user_quota'] = _reclaimed()
+    report['users_over_quota'] = 0
+    if options['USER_QUOTA_BYTES'] is not None:
+        for user_id in MouldAnalysis.objects.exclude(user=None).values_list('user_id', flat=True).distinct():
+            reclaimed = enforce_user_quota(user_id, options['USER_QUOTA_BYTES'], dry_run)
+            if reclaimed['files']:
+                report['users_over_quota'] += 1
+                report['user_quota'] = {key: report['user_quota'][key] + value for key, value in reclaimed.items()}
+    report['global_quota'] = enforce_global_quota(options['GLOBAL_QUOTA_BYTES'], dry_run)
+    report['reclaimed_bytes'] = sum(report[step]['bytes'] for step in ('temp', 'user_quota', 'global_quota'))
+    report['used_after'] = report['used_before'] - report['reclaimed_bytes'] if dry_run else storage_used()
+    return report
@@ -0,0 +1,110 @@
+"""
+What-if risk surfaces.
+
+A surface is the mould index after holding every temperature x relative
+humidity pair of a grid constant for some exposure durations. Under constant
+conditions the rolling means equal the readings, so each grid cell takes the
+same kind of step (growth, decay or stalled) every time:
+
+- growth steps depend only on M, so every growing cell follows one shared
+  curve, simulated once per step length and memoized;
+- decay steps are a constant per cell, so M falls linearly until it is clipped at 0.
+
+That makes a whole (duration x temperature x humidity) cube one broadcast
+lookup instead of one simulation per cell. The results match process_mold_index
+on constant hourly readings. Surfaces are memoized by their grid parameters and
+returned read-only.
+
+The work and the memo are bounded: steps are at least MIN_STEP_HOURS long, a
+growth curve has at most MAX_SIMULATION_STEPS steps and a surface at most
+MAX_SURFACE_CELLS cells, so the caches hold a few tens of MB at worst.
+"""
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from .engine import DECAY, GROWTH, growth_decay_coefficients, rh_crit_array, simulate
+
+#the cube is indexed [duration, temperature, humidity] and holds percentages like process_mold_index
+RiskSurface = namedtuple('RiskSurface', ['temperature', 'humidity', 'days', 'mould_index'])
+
+#8 entries of at most 8 MB (surfaces) or 2.8 MB (growth curves)
+SURFACE_CACHE_ENTRIES = 8
+MAX_SURFACE_CELLS = 1_000_000
+MIN_STEP_HOURS = 0.25
+MAX_STEP_HOURS = 24
+#ten years of 15-minute steps
+MAX_SIMULATION_STEPS = 3650 * 24 * 4
+INITIAL_M = 0.1
+
+
+"""Evenly spaced grid axis from `start` to `stop` inclusive"""
+def grid_axis(start, stop, steps):
+    if steps < 1:
+        raise ValueError("A grid axis needs at least one step")
+    return np.linspace(float(start), float(stop), int(steps))
+
+
+"""M after 0..`steps` growth steps of `step_hours` each, starting from INITIAL_M"""
+@lru_cache(maxsize=SURFACE_CACHE_ENTRIES)
+def growth_curve(step_hours, steps):
+    scale = np.full(steps, step_hours / 24.0)
+    curve = np.concatenate(([INITIAL_M], simulate(np.full(steps, GROWTH, dtype=np.int8), np.zeros(steps), scale, INITIAL_M)))
+    curve.setflags(write=False)
+    return curve
+
+
+def _steps_for(days, step_hours):
+    days = np.asarray(days, dtype=float)
+    if days.ndim != 1 or np.any(days < 0) or not np.all(np.isfinite(days)):
+        raise ValueError("Exposure durations must be non-negative numbers of days")
+    return np.rint(days * 24.0 / step_hours).astype(np.int64)
+
+
+"""Finite values of a grid axis; NaN (say from an all-NaN reading column) has no risk to show"""
+def finite_axis(values):
+    values = np.asarray(values, dtype=float)
+    return values[np.isfinite(values)]
+
+
+"""
+Mould index (%) after each of `days` of constant conditions, for every finite temperature x humidity.
+Returns a (len(days), temperatures, humidities) array, empty along an axis without finite values.
+"""
+def risk_cube(temperatures, humidities, days, step_hours=1.0):
+    if not MIN_STEP_HOURS <= step_hours <= MAX_STEP_HOURS:
+        raise ValueError(f"step_hours must be between {MIN_STEP_HOURS} and {MAX_STEP_HOURS}")
+    temperatures = finite_axis(temperatures)
+    humidities = finite_axis(humidities)
+    steps = _steps_for(days, step_hours)
+    if steps.max(initial=0) > MAX_SIMULATION_STEPS:
+        raise ValueError(f"Exposure durations are limited to {MAX_SIMULATION_STEPS} steps of step_hours")
+
+    rh, temp = np.meshgrid(humidities, temperatures)
+    codes, decay, _ = growth_decay_coefficients(rh, rh_crit_array(temp), np.full(rh.shape, float(step_hours)))
+
+    n = steps[:, None, None]
+    grown = growth_curve(float(step_hours), int(steps.max(initial=0)))[steps][:, None, None]
+    #repeated decay steps only ever hit the lower bound
+    decayed = np.maximum(INITIAL_M + n * decay, 0.0)
+    M = np.where(codes == GROWTH, grown, np.where(codes == DECAY, decayed, INITIAL_M))
+    return M / 6 * 100
+
+
+"""
+Memoized risk surface over a regular grid: `temp_steps` temperatures from `temp_min` to `temp_max`
+and `rh_steps` humidities from `rh_min` to `rh_max`, after each duration in `days` (a tuple).
+"""
+@lru_cache(maxsize=SURFACE_CACHE_ENTRIES)
+def risk_surface(temp_min, temp_max, temp_steps, rh_min, rh_max, rh_steps, days, step_hours=1.0):
+    if len(days) * int(temp_steps) * int(rh_steps) > MAX_SURFACE_CELLS:
+        raise ValueError(f"Surfaces are limited to {MAX_SURFACE_CELLS} cells")
+    #a NaN bound leaves no finite grid points: the surface is empty rather than NaN, which isn't valid JSON
+    temperature = finite_axis(grid_axis(temp_min, temp_max, temp_steps))
+    humidity = finite_axis(grid_axis(rh_min, rh_max, rh_steps))
+    days = np.asarray(days, dtype=float)
+    mould_index = risk_cube(temperature, humidity, days, step_hours)
+    for values in (temperature, humidity, days, mould_index):
+        values.setflags(write=False)
+    return RiskSurface(temperature, humidity, days, mould_index)
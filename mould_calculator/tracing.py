@@ -0,0 +1,100 @@
+"""
+Opt-in tracing for the mould index pipeline.
+
+Tracing is off unless a Trace is activated for the current request/thread with
+`tracing()`. When it is off, `current_trace()` returns None and instrumented
+code skips building any trace output, so the per-row hot paths only pay for a
+None check. When it is on, events are written as JSON lines to a file or an
+in-memory buffer and every pipeline stage records its wall time and row count.
+
+Stage timings and row counts also feed the always-on metrics (metrics.py),
+which cost two clock reads and a histogram update per stage.
+"""
+import contextvars
+import io
+import json
+import time
+from contextlib import contextmanager
+
+from .metrics import STAGE_ROWS, STAGE_SECONDS
+
+_current_trace = contextvars.ContextVar('mould_trace', default=None)
+
+
+class Trace:
+    """
+    Collects pipeline events as JSON lines plus a per-stage timing summary.
+    """
+    def __init__(self, stream=None, rows=True):
+        self.stream = stream if stream is not None else io.StringIO()
+        self.rows = rows
+        self.stages = []
+
+    def event(self, name, **fields):
+        fields['event'] = name
+        self.stream.write(json.dumps(fields, default=str) + "\n")
+
+    def row(self, **fields):
+        if self.rows:
+            self.event('row', **fields)
+
+    def record_stage(self, name, seconds, rows=None):
+        entry = {'stage': name, 'seconds': round(seconds, 6), 'rows': rows}
+        self.stages.append(entry)
+        self.event('stage', **entry)
+
+    def getvalue(self):
+        """Trace output so far when writing to an in-memory buffer"""
+        return self.stream.getvalue() if hasattr(self.stream, 'getvalue') else None
+
+    def summary(self):
+        return {
+            'stages': list(self.stages),
+            'total_seconds': round(sum(s['seconds'] for s in self.stages), 6),
+        }
+
+
+class _Stage:
+    """
+    Times a block and reports it to the metrics and the active trace; set `rows` inside the block.
+    """
+    __slots__ = ('name', 'rows', 'trace', 'started')
+
+    def __init__(self, name, rows=None):
+        self.name = name
+        self.rows = rows
+
+    def __enter__(self):
+        self.trace = _current_trace.get()
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.started
+        STAGE_SECONDS.observe(seconds, self.name)
+        if self.rows:
+            STAGE_ROWS.inc(self.rows, self.name)
+        if self.trace is not None:
+            self.trace.record_stage(self.name, seconds, self.rows)
+        return False
+
+
+"""Return the trace active in this context, or None when tracing is off"""
+def current_trace():
+    return _current_trace.get()
+
+
+"""Context manager timing one pipeline stage"""
+def stage(name, rows=None):
+    return _Stage(name, rows)
+
+
+"""Activate `trace` (or a new in-memory Trace) for the duration of the block"""
+@contextmanager
+def tracing(trace=None):
+    trace = trace if trace is not None else Trace()
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
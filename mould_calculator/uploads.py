@@ -0,0 +1,143 @@
+import logging
+import os
+import uuid
+
+from django.conf import settings
+from django.core.files.move import file_move_safe
+from django.core.files.storage import default_storage
+from django.db import transaction
+
+from .cache import cached_analysis, configured_resampling, file_digest
+from .ingest import DEFAULT_CHUNKSIZE, is_multi_sensor, series_readings, stream_to_sidecar, uncompressed_size
+from .metrics import UPLOAD_BYTES, count_failure
+from .models import AnalysisRollup, MouldAnalysis
+from .rollups import analyse_readings, compute_rollups
+from .sidecar import move_sidecar, remove_sidecar, write_sidecar
+from .storage import enforce_user_quota
+
+logger = logging.getLogger(__name__)
+
+
+"""Write an uploaded file to temp/ chunk by chunk; returns (storage name, full path, content hash)"""
+def save_upload(uploaded_file):
+    UPLOAD_BYTES.observe(uploaded_file.size)
+    temp_filename = f"temp/{uuid.uuid4()}_{uploaded_file.name}"
+    file_path = default_storage.save(temp_filename, uploaded_file)
+    full_path = os.path.join(default_storage.location, file_path)
+    return file_path, full_path, file_digest(full_path)
+
+
+"""
+Parse and analyse a saved upload without touching the database, so it can run on any
+thread, and write its binary sidecar (readings and M series) next to it.
+`progress(percent, stage)` is called between the stages.
+
+Uploads of at least MOULD_STREAMING_THRESHOLD bytes (uncompressed) are read in chunks
+into the sidecar and analysed from its memory map, so memory stays bounded; smaller,
+unsorted and resampled uploads are read whole and simulated once, on the resampled
+readings when MOULD_RESAMPLE is set. Files with several sensors are read whole and
+analysed per sensor; their summary is that of the sensor at highest risk (see
+utils.sensors_summary), whose readings give the stored series and the rollups.
+Returns (risk summary, rollups).
+"""
+def compute_upload(full_path, content_hash, progress=None):
+    report = progress or (lambda percent, stage: None)
+
+    report(10, 'parsing')
+    chunksize = getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE)
+    threshold = getattr(settings, 'MOULD_STREAMING_THRESHOLD', None)
+    multi_sensor = is_multi_sensor(full_path, chunksize)
+    #resampling and the sensor matrices need every reading at once
+    if threshold is not None and configured_resampling() is None and not multi_sensor \
+            and uncompressed_size(full_path) >= threshold:
+        streamed = stream_to_sidecar(full_path, chunksize=chunksize)
+        if streamed is not None:
+            summary, rollups = streamed
+            report(80, 'storing')
+            return cached_analysis(full_path, content_hash, summary=summary), rollups
+
+    report(40, 'simulating')
+    #with several sensors, the stored readings, series and rollups are those of the sensor at highest risk
+    standardized, sensors = series_readings(full_path, chunksize, multi_sensor)
+    resampling = configured_resampling() if sensors is None else None
+    #one run gives the summary and the per-reading M for the stored series and the rollups
+    try:
+        summary, frame = analyse_readings(standardized, resampling=resampling)
+    except Exception as e:
+        logger.warning("Error in compute_upload: %s", e)
+        count_failure('analyse_dataframe')
+        raise ValueError("Could not calculate mould index from the provided data.") from e
+    risk_data = cached_analysis(full_path, content_hash, summary=sensors or summary)
+
+    report(80, 'storing')
+    series_timestamps = None if resampling is None else frame['Timestamp']
+    write_sidecar(full_path, standardized, mould_index=frame['M'].to_numpy(), series_timestamps=series_timestamps,
+                  sensor=None if sensors is None else sensors['worst_sensor'])
+    return risk_data, compute_rollups(frame)
+
+
+"""
+Storage name for an authenticated upload. The file is written once: a user who
+uploads the same content again gets their existing file and the temp copy is
+deleted; otherwise the temp file is moved (not copied) into uploads/.
+"""
+def adopt_upload(full_path, filename, content_hash, user):
+    existing = (MouldAnalysis.objects.filter(user=user, content_hash=content_hash).exclude(file='')
+                .values_list('file', flat=True).first())
+    if existing and default_storage.exists(existing):
+        os.remove(full_path)
+        remove_sidecar(full_path)
+        return existing
+    field = MouldAnalysis._meta.get_field('file')
+    name = default_storage.get_available_name(field.generate_filename(None, filename), max_length=field.max_length)
+    stored_path = default_storage.path(name)
+    os.makedirs(os.path.dirname(stored_path), exist_ok=True)
+    file_move_safe(full_path, stored_path)
+    move_sidecar(full_path, stored_path)
+    return name
+
+
+"""Save a computed upload: authenticated users get a MouldAnalysis row with its rollups. Returns the analysis or None"""
+def store_upload(full_path, filename, content_hash, user, risk_data, rollups):
+    if user is None or not user.is_authenticated:
+        return None
+    analysis = MouldAnalysis.objects.create(
+        user=user,
+        filename=filename,
+        file=adopt_upload(full_path, filename, content_hash, user),
+        temperature=risk_data['current_temperature'],
+        humidity=risk_data['current_humidity'],
+        mould_index=risk_data['mould_index'],
+        risk_level=risk_data['risk_level'],
+        risk_message=risk_data['status'],
+        content_hash=content_hash
+    )
+    store_rollups(analysis, rollups)
+    return analysis
+
+
+"""
+Analyse a saved upload and persist the outcome. Authenticated users get a
+MouldAnalysis row; `progress(percent, stage)` is called between the stages.
+Returns (analysis or None, risk summary).
+"""
+def analyse_upload(full_path, filename, content_hash, user=None, progress=None):
+    risk_data, rollups = compute_upload(full_path, content_hash, progress)
+    analysis = store_upload(full_path, filename, content_hash, user, risk_data, rollups)
+    if analysis is not None:
+        enforce_user_quota(user.id)
+    if progress is not None:
+        progress(100, 'done')
+    return analysis, risk_data
+
+
+"""Replace the stored daily/weekly rollups of an analysis with `rollups` (as rollups.compute_rollups returns them)"""
+def store_rollups(analysis, rollups):
+    rows = [
+        AnalysisRollup(analysis=analysis, period=period, start=start, **values)
+        for period, table in rollups.items()
+        for start, values in table.to_dict(orient='index').items()
+    ]
+    with transaction.atomic():
+        AnalysisRollup.objects.filter(analysis=analysis).delete()
+        AnalysisRollup.objects.bulk_create(rows, batch_size=500)
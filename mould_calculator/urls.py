@@ -7,11 +7,18 @@ urlpatterns = [
     path('',views.home,name='home'),
     path('about/', views.about, name='about'),
     path('uploadpage/', views.uploadpage, name='uploadpage'),
+    path('uploads/<uuid:token>/events/', views.upload_events, name='upload_events'),
     path('result/', views.result, name='result'),
+    path('result/series/', views.result_series, name='result_series'),
+    path('jobs/<uuid:job_id>/', views.job_status, name='job_status'),
+    path('batch/', views.batch_analysis, name='batch_analysis'),
+    path('surface/', views.risk_surface_view, name='risk_surface'),
     path('login/', auth_views.LoginView.as_view(template_name='auth/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(next_page='home'), name='logout'),
     path('register/', views.register, name='register'),
     path('dashboard/', views.dashboard, name='dashboard'),
+    path('analyses/rollups/', views.analysis_rollups, name='analysis_rollups'),
+    path('metrics', views.metrics_view, name='metrics'),
     
   
 ]
\ No newline at end of file
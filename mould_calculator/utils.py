@@ -1,60 +1,80 @@
 import numpy as np
 import pandas as pd
-from collections import deque
+from collections import deque, namedtuple
 from datetime import timedelta
+from functools import cached_property
+import logging
 import math
 
-"""Standardizes input dataframe to have consistent column names and data types"""
-def standardize_dataframe(df):
-    try:
-        df.columns = df.columns.str.lower().str.strip()
+from .engine import mould_index_matrix, mould_index_trajectory, smooth_series
+from .metrics import count_failure
+from .resample import resample_readings
+from .schema import parse_timestamps, resolve_schema
+from .tracing import current_trace, stage
 
-        timestamp_columns = [
-            'timestamp', 'local date/time', 'utc date/time', 'date/time', 'date', 
-            'time', 'datetime', 'measurement time'
-        ]
+logger = logging.getLogger(__name__)
 
-        temperature_columns = [
-            'temperature', 'temperature (°c)', 'temperature (c)', 'temperature (ºc)', 
-            'heat index (°c)', 'temp', 'temp(°c)', 'temp(c)', 'temp °c', 'temp c',
-            't(°c)', 't(c)', 't °c', 't c'
-        ]
+STANDARDIZED_ATTR = 'mould_standardized'
 
-        humidity_columns = [
-            'humidity', 'humidity (%)', 'relative humidity', 'rh (%)', 'rh', 
-            'humidity%', 'rh%', 'relative humidity (%)', 'humidity level'
-        ]
 
-        print("Available columns in CSV:", df.columns.tolist())
+READING_COLUMNS = ['Timestamp', 'Temperature', 'Humidity']
+
 
-        timestamp_col = next((col for col in df.columns if any(name in col for name in timestamp_columns)), None)
-        temperature_col = next((col for col in df.columns if any(name in col for name in temperature_columns)), None)
-        humidity_col = next((col for col in df.columns if any(name in col for name in humidity_columns)), None)
+"""
+Ids of the sensor column for each row, or None when the column is metadata rather than an id:
+a sensor id is on every row, or the data is long format (several readings per timestamp).
+A serial number filled in on the first row only is not one. Rows without an id are None.
+"""
+def sensor_ids(values, timestamps):
+    present = values.notna() & (values.astype(str).str.strip() != '')
+    if present.all() or timestamps.dropna().duplicated().any():
+        return values.where(present, None).to_numpy()
+    return None
 
-        print(f"Found timestamp column: {timestamp_col}")
-        print(f"Found temperature column: {temperature_col}")
-        print(f"Found humidity column: {humidity_col}")
 
-        if not all([timestamp_col, temperature_col, humidity_col]):
-            missing_cols = []
-            if not timestamp_col: missing_cols.append("Timestamp")
-            if not temperature_col: missing_cols.append("Temperature")
-            if not humidity_col: missing_cols.append("Humidity")
-            raise ValueError(f"Missing required columns: {', '.join(missing_cols)}")
+"""
+Build the standard Timestamp/Temperature/Humidity frame for a resolved schema (unsorted, NaNs kept).
+Long-format multi-sensor data also gets a Sensor column.
+"""
+def build_standardized(df, schema):
+    standardized = pd.DataFrame({
+        'Timestamp': parse_timestamps(df[schema.timestamp], schema),
+        'Temperature': pd.to_numeric(df[schema.temperature], errors='coerce'),
+        'Humidity': pd.to_numeric(df[schema.humidity], errors='coerce')
+    })
+    if schema.sensor is not None:
+        ids = sensor_ids(df[schema.sensor], standardized['Timestamp'])
+        if ids is not None:
+            standardized['Sensor'] = ids
+    return standardized
 
-        standardized_df = pd.DataFrame({
-            'Timestamp': pd.to_datetime(df[timestamp_col]),
-            'Temperature': pd.to_numeric(df[temperature_col], errors='coerce'),
-            'Humidity': pd.to_numeric(df[humidity_col], errors='coerce')
-        })
 
-        print("\nStandardized data first few rows:")
-        print(standardized_df.head())
+"""True for frames returned by standardize_dataframe, which can be passed on without re-standardizing"""
+def is_standardized(df):
+    return bool(df.attrs.get(STANDARDIZED_ATTR))
+
+
+"""Standardizes input dataframe to have consistent column names and data types"""
+def standardize_dataframe(df):
+    if is_standardized(df):
+        return df
+    try:
+        df.columns = df.columns.str.lower().str.strip()
+
+        standardized_df = build_standardized(df, resolve_schema(df))
 
-        return standardized_df.dropna().sort_values('Timestamp')
+        trace = current_trace()
+        if trace is not None:
+            trace.event('standardized_head', rows=standardized_df.head().to_dict(orient='records'))
+
+        #only the readings decide which rows are usable; other columns (a sensor id) may be blank
+        standardized_df = standardized_df.dropna(subset=READING_COLUMNS).sort_values('Timestamp')
+        standardized_df.attrs[STANDARDIZED_ATTR] = True
+        return standardized_df
 
     except Exception as e:
-        print(f"Error in standardize_dataframe: {str(e)}")
+        logger.warning("Error in standardize_dataframe: %s", e)
+        count_failure('standardize_dataframe')
         raise
 
 
@@ -67,7 +87,8 @@ def calculate_rh_crit(temp):
         else:
             return 80
     except Exception as e:
-        print(f"Error in calculate_rh_crit: {str(e)}")
+        logger.warning("Error in calculate_rh_crit: %s", e)
+        count_failure('calculate_rh_crit')
         return 80
 
 
@@ -93,60 +114,91 @@ def calculate_dMdt(RH, RH_crit, M, time_delta_hours):
 
         #scale dMdt by time delta 
         scaled_dMdt = dMdt * (time_delta_hours / 24.0)
-        print(f"RH: {RH:.2f}, RH_crit: {RH_crit:.2f}, M: {M:.4f}, dMdt: {dMdt:.6f}, scaled_dMdt: {scaled_dMdt:.6f}")
+        trace = current_trace()
+        if trace is not None:
+            trace.row(stage='dMdt', RH=RH, RH_crit=RH_crit, M=M, dMdt=dMdt, scaled_dMdt=scaled_dMdt)
         return 0 if np.isnan(scaled_dMdt) or np.isinf(scaled_dMdt) else scaled_dMdt
 
     except Exception as e:
-        print(f"Error in calculate_dMdt: {str(e)}")
+        logger.warning("Error in calculate_dMdt: %s", e)
+        count_failure('calculate_dMdt')
         return 0
 
 
-"""Calculate mould index from temperature and humidity data"""
-def process_mold_index(data, rolling_window=None):
-    try:
-        standardized_data = standardize_dataframe(data)
-        if standardized_data.empty:
-            raise ValueError("No valid data after standardization")
-
-        #detect time interval in minutes
-        time_deltas = standardized_data['Timestamp'].diff().dt.total_seconds() / 60.0
-        median_interval = time_deltas.median()
-        if np.isnan(median_interval) or median_interval <= 0:
-            median_interval = 60.0  
-        print(f"Detected median time interval: {median_interval:.2f} minutes")
-
-        #calculate dynamic rolling window based on dataset duration
-        time_span = standardized_data['Timestamp'].max() - standardized_data['Timestamp'].min()
-        rolling_window_days = max(1, math.ceil(time_span.total_seconds() / (24 * 3600)))
-        if rolling_window is None:
-            rolling_window = rolling_window_days
-        else:
-            rolling_window = min(rolling_window, rolling_window_days)  # Respect user input if shorter
-        print(f"Dynamic rolling window set to {rolling_window} days based on dataset duration")
-
-        #calculate number of data points in rolling window based on time interval
-        points_per_day = (24 * 60) / median_interval
-        rolling_queue_maxlen = int(rolling_window * points_per_day)
-        print(f"Rolling queue maxlen: {rolling_queue_maxlen} data points")
-
-        latest_timestamp = standardized_data['Timestamp'].max()
-        cutoff_time = latest_timestamp - timedelta(days=rolling_window)
-        recent_data = standardized_data[standardized_data['Timestamp'] >= cutoff_time]
-
-        if recent_data.empty:
-            recent_data = standardized_data.copy()
-            used_timeframe = f"Entire dataset ({recent_data['Timestamp'].min().date()} to {recent_data['Timestamp'].max().date()})"
-        else:
-            used_timeframe = f"Last {rolling_window} days ({recent_data['Timestamp'].min().date()} to {recent_data['Timestamp'].max().date()})"
-
-        M = 0.1
-        rolling_queue = deque(maxlen=rolling_queue_maxlen)
-        mould_index_series = []
-
-        #calculate time for scaling 
-        recent_data['TimeDelta'] = recent_data['Timestamp'].diff().dt.total_seconds() / 3600.0
-        recent_data['TimeDelta'] = recent_data['TimeDelta'].fillna(median_interval / 60.0)  
-
+ENGINES = ('vectorized', 'reference')
+DEFAULT_ENGINE = 'vectorized'
+
+#bump whenever a change alters computed results, so cached results are invalidated
+ALGORITHM_VERSION = 1
+
+
+"""Select the readings inside the rolling window and derive the simulation parameters"""
+def prepare_window(standardized_data, rolling_window=None):
+    #detect time interval in minutes
+    time_deltas = standardized_data['Timestamp'].diff().dt.total_seconds() / 60.0
+    median_interval = time_deltas.median()
+    if np.isnan(median_interval) or median_interval <= 0:
+        median_interval = 60.0  
+
+    #calculate dynamic rolling window based on dataset duration
+    time_span = standardized_data['Timestamp'].max() - standardized_data['Timestamp'].min()
+    rolling_window_days = max(1, math.ceil(time_span.total_seconds() / (24 * 3600)))
+    if rolling_window is None:
+        rolling_window = rolling_window_days
+    else:
+        rolling_window = min(rolling_window, rolling_window_days)  # Respect user input if shorter
+
+    #calculate number of data points in rolling window based on time interval
+    points_per_day = (24 * 60) / median_interval
+    rolling_queue_maxlen = int(rolling_window * points_per_day)
+
+    latest_timestamp = standardized_data['Timestamp'].max()
+    cutoff_time = latest_timestamp - timedelta(days=rolling_window)
+    recent_data = standardized_data[standardized_data['Timestamp'] >= cutoff_time]
+
+    if recent_data.empty:
+        recent_data = standardized_data.copy()
+        used_timeframe = f"Entire dataset ({recent_data['Timestamp'].min().date()} to {recent_data['Timestamp'].max().date()})"
+    else:
+        used_timeframe = f"Last {rolling_window} days ({recent_data['Timestamp'].min().date()} to {recent_data['Timestamp'].max().date()})"
+
+    #calculate time for scaling 
+    time_delta_hours = recent_data['Timestamp'].diff().dt.total_seconds() / 3600.0
+    time_delta_hours = time_delta_hours.fillna(median_interval / 60.0)
+
+    trace = current_trace()
+    if trace is not None:
+        trace.event('window', median_interval_minutes=median_interval, rolling_window_days=rolling_window,
+                    rolling_queue_maxlen=rolling_queue_maxlen, rows=len(recent_data))
+
+    return recent_data, time_delta_hours, rolling_queue_maxlen, used_timeframe, median_interval
+
+
+"""Readings to simulate: the standardized frame, or its resampled grid when `resampling` is set. Returns (frame, report or None)"""
+def simulation_readings(standardized_data, resampling=None):
+    if resampling is None:
+        return standardized_data, None
+    with stage('resample', rows=len(standardized_data)) as resample_stage:
+        resampled, report = resample_readings(standardized_data, resampling)
+        resample_stage.rows = len(resampled)
+    trace = current_trace()
+    if trace is not None:
+        trace.event('resample', **report)
+    if resampled.empty:
+        raise ValueError("No readings left after resampling")
+    return resampled, report
+
+
+"""Reference engine: row-by-row loop over the windowed readings"""
+def _simulate_reference(recent_data, time_delta_hours, rolling_queue_maxlen):
+    M = 0.1
+    rolling_queue = deque(maxlen=rolling_queue_maxlen)
+    mould_index_series = []
+    trace = current_trace()
+
+    recent_data = recent_data.assign(TimeDelta=time_delta_hours)
+
+    with stage('simulation', rows=len(recent_data)):
         for index, row in recent_data.iterrows():
             try:
                 temp = float(row['Temperature'])
@@ -163,7 +215,9 @@ def process_mold_index(data, rolling_window=None):
                     dMdt = calculate_dMdt(avg_RH, RH_crit_window, M, time_delta_hours)
 
                     M = max(0, min(6, M + dMdt))
-                    print(f"Timestamp: {row['Timestamp']}, Avg RH: {avg_RH:.2f}, Avg Temp: {avg_temp:.2f}, M: {M:.4f}")
+                    if trace is not None:
+                        trace.row(stage='simulation', timestamp=row['Timestamp'], avg_RH=avg_RH,
+                                  avg_temp=avg_temp, M=M)
 
                     mould_index_series.append({
                         "timestamp": row['Timestamp'].strftime("%Y-%m-%d %H:%M"),
@@ -171,40 +225,194 @@ def process_mold_index(data, rolling_window=None):
                     })
 
             except Exception as e:
-                print(f"Error processing row {index}: {str(e)}")
+                logger.warning("Error processing row %s: %s", index, e)
+                count_failure('simulation_row')
                 continue
 
-        #smooth the mould index values over time
+    #smooth the mould index values over time
+    with stage('smoothing', rows=len(mould_index_series)):
         series_df = pd.DataFrame(mould_index_series)
         if not series_df.empty:
             series_df['smoothed'] = series_df['mould_index'].rolling(window=5, min_periods=1).mean()
             series_df['mould_index'] = series_df['smoothed'].round(2)
             mould_index_series = series_df[['timestamp', 'mould_index']].to_dict(orient='records')
 
-        final_percentage = (M / 6) * 100
-        return final_percentage, mould_index_series, used_timeframe, standardized_data.to_dict(orient='records')
+    return M, mould_index_series
+
+
+"""Vectorized engine: whole-column coefficients and a scalar kernel for the M recurrence; returns (M, trajectory)"""
+def _simulate_vectorized(recent_data, time_delta_hours, rolling_queue_maxlen):
+    with stage('simulation', rows=len(recent_data)):
+        trajectory = mould_index_trajectory(
+            recent_data['Humidity'].to_numpy(dtype=float),
+            recent_data['Temperature'].to_numpy(dtype=float),
+            time_delta_hours.to_numpy(dtype=float),
+            rolling_queue_maxlen,
+        )
+    if len(trajectory) == 0:
+        return 0.1, trajectory
+
+    trace = current_trace()
+    if trace is not None:
+        for ts, temp, RH, M in zip(recent_data['Timestamp'], recent_data['Temperature'],
+                                   recent_data['Humidity'], trajectory.tolist()):
+            trace.row(stage='simulation', timestamp=ts, temperature=temp, RH=RH, M=M)
+    return float(trajectory[-1]), trajectory
+
+
+"""Map a mould index percentage to a risk level and status message"""
+def risk_level_for(mould_index):
+    if mould_index < 16.7:
+        return "Low", "Environmental conditions unfavorable for mould growth"
+    elif mould_index < 30: 
+        return "Moderate", "Conditions could potentially support mould growth"
+    else:
+        return "High", "Conditions highly favorable for mould growth"
+
+
+class MouldResult:
+    """
+    Outcome of one mould index run. Keeps the standardized readings and the M trajectory;
+    the chart series, records, current readings and risk score are built on first access
+    and kept after that. Iterating yields the legacy
+    (mould_index, series, used_timeframe, records) tuple of process_mold_index.
+    """
+    def __init__(self, M, used_timeframe, standardized, timestamps, trajectory=None, series=None, resampling=None):
+        self.M = M
+        self.mould_index = (M / 6) * 100
+        self.used_timeframe = used_timeframe
+        self.standardized = standardized
+        self.timestamps = timestamps
+        self.trajectory = trajectory
+        self.resampling = resampling
+        if series is not None:
+            #the reference engine builds its series while simulating
+            self.__dict__['series'] = series
+
+    @cached_property
+    def series_columns(self):
+        """Smoothed series as parallel 'timestamp' and 'mould_index' lists"""
+        if 'series' in self.__dict__:
+            return {
+                'timestamp': [point['timestamp'] for point in self.series],
+                'mould_index': [point['mould_index'] for point in self.series],
+            }
+        if self.trajectory is None or len(self.trajectory) == 0:
+            return {'timestamp': [], 'mould_index': []}
+        with stage('smoothing', rows=len(self.trajectory)):
+            return {
+                'timestamp': self.timestamps.dt.strftime("%Y-%m-%d %H:%M").tolist(),
+                'mould_index': smooth_series(self.trajectory).tolist(),
+            }
+
+    @cached_property
+    def series(self):
+        """Smoothed series as a list of {'timestamp', 'mould_index'} dicts"""
+        columns = self.series_columns
+        return [
+            {"timestamp": ts, "mould_index": value}
+            for ts, value in zip(columns['timestamp'], columns['mould_index'])
+        ]
+
+    @cached_property
+    def records(self):
+        with stage('serialization', rows=len(self.standardized)):
+            return self.standardized.to_dict(orient='records')
+
+    @cached_property
+    def latest(self):
+        return self.standardized.iloc[-1]
+
+    @property
+    def current_temperature(self):
+        return self.latest['Temperature']
+
+    @property
+    def current_humidity(self):
+        return self.latest['Humidity']
+
+    @cached_property
+    def score(self):
+        """Risk summary in the shape returned by mould_score"""
+        risk_level, status = risk_level_for(self.mould_index)
+        return {
+            'risk_level': risk_level,
+            'status': status,
+            'mould_index': self.mould_index,
+            'current_temperature': self.current_temperature,
+            'current_humidity': self.current_humidity,
+        }
+
+    def __iter__(self):
+        yield self.mould_index
+        yield self.series
+        yield self.used_timeframe
+        yield self.records
+
+
+"""
+Run the mould index model and return a MouldResult, or None when the data can't be analysed.
+With a resample.Resampling the simulation runs on the resampled grid; the result's records
+and current readings are still the standardized readings.
+"""
+def compute_mould_result(data, rolling_window=None, engine=None, resampling=None):
+    engine = engine or DEFAULT_ENGINE
+    if engine not in ENGINES:
+        raise ValueError(f"Unknown mould index engine: {engine}")
+
+    try:
+        with stage('standardize', rows=len(data)) as standardize_stage:
+            standardized_data = standardize_dataframe(data)
+            standardize_stage.rows = len(standardized_data)
+        if standardized_data.empty:
+            raise ValueError("No valid data after standardization")
+        readings, resample_report = simulation_readings(standardized_data, resampling)
+
+        with stage('windowing') as windowing_stage:
+            recent_data, time_delta_hours, rolling_queue_maxlen, used_timeframe, _ = prepare_window(
+                readings, rolling_window
+            )
+            windowing_stage.rows = len(recent_data)
+
+        if engine == 'reference':
+            M, mould_index_series = _simulate_reference(recent_data, time_delta_hours, rolling_queue_maxlen)
+            return MouldResult(M, used_timeframe, standardized_data, recent_data['Timestamp'],
+                               series=mould_index_series, resampling=resample_report)
+        M, trajectory = _simulate_vectorized(recent_data, time_delta_hours, rolling_queue_maxlen)
+        return MouldResult(M, used_timeframe, standardized_data, recent_data['Timestamp'],
+                           trajectory=trajectory, resampling=resample_report)
 
     except Exception as e:
-        print(f"Error in process_mold_index: {str(e)}")
+        logger.warning("Error in process_mold_index: %s", e)
+        count_failure('process_mold_index')
+        return None
+
+
+"""
+Calculate mould index from temperature and humidity data; returns the
+(mould_index, series, used_timeframe, records) tuple. Kept for existing callers:
+compute_mould_result returns the same data without building what isn't used.
+"""
+def process_mold_index(data, rolling_window=None, engine=None, resampling=None):
+    result = compute_mould_result(data, rolling_window, engine, resampling)
+    if result is None:
         return None, [], "No data", []
+    return tuple(result)
 
 
-"""Evaluate mould risk level based on calculated index"""
-def mould_score(mould_index, data):
+"""
+Evaluate mould risk level based on calculated index. Pass a MouldResult on its own to
+reuse its readings; a plain percentage needs the raw `data` to find the current readings.
+"""
+def mould_score(mould_index, data=None):
+    if isinstance(mould_index, MouldResult):
+        return mould_index.score
     try:
         standardized_data = standardize_dataframe(data)
         latest_temp = standardized_data['Temperature'].iloc[-1]
         latest_humidity = standardized_data['Humidity'].iloc[-1]
 
-        if mould_index < 16.7:
-            risk_level = "Low"
-            status = "Environmental conditions unfavorable for mould growth"
-        elif mould_index < 30: 
-            risk_level = "Moderate"
-            status = "Conditions could potentially support mould growth"
-        else:
-            risk_level = "High"
-            status = "Conditions highly favorable for mould growth"
+        risk_level, status = risk_level_for(mould_index)
 
         return {
             'risk_level': risk_level,
@@ -214,5 +422,179 @@ def mould_score(mould_index, data):
             'current_humidity': latest_humidity
         }
     except Exception as e:
-        print(f"Error in mould_score: {str(e)}")
-        return None
\ No newline at end of file
+        logger.warning("Error in mould_score: %s", e)
+        count_failure('mould_score')
+        return None
+
+
+"""
+Run the full analysis on a raw or standardized DataFrame; returns the risk summary shown
+on the result page. Only the final index is needed, so no series or records are built.
+With a resample.Resampling the summary also has a 'resampling' report. Data of several
+sensors is analysed per sensor by process_sensors (without resampling) and summarised
+by sensors_summary.
+"""
+def analyse_dataframe(data, rolling_window=None, resampling=None):
+    try:
+        with stage('standardize', rows=len(data)) as standardize_stage:
+            standardized_data = standardize_dataframe(data)
+            standardize_stage.rows = len(standardized_data)
+        if standardized_data.empty:
+            raise ValueError("No valid data after standardization")
+        if has_several_sensors(standardized_data):
+            return sensors_summary(process_sensors(standardized_data, rolling_window, with_series=False))
+        readings, resample_report = simulation_readings(standardized_data, resampling)
+
+        with stage('windowing') as windowing_stage:
+            recent_data, time_delta_hours, rolling_queue_maxlen, used_timeframe, _ = prepare_window(
+                readings, rolling_window
+            )
+            windowing_stage.rows = len(recent_data)
+
+        with stage('simulation', rows=len(recent_data)):
+            trajectory = mould_index_trajectory(
+                recent_data['Humidity'].to_numpy(dtype=float),
+                recent_data['Temperature'].to_numpy(dtype=float),
+                time_delta_hours.to_numpy(dtype=float),
+                rolling_queue_maxlen,
+            )
+    except Exception as e:
+        logger.warning("Error in analyse_dataframe: %s", e)
+        count_failure('analyse_dataframe')
+        return None
+
+    M = float(trajectory[-1]) if len(trajectory) else 0.1
+    return risk_summary(M, standardized_data, used_timeframe, resample_report)
+
+
+"""Risk summary of a run ending at mould index `M`; the current readings are the last standardized reading"""
+def risk_summary(M, standardized_data, used_timeframe, resample_report=None):
+    mould_index = (M / 6) * 100
+    risk_level, status = risk_level_for(mould_index)
+    latest = standardized_data.iloc[-1]
+    summary = {
+        'mould_index': mould_index,
+        'risk_level': risk_level,
+        'status': status,
+        'current_temperature': float(latest['Temperature']),
+        'current_humidity': float(latest['Humidity']),
+        'used_timeframe': used_timeframe,
+    }
+    if resample_report is not None:
+        summary['resampling'] = resample_report
+    return summary
+
+
+"""True when standardized data holds the readings of more than one sensor"""
+def has_several_sensors(standardized_data):
+    return 'Sensor' in standardized_data.columns and standardized_data['Sensor'].nunique() > 1
+
+
+"""
+Risk summary of multi-sensor data from process_sensors results: the summary of the sensor at
+highest risk, with its id as 'worst_sensor' and every sensor's summary under 'sensors'.
+None when `results` is.
+"""
+def sensors_summary(results):
+    if not results:
+        return None
+    worst = max(results, key=lambda sensor: results[sensor]['mould_index'])
+    return dict(results[worst], worst_sensor=worst, sensors=results)
+
+
+SensorGroup = namedtuple('SensorGroup', ['timestamps', 'sensors', 'temperature', 'humidity'])
+
+
+"""
+Pivot long-format multi-sensor readings into (time x sensor) matrices. Sensors are grouped
+by their exact timestamps, so every group shares one time grid; a sensor with its own grid
+is a group of one. Returns a list of SensorGroup.
+"""
+def sensor_matrices(standardized_data):
+    if 'Sensor' not in standardized_data.columns:
+        raise ValueError("No sensor/device id column in the data")
+    #readings without a sensor id can't be attributed to any sensor
+    standardized_data = standardized_data[standardized_data['Sensor'].notna()]
+    #sort integer codes rather than the ids themselves: by sensor, then by time
+    codes, sensor_ids = pd.factorize(standardized_data['Sensor'], sort=True)
+    ticks = pd.DatetimeIndex(standardized_data['Timestamp']).asi8
+    order = np.lexsort((ticks, codes))
+    ticks = ticks[order]
+    bounds = np.flatnonzero(np.diff(codes[order])) + 1
+    positions = np.split(order, bounds)
+    sorted_ticks = np.split(ticks, bounds)
+
+    grids = {}
+    for index, sensor_ticks in enumerate(sorted_ticks):
+        grids.setdefault(sensor_ticks.tobytes(), []).append(index)
+
+    temperature = standardized_data['Temperature'].to_numpy(dtype=float)
+    humidity = standardized_data['Humidity'].to_numpy(dtype=float)
+    groups = []
+    for indices in grids.values():
+        rows = np.stack([positions[index] for index in indices], axis=1)
+        timestamps = standardized_data['Timestamp'].iloc[rows[:, 0]].reset_index(drop=True)
+        groups.append(SensorGroup(timestamps, [sensor_ids[index] for index in indices],
+                                  temperature[rows], humidity[rows]))
+    return groups
+
+
+"""
+Mould risk for every sensor in long-format data with a sensor/device id column.
+Sensors on the same time grid are simulated together as one matrix, one vector
+step per timestamp. Returns {sensor id: risk summary (plus 'series' when
+with_series)} or None when the data can't be analysed.
+"""
+def process_sensors(data, rolling_window=None, with_series=True):
+    try:
+        with stage('standardize', rows=len(data)) as standardize_stage:
+            standardized_data = standardize_dataframe(data)
+            standardize_stage.rows = len(standardized_data)
+        if standardized_data.empty:
+            raise ValueError("No valid data after standardization")
+
+        with stage('pivot', rows=len(standardized_data)):
+            groups = sensor_matrices(standardized_data)
+
+        results = {}
+        for group in groups:
+            recent_data, time_delta_hours, rolling_queue_maxlen, used_timeframe, _ = prepare_window(
+                pd.DataFrame({'Timestamp': group.timestamps}), rolling_window
+            )
+            rows = recent_data.index.to_numpy()
+            with stage('simulation', rows=len(rows) * len(group.sensors)):
+                trajectory = mould_index_matrix(
+                    group.humidity[rows],
+                    group.temperature[rows],
+                    time_delta_hours.to_numpy(dtype=float),
+                    rolling_queue_maxlen,
+                )
+            final = trajectory[-1] if len(trajectory) else np.full(len(group.sensors), 0.1)
+
+            if with_series:
+                with stage('smoothing', rows=trajectory.size):
+                    smoothed = smooth_series(trajectory)
+                    timestamps = recent_data['Timestamp'].dt.strftime("%Y-%m-%d %H:%M").tolist()
+
+            for column, sensor in enumerate(group.sensors):
+                mould_index = (float(final[column]) / 6) * 100
+                risk_level, status = risk_level_for(mould_index)
+                results[sensor] = {
+                    'mould_index': mould_index,
+                    'risk_level': risk_level,
+                    'status': status,
+                    'current_temperature': float(group.temperature[-1, column]),
+                    'current_humidity': float(group.humidity[-1, column]),
+                    'used_timeframe': used_timeframe,
+                }
+                if with_series:
+                    results[sensor]['series'] = [
+                        {"timestamp": ts, "mould_index": value}
+                        for ts, value in zip(timestamps, smoothed[:, column].tolist())
+                    ]
+    except Exception as e:
+        logger.warning("Error in process_sensors: %s", e)
+        count_failure('process_sensors')
+        return None
+
+    return {str(sensor): results[sensor] for sensor in sorted(results)}
@@ -1,18 +1,73 @@
 from django.shortcuts import render, redirect, get_object_or_404
-from django.http import JsonResponse
-from .utils import process_mold_index, mould_score
+from django.http import HttpResponse, JsonResponse, Http404, StreamingHttpResponse
+from django.db.models import Q
+from django.urls import reverse
+from .batch import analyse_batch, collect_sources
+from .cache import cached_analysis, configured_resampling, file_digest
+from .compute import run_compute
+from .ingest import DEFAULT_CHUNKSIZE, load_or_build_standardized
+from .series import DEFAULT_POINTS, METHODS, load_or_build_pyramid, query_pyramid
+from .surface import MAX_SURFACE_CELLS, MAX_STEP_HOURS, MIN_STEP_HOURS, risk_surface
+from .jobs import enqueue_upload
+from .progress import progress_board, progress_reporter
+from .storage import enforce_user_quota
+from .metrics import UPLOAD_BYTES, count_failure, render as render_metrics
+from .uploads import compute_upload, save_upload, store_upload
 from .forms import UploadFileForm
 from django.core.files.storage import default_storage
-from django.core.files.base import ContentFile
-from .models import MouldAnalysis
+from django.core.handlers.asgi import ASGIRequest
+from .models import AnalysisJob, AnalysisRollup, MouldAnalysis, MouldSummary
+from .rollups import ROLLUP_FIELDS
+from .utils import simulation_readings
 from django.contrib.auth.forms import UserCreationForm
 from django.contrib.auth import login
 from django.contrib.auth.decorators import login_required
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition, require_POST
+from django.views.decorators.vary import vary_on_cookie
+from django.conf import settings
+from contextlib import contextmanager
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from .tracing import Trace, tracing
+from .middleware import admission_precondition
+from .conditional import analyses_etag, dataset_etag, file_modified, not_modified, with_validators
+from collections import namedtuple
+from asgiref.sync import sync_to_async
 
-import pandas as pd
+import asyncio
+import hmac
+import json
+import logging
+import math
 import os
+import tempfile
 import uuid
 
+logger = logging.getLogger(__name__)
+
+
+# opt-in pipeline tracing with ?trace=1 (staff users, or anyone when DEBUG is on); async views pass the resolved user
+@contextmanager
+def request_tracing(request, user=None):
+    user = user or request.user
+    if request.GET.get('trace') != '1' or not (settings.DEBUG or user.is_staff):
+        yield None
+        return
+
+    trace_dir = getattr(settings, 'MOULD_TRACE_DIR', None)
+    stream = None
+    if trace_dir:
+        os.makedirs(trace_dir, exist_ok=True)
+        stream = open(os.path.join(trace_dir, f"{uuid.uuid4()}.jsonl"), 'w')
+    try:
+        with tracing(Trace(stream)) as trace:
+            yield trace
+    finally:
+        if stream is not None:
+            stream.close()
+        logger.info("Mould pipeline trace for %s: %s", request.path, trace.summary())
+
 
 def home(request):
     return render(request, 'home.html')
@@ -21,85 +76,252 @@ def home(request):
 def about(request):
     return render(request, 'about.html')
 
-# handling post and get requests
-def uploadpage(request):
+def progress_token(value):
+    try:
+        return str(uuid.UUID(value)) if value else None
+    except ValueError:
+        return None
+
+
+# handling post and get requests; file handling and the analysis run on the compute pool
+async def uploadpage(request):
     form = UploadFileForm()
     is_ajax = request.headers.get('X-Requested-With') == 'XMLHttpRequest'
 
+    def error(message, status):
+        if is_ajax:
+            return JsonResponse({'error': message}, status=status)
+        return sync_to_async(render)(request, 'uploadpage.html', {'form': form, 'error': message})
+
     if request.method == "POST":
-        if "file" not in request.FILES:
-            error_message = "No file uploaded."
-            return JsonResponse({'error': error_message}, status=400) if is_ajax else render(request, 'uploadpage.html', {'form': form, 'error': error_message})
+        #multipart parsing reads the spooled request body from disk
+        files, post = await run_compute(lambda: (request.FILES, request.POST))
+        if getattr(request, 'upload_too_large', False):
+            response = error("The upload is larger than the server accepts.", 413)
+            return response if is_ajax else await response
+        if "file" not in files:
+            response = error("No file uploaded.", 400)
+            return response if is_ajax else await response
 
-        uploaded_file = request.FILES["file"]
+        uploaded_file = files["file"]
+        token = progress_token(post.get('progress_token'))
+        report = progress_reporter(token)
         #save uploaded data on temporary path
         try:
-    
-            temp_filename = f"temp/{uuid.uuid4()}_{uploaded_file.name}"
-            file_path = default_storage.save(temp_filename, ContentFile(uploaded_file.read())) 
-            full_path = os.path.join(default_storage.location, file_path)
-
-            df = pd.read_csv(full_path)
-            #  handle dynamic window based on dataset
-            mould_index, series, used_timeframe, full_data = process_mold_index(df)
-
-            if mould_index is None:
-                raise ValueError("Could not calculate mould index from the provided data.")
-
-            risk_data = mould_score(mould_index, df)
-            if risk_data is None:
-                raise ValueError("Could not assess mould risk from provided data.")
-
-            if request.user.is_authenticated:
-                analysis = MouldAnalysis.objects.create(
-                    user=request.user,
-                    filename=uploaded_file.name,
-                    file=uploaded_file,
-                    temperature=risk_data['current_temperature'],
-                    humidity=risk_data['current_humidity'],
-                    mould_index=mould_index,
-                    risk_level=risk_data['risk_level'],
-                    risk_message=risk_data['status']
+            report(5, 'saving')
+            #storage writes the upload chunk by chunk instead of reading it into memory
+            file_path, full_path, content_hash = await run_compute(save_upload, uploaded_file)
+
+            if is_ajax and getattr(settings, 'MOULD_BACKGROUND_JOBS', False):
+                job = await sync_to_async(enqueue_upload)(request, file_path, uploaded_file.name, content_hash)
+                return JsonResponse({'job_id': str(job.id), 'status_url': reverse('job_status', args=[job.id])}, status=202)
+
+            user = await request.auser()
+            with request_tracing(request, user) as trace:
+                risk_data, rollups = await run_compute(compute_upload, full_path, content_hash, report)
+                analysis = await sync_to_async(store_upload)(
+                    full_path, uploaded_file.name, content_hash, user, risk_data, rollups
                 )
-                request.session['last_analysis_id'] = analysis.id
-            else:
-                request.session['anon_file_path'] = file_path
+                if analysis is not None:
+                    await sync_to_async(enforce_user_quota)(user.id)
+            await aremember_result(request, analysis, file_path, content_hash)
+            if token:
+                progress_board.publish(token, status='done', percent=100, stage='done', redirect_url='/result')
 
-            return JsonResponse({'redirect_url': '/result'}) if is_ajax else redirect('result')
+            if is_ajax:
+                payload = {'redirect_url': '/result'}
+                if trace is not None:
+                    payload['trace'] = trace.summary()
+                return JsonResponse(payload)
+            return redirect('result')
 
         except Exception as e:
+            count_failure('uploadpage')
             error_message = f"Error processing file: {str(e)}"
-            return JsonResponse({'error': error_message}, status=500) if is_ajax else render(request, 'uploadpage.html', {'form': form, 'error': error_message})
+            if token:
+                progress_board.publish(token, status='failed', error=error_message)
+            response = error(error_message, 500)
+            return response if is_ajax else await response
+
+    return await sync_to_async(render)(request, 'uploadpage.html', {'form': form})
+
+
+# point the session at a finished upload so the result page can find it
+def remember_result(request, analysis, file_path, content_hash):
+    if analysis is not None:
+        request.session['last_analysis_id'] = analysis.id
+    else:
+        request.session['anon_file_path'] = file_path
+        request.session['anon_content_hash'] = content_hash
+
+
+async def aremember_result(request, analysis, file_path, content_hash):
+    if analysis is not None:
+        await request.session.aset('last_analysis_id', analysis.id)
+    else:
+        await request.session.aset('anon_file_path', file_path)
+        await request.session.aset('anon_content_hash', content_hash)
+
+
+EVENT_POLL_INTERVAL = 0.25
+EVENT_KEEPALIVE = 15
+EVENT_STREAM_LIMIT = 3600
+EVENT_RETRY_MS = 1000
+
+
+async def progress_events(token):
+    loop = asyncio.get_running_loop()
+    seen = 0
+    started = last_sent = loop.time()
+    while loop.time() - started < EVENT_STREAM_LIMIT:
+        version, state = progress_board.snapshot(token)
+        if version != seen and state is not None:
+            seen, last_sent = version, loop.time()
+            yield f"data: {json.dumps(state)}\n\n"
+            if state['status'] in ('done', 'failed'):
+                return
+        elif loop.time() - last_sent >= EVENT_KEEPALIVE:
+            last_sent = loop.time()
+            yield ": keepalive\n\n"
+        await asyncio.sleep(EVENT_POLL_INTERVAL)
+
+
+# Server-Sent Events with the progress of the upload posted with this progress_token.
+# Under WSGI a stream would hold a sync worker for as long as it stays open, so there the response carries
+# the current state only and the browser's EventSource reconnects after EVENT_RETRY_MS, i.e. polls.
+async def upload_events(request, token):
+    if not isinstance(request, ASGIRequest):
+        _, state = progress_board.snapshot(str(token))
+        body = f"retry: {EVENT_RETRY_MS}\n\n"
+        if state is not None:
+            body += f"data: {json.dumps(state)}\n\n"
+        return HttpResponse(body, content_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    return StreamingHttpResponse(
+        progress_events(str(token)),
+        content_type='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'},
+    )
 
-    return render(request, 'uploadpage.html', {'form': form})
 
+def job_status(request, job_id):
+    job = AnalysisJob.objects.filter(id=job_id).first()
+    if job is None or not job.is_owned_by(request):
+        raise Http404("No such job")
 
-def result(request):
+    payload = {'status': job.status, 'progress': job.progress}
+    if job.status == AnalysisJob.DONE:
+        remember_result(request, job.analysis, job.file_path, job.content_hash)
+        payload['redirect_url'] = reverse('result')
+    elif job.status == AnalysisJob.FAILED:
+        payload['error'] = f"Error processing file: {job.error}"
+    return JsonResponse(payload)
+
+
+# many sensors in one request: CSV files and/or zips of CSVs posted as `files`
+@require_POST
+def batch_analysis(request):
+    files = request.FILES.getlist('files')
+    if getattr(request, 'upload_too_large', False):
+        return JsonResponse({'error': "The upload is larger than the server accepts."}, status=413)
+    if not files:
+        return JsonResponse({'error': "No files uploaded."}, status=400)
+    for f in files:
+        UPLOAD_BYTES.observe(f.size)
+
+    rolling_window = request.POST.get('rolling_window')
+    try:
+        rolling_window = int(rolling_window) if rolling_window else None
+    except ValueError:
+        return JsonResponse({'error': "rolling_window must be a whole number of days."}, status=400)
+
+    with tempfile.TemporaryDirectory() as directory:
+        try:
+            sources = collect_sources(((f.name, f) for f in files), directory)
+        except Exception as e:
+            return JsonResponse({'error': f"Error reading uploaded files: {str(e)}"}, status=400)
+        if not sources:
+            return JsonResponse({'error': "No CSV files found in the upload."}, status=400)
+        report = analyse_batch(
+            sources,
+            processes=getattr(settings, 'MOULD_BATCH_PROCESSES', None),
+            rolling_window=rolling_window,
+            streaming_threshold=getattr(settings, 'MOULD_STREAMING_THRESHOLD', None),
+            chunksize=getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE),
+        )
+    return JsonResponse(report)
+
+
+ResultSource = namedtuple('ResultSource', ['path', 'content_hash', 'analysis_id', 'modified'])
+
+
+# resolve the dataset shown on the result page: a ResultSource or None; remembered on the request,
+# since the conditional-request checks and the view itself both need it
+def result_source(request):
+    if not hasattr(request, '_result_source'):
+        request._result_source = find_result_source(request)
+    return request._result_source
+
+
+def find_result_source(request):
     dataset_id = request.GET.get('dataset_id')
-    df = None
+    analysis = None
      #retrieve data based on user
     if dataset_id and request.user.is_authenticated:
-        obj = get_object_or_404(MouldAnalysis, id=dataset_id, user=request.user)
-        df = pd.read_csv(obj.file.path)
+        analysis = get_object_or_404(MouldAnalysis, id=dataset_id, user=request.user)
     elif request.user.is_authenticated and request.session.get('last_analysis_id'):
-        try:
-            analysis = MouldAnalysis.objects.get(id=request.session['last_analysis_id'], user=request.user)
-            df = pd.read_csv(analysis.file.path)
-        except Exception:
-            pass
+        analysis = MouldAnalysis.objects.filter(id=request.session['last_analysis_id'], user=request.user).first()
     elif request.session.get('anon_file_path'):
-        try:
-            file_path = os.path.join(default_storage.location, request.session['anon_file_path'])
-            df = pd.read_csv(file_path)
-        except Exception:
-            pass
+        file_path = os.path.join(default_storage.location, request.session['anon_file_path'])
+        if os.path.exists(file_path):
+            return ResultSource(file_path, request.session.get('anon_content_hash'), None, file_modified(file_path))
+        return None
+
+    if analysis is None or not analysis.file:
+        return None
+    if not analysis.content_hash:
+        #analyses uploaded before results were cached
+        analysis.content_hash = file_digest(analysis.file.path)
+        analysis.save(update_fields=['content_hash'])
+    return ResultSource(analysis.file.path, analysis.content_hash, analysis.id, analysis.uploaded_at)
+
 
-    if df is None:
+# 304 for a result page the client has a current copy of (traced requests are always built);
+# admission runs it before taking a slot, so revalidations never wait for one
+@admission_precondition('result')
+def result_not_modified(request):
+    source = result_source(request)
+    if source is None or request.GET.get('trace') == '1':
+        return None
+    response = not_modified(request, dataset_etag('result', source.analysis_id, source.content_hash), source.modified)
+    if response is not None:
+        #the middleware sends it without going through the view's decorators
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Cookie',))
+    return response
+
+
+# private to the user; a current browser copy (ETag/Last-Modified) gets a 304 before anything is read
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+async def result(request):
+    source = await sync_to_async(result_source)(request)
+    if source is None:
         return redirect('uploadpage')
+    etag = dataset_etag('result', source.analysis_id, source.content_hash)
+    response = await sync_to_async(result_not_modified)(request)
+    if response is not None:
+        return response
 
     #  choose rolling window dynamically
-    mould_index, series, used_timeframe, full_data = process_mold_index(df)
-    risk_data = mould_score(mould_index, df)
+    with request_tracing(request, await request.auser()):
+        try:
+            risk_data = await run_compute(cached_analysis, source.path, source.content_hash)
+        except Exception as e:
+            logger.warning("Could not analyse %s: %s", source.path, e)
+            count_failure('result')
+            risk_data = None
+    if risk_data is None:
+        return redirect('uploadpage')
     #pass processed values to result template
     context = {
         'temperature': round(risk_data['current_temperature'], 1),
@@ -112,11 +334,106 @@ def result(request):
         'risk_class': 'low' if risk_data['risk_level'].lower() == 'low'
                       else 'medium' if risk_data['risk_level'].lower() == 'moderate'
                       else 'high',
-        'used_timeframe': used_timeframe,
+        'used_timeframe': risk_data['used_timeframe'],
         'progress_width': f"{round(risk_data['mould_index'])}%"
     }
 
-    return render(request, 'result.html', context)
+    response = await sync_to_async(render)(request, 'result.html', context)
+    return with_validators(response, etag, source.modified)
+
+
+def result_series_etag(request):
+    source = result_source(request)
+    return dataset_etag('series', source.analysis_id, source.content_hash) if source is not None else None
+
+
+def result_source_modified(request):
+    source = result_source(request)
+    return source.modified if source is not None else None
+
+
+# downsampled chart data for the dataset on the result page: ?start=&end= (epoch seconds), points, method
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=result_series_etag, last_modified_func=result_source_modified)
+def result_series(request):
+    source = result_source(request)
+    if source is None:
+        raise Http404("No dataset")
+    path, content_hash = source.path, source.content_hash
+
+    try:
+        start = int(request.GET['start']) if request.GET.get('start') else None
+        end = int(request.GET['end']) if request.GET.get('end') else None
+        points = int(request.GET.get('points', DEFAULT_POINTS))
+    except ValueError:
+        return JsonResponse({'error': "start, end and points must be whole numbers."}, status=400)
+    method = request.GET.get('method', 'minmax')
+    if method not in METHODS:
+        return JsonResponse({'error': f"method must be one of: {', '.join(METHODS)}"}, status=400)
+
+    chunksize = getattr(settings, 'MOULD_INGEST_CHUNKSIZE', DEFAULT_CHUNKSIZE)
+    try:
+        pyramid = load_or_build_pyramid(settings.MOULD_SERIES_DIR, content_hash or file_digest(path),
+                                        lambda: simulation_readings(load_or_build_standardized(path, chunksize),
+                                                                    configured_resampling())[0],
+                                        source_path=path)
+        return JsonResponse(query_pyramid(pyramid, start, end, points, method))
+    except Exception as e:
+        logger.warning("Could not build series for %s: %s", path, e)
+        count_failure('result_series')
+        return JsonResponse({'error': "Could not build the series for this dataset."}, status=500)
+
+
+def may_scrape_metrics(request):
+    access = getattr(settings, 'MOULD_METRICS_ACCESS', {})
+    token = access.get('TOKEN')
+    if token:
+        scheme, _, credentials = request.headers.get('Authorization', '').partition(' ')
+        if scheme.lower() == 'bearer' and hmac.compare_digest(credentials.strip().encode(), token.encode()):
+            return True
+    return request.META.get('REMOTE_ADDR') in access.get('ALLOWED_IPS', ())
+
+
+# Prometheus scrape endpoint: metrics of every worker process (see metrics.py), for MOULD_METRICS_ACCESS only
+def metrics_view(request):
+    if not may_scrape_metrics(request):
+        return HttpResponse("Forbidden", status=403, content_type='text/plain')
+    return HttpResponse(render_metrics(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+SURFACE_DEFAULTS = {'temp_min': 0, 'temp_max': 35, 'temp_steps': 36, 'rh_min': 40, 'rh_max': 100, 'rh_steps': 61}
+
+
+# what-if heatmap: mould index (%) after each of ?days=1,7,30 of constant conditions over a temperature x RH grid
+def risk_surface_view(request):
+    try:
+        grid = {name: float(request.GET.get(name, default)) for name, default in SURFACE_DEFAULTS.items()}
+        grid['temp_steps'], grid['rh_steps'] = int(grid['temp_steps']), int(grid['rh_steps'])
+        days = tuple(float(day) for day in request.GET.get('days', '1,7,30').split(',') if day.strip())
+        step_hours = float(request.GET.get('step_hours', 1))
+    except (ValueError, OverflowError):
+        return JsonResponse({'error': "Grid bounds, steps, days and step_hours must be numbers."}, status=400)
+    if not all(math.isfinite(value) for value in grid.values()):
+        return JsonResponse({'error': "Grid bounds must be finite numbers."}, status=400)
+    if not days or grid['temp_steps'] < 1 or grid['rh_steps'] < 1 or not MIN_STEP_HOURS <= step_hours <= MAX_STEP_HOURS:
+        return JsonResponse({'error': "Pass at least one duration, at least one step per axis "
+                                      f"and a step_hours between {MIN_STEP_HOURS} and {MAX_STEP_HOURS}."}, status=400)
+    if len(days) * grid['temp_steps'] * grid['rh_steps'] > MAX_SURFACE_CELLS or max(days) > 3650:
+        return JsonResponse({'error': f"Surfaces are limited to {MAX_SURFACE_CELLS} cells and 3650 days."}, status=400)
+
+    try:
+        surface = risk_surface(grid['temp_min'], grid['temp_max'], grid['temp_steps'],
+                               grid['rh_min'], grid['rh_max'], grid['rh_steps'], days, step_hours)
+    except ValueError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+    return JsonResponse({
+        'temperature': surface.temperature.tolist(),
+        'humidity': surface.humidity.tolist(),
+        'days': surface.days.tolist(),
+        'step_hours': step_hours,
+        'mould_index': surface.mould_index.round(4).tolist(),
+    })
 
 
 def register(request):
@@ -131,7 +448,122 @@ def register(request):
     return render(request, 'auth/register.html', {'form': form})
 
 
+MAX_COMPARED_ANALYSES = 50
+
+
+# (id, content hash, uploaded_at) of the analyses ?ids= asks for, remembered on the request; None for bad ids
+def requested_analyses(request):
+    if not hasattr(request, '_requested_analyses'):
+        try:
+            ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+        except ValueError:
+            ids = None
+        request._requested_analyses = None if not ids or len(ids) > MAX_COMPARED_ANALYSES else list(
+            MouldAnalysis.objects.filter(user=request.user, id__in=ids).values_list('id', 'content_hash', 'uploaded_at')
+        )
+    return request._requested_analyses
+
+
+def analysis_rollups_etag(request):
+    analyses = requested_analyses(request)
+    return analyses_etag('rollups', [(pk, content_hash) for pk, content_hash, _ in analyses]) if analyses else None
+
+
+def analysis_rollups_modified(request):
+    analyses = requested_analyses(request)
+    return max(uploaded_at for _, _, uploaded_at in analyses) if analyses else None
+
+
+# stored daily/weekly rollups of some of the user's analyses: ?ids=1,2&period=day|week&start=&end= (YYYY-MM-DD)
+@login_required
+@cache_control(private=True, no_cache=True)
+@vary_on_cookie
+@condition(etag_func=analysis_rollups_etag, last_modified_func=analysis_rollups_modified)
+def analysis_rollups(request):
+    try:
+        ids = [int(pk) for pk in request.GET.get('ids', '').split(',') if pk.strip()]
+        start = date.fromisoformat(request.GET['start']) if request.GET.get('start') else None
+        end = date.fromisoformat(request.GET['end']) if request.GET.get('end') else None
+    except ValueError:
+        return JsonResponse({'error': "ids must be numbers and start/end dates in YYYY-MM-DD format."}, status=400)
+    period = request.GET.get('period', AnalysisRollup.DAY)
+    if period not in dict(AnalysisRollup.PERIOD_CHOICES):
+        return JsonResponse({'error': "period must be 'day' or 'week'."}, status=400)
+    if not ids or len(ids) > MAX_COMPARED_ANALYSES:
+        return JsonResponse({'error': f"Pass between 1 and {MAX_COMPARED_ANALYSES} analysis ids."}, status=400)
+
+    analyses = {
+        pk: {'filename': filename, 'start': [], **{field: [] for field in ROLLUP_FIELDS}}
+        for pk, filename in MouldAnalysis.objects.filter(user=request.user, id__in=ids).values_list('id', 'filename')
+    }
+    rollups = AnalysisRollup.objects.filter(analysis_id__in=analyses, period=period)
+    if start:
+        rollups = rollups.filter(start__gte=start)
+    if end:
+        rollups = rollups.filter(start__lte=end)
+    for row in rollups.order_by('analysis_id', 'start').values_list('analysis_id', 'start', *ROLLUP_FIELDS):
+        columns = analyses[row[0]]
+        columns['start'].append(row[1].isoformat())
+        for field, value in zip(ROLLUP_FIELDS, row[2:]):
+            columns[field].append(value)
+    return JsonResponse({'period': period, 'analyses': {str(pk): columns for pk, columns in analyses.items()}})
+
+
+DASHBOARD_PAGE_SIZE = 25
+CURSOR_EPOCH = datetime(1970, 1, 1, tzinfo=dt_timezone.utc)
+
+
+# keyset cursor of a dashboard row: microseconds since the epoch and id
+def encode_cursor(analysis):
+    return f"{(analysis.uploaded_at - CURSOR_EPOCH) // timedelta(microseconds=1)}.{analysis.id}"
+
+
+#largest id the database column holds; bigger ones overflow when the query runs
+MAX_CURSOR_ID = 2 ** 63 - 1
+
+
+def decode_cursor(cursor):
+    micros, _, pk = cursor.partition('.')
+    pk = int(pk)
+    if not 0 < pk <= MAX_CURSOR_ID:
+        raise ValueError(f"Cursor id out of range: {pk}")
+    return CURSOR_EPOCH + timedelta(microseconds=int(micros)), pk
+
+
 @login_required
 def dashboard(request):
-    analyses = MouldAnalysis.objects.filter(user=request.user).order_by('-uploaded_at')
-    return render(request, 'dashboard.html', {'analyses': analyses})
+    analyses = MouldAnalysis.objects.filter(user=request.user).only(
+        'id', 'filename', 'uploaded_at', 'mould_index', 'risk_level'
+    )
+    newest_first = ('-uploaded_at', '-id')
+    after, before = request.GET.get('after'), request.GET.get('before')
+
+    #pages seek on the (user, uploaded_at, id) index, so every page costs the same
+    try:
+        if after:
+            uploaded_at, pk = decode_cursor(after)
+            page = analyses.filter(Q(uploaded_at__lt=uploaded_at) | Q(uploaded_at=uploaded_at, id__lt=pk)).order_by(*newest_first)
+        elif before:
+            uploaded_at, pk = decode_cursor(before)
+            page = analyses.filter(Q(uploaded_at__gt=uploaded_at) | Q(uploaded_at=uploaded_at, id__gt=pk)).order_by('uploaded_at', 'id')
+        else:
+            page = analyses.order_by(*newest_first)
+    except (ValueError, OverflowError):
+        after = before = None
+        page = analyses.order_by(*newest_first)
+
+    rows = list(page[:DASHBOARD_PAGE_SIZE + 1])
+    has_more = len(rows) > DASHBOARD_PAGE_SIZE
+    rows = rows[:DASHBOARD_PAGE_SIZE]
+    if before:
+        rows.reverse()
+    older_cursor = encode_cursor(rows[-1]) if rows and (has_more or before) else None
+    newer_cursor = encode_cursor(rows[0]) if rows and (after or (before and has_more)) else None
+
+    summary = MouldSummary.objects.filter(user=request.user).first() or MouldSummary.rebuild(request.user.id)
+    return render(request, 'dashboard.html', {
+        'analyses': rows,
+        'summary': summary,
+        'older_cursor': older_cursor,
+        'newer_cursor': newer_cursor,
+    })
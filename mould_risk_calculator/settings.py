@@ -44,11 +44,13 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'mould_calculator.middleware.metrics_middleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'mould_calculator.middleware.admission_middleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -133,3 +135,83 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 # Redirect users to dashboard after login
 LOGIN_REDIRECT_URL = '/dashboard/'
+
+# Mould pipeline tracing (?trace=1): write JSON-lines traces here instead of only logging the stage summary
+MOULD_TRACE_DIR = config('MOULD_TRACE_DIR', default=None)
+
+# Computed analysis cache: per-process LRU plus a shared on-disk tier evicted by size
+MOULD_RESULT_CACHE = {
+    'MEMORY_ENTRIES': 256,
+    'DIRECTORY': os.path.join(BASE_DIR, 'cache', 'results'),
+    'MAX_BYTES': 64 * 1024 * 1024,
+}
+
+# Simulate uploads on a fixed grid of INTERVAL_MINUTES buckets (see mould_calculator/resample.py); None keeps every raw row
+MOULD_RESAMPLE = {
+    'INTERVAL_MINUTES': config('MOULD_RESAMPLE_MINUTES', default=None, cast=lambda value: float(value) if value else None),
+    'GAP_POLICY': config('MOULD_RESAMPLE_GAP_POLICY', default='interpolate'),
+    'MAX_GAP_MINUTES': 60,
+}
+
+# Uploads at least this many bytes are analysed in read_csv chunks of MOULD_INGEST_CHUNKSIZE rows
+MOULD_STREAMING_THRESHOLD = 20 * 1024 * 1024
+MOULD_INGEST_CHUNKSIZE = 100_000
+
+# Threads for the parsing/simulation of the async upload and result views (default: CPU cores, at most 4).
+# Serve mould_risk_calculator.asgi:application with an ASGI server so slow uploads don't hold a worker.
+MOULD_COMPUTE_THREADS = config('MOULD_COMPUTE_THREADS', default=None, cast=lambda value: int(value) if value else None)
+
+# Ajax uploads are queued for `manage.py run_mould_workers` instead of being analysed in the request
+MOULD_BACKGROUND_JOBS = config('MOULD_BACKGROUND_JOBS', default=False, cast=bool)
+# Running jobs without a heartbeat for this many seconds are requeued
+MOULD_JOB_STALE_AFTER = 300
+
+# Worker processes for batch (multi-sensor) analyses; defaults to one per CPU core
+MOULD_BATCH_PROCESSES = config('MOULD_BATCH_PROCESSES', default=None, cast=lambda value: int(value) if value else None)
+
+# Precomputed multi-resolution chart series (see mould_calculator/series.py)
+MOULD_SERIES_DIR = os.path.join(BASE_DIR, 'cache', 'series')
+
+# Storage lifecycle (see mould_calculator/storage.py): run `manage.py sweep_storage` from cron, or with --every.
+# Anonymous temp/ uploads expire after TEMP_TTL seconds; the quotas (bytes, None for no limit) evict derived
+# sidecars and chart pyramids, least recently used first, never the uploaded files themselves.
+MOULD_STORAGE = {
+    'TEMP_TTL': config('MOULD_TEMP_TTL', default=24 * 3600, cast=int),
+    'USER_QUOTA_BYTES': config('MOULD_USER_QUOTA_BYTES', default=None, cast=lambda value: int(value) if value else None),
+    'GLOBAL_QUOTA_BYTES': config('MOULD_GLOBAL_QUOTA_BYTES', default=None, cast=lambda value: int(value) if value else None),
+}
+
+# Progress of running uploads for their event streams (see mould_calculator/progress.py), shared by every
+# worker process on the host; None keeps it in each process's memory, which only suits a single worker.
+MOULD_PROGRESS_DIR = config('MOULD_PROGRESS_DIR', default=os.path.join(BASE_DIR, 'cache', 'progress'))
+
+# Metrics on /metrics (see mould_calculator/metrics.py). With several worker processes, point this at a
+# directory shared by them and emptied at server start; None keeps each process's metrics to itself.
+MOULD_METRICS_DIR = config('MOULD_METRICS_DIR', default=None)
+# Who may scrape /metrics: clients from ALLOWED_IPS (REMOTE_ADDR, so list the proxy when there is one) or
+# requests with an `Authorization: Bearer <TOKEN>` header; everyone else gets a 403.
+MOULD_METRICS_ACCESS = {
+    'TOKEN': config('MOULD_METRICS_TOKEN', default=None),
+    'ALLOWED_IPS': config('MOULD_METRICS_ALLOWED_IPS', default='127.0.0.1,::1',
+                          cast=lambda value: [ip.strip() for ip in value.split(',') if ip.strip()]),
+}
+
+# Admission control for uploads, batch analyses, result pages and risk surfaces (see mould_calculator/admission.py);
+# None disables a limit.
+# Slot files under SLOT_DIRECTORY are shared by every worker process on the host.
+MOULD_ADMISSION = {
+    'MAX_UPLOAD_BYTES': config('MOULD_MAX_UPLOAD_BYTES', default=500 * 1024 * 1024, cast=int),
+    'PROCESS_SLOTS': config('MOULD_PROCESS_SLOTS', default=4, cast=int),
+    'USER_SLOTS': 2,
+    'GLOBAL_SLOTS': config('MOULD_GLOBAL_SLOTS', default=8, cast=int),
+    #shared by all anonymous clients, who can shed their per-user identity by dropping cookies
+    'ANONYMOUS_SLOTS': config('MOULD_ANONYMOUS_SLOTS', default=4, cast=int),
+    'SLOT_DIRECTORY': os.path.join(BASE_DIR, 'cache', 'admission'),
+    'RETRY_AFTER': 10,
+}
+# stops multipart uploads over MOULD_ADMISSION['MAX_UPLOAD_BYTES'] while they stream in
+FILE_UPLOAD_HANDLERS = [
+    'mould_calculator.admission.SizeLimitUploadHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
@@ -42,8 +42,10 @@ document.addEventListener('DOMContentLoaded', function() {
 
     
     function handleFileSelection(file) {
-        if (!file.name.toLowerCase().endsWith('.csv')) {
-            showMessage('Please upload a CSV file.', 'error');
+        // compressed CSVs are detected by their content on the server
+        const extensions = ['.csv', '.gz', '.bz2', '.xz', '.zip'];
+        if (!extensions.some(extension => file.name.toLowerCase().endsWith(extension))) {
+            showMessage('Please upload a CSV file (optionally gzip, bz2, xz or zip compressed).', 'error');
             fileInput.value = '';
             submitBtn.disabled = true;
             return;
@@ -59,6 +61,7 @@ document.addEventListener('DOMContentLoaded', function() {
         e.preventDefault();
         uploadMessage.style.display = 'none';
 
+        let events = null;
         try {
             const formData = new FormData(this);
             const url = this.dataset.url;
@@ -66,6 +69,10 @@ document.addEventListener('DOMContentLoaded', function() {
             submitBtn.disabled = true;
             submitBtn.textContent = 'Processing...';
 
+            const token = newProgressToken();
+            formData.append('progress_token', token);
+            events = watchProgress(token);
+
             const response = await fetch(url, {
                 method: "POST",
                 body: formData,
@@ -74,7 +81,12 @@ document.addEventListener('DOMContentLoaded', function() {
                 }
             });
 
-            const data = await response.json();
+            let data = await response.json();
+            events.close();
+
+            if (data.status_url) {
+                data = await pollJob(data.status_url);
+            }
             
             if (data.error) {
                 showMessage(data.error, 'error');
@@ -84,6 +96,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 window.location.href = data.redirect_url;
             }
         } catch (error) {
+            if (events) {
+                events.close();
+            }
             showMessage('An error occurred while processing your request.', 'error');
             submitBtn.disabled = false;
             submitBtn.textContent = 'Calculate Mold Risk';
@@ -91,6 +106,50 @@ document.addEventListener('DOMContentLoaded', function() {
     });
 
 
+    function newProgressToken() {
+        if (window.crypto && crypto.randomUUID) {
+            return crypto.randomUUID();
+        }
+        return 'xxxxxxxx-xxxx-4xxx-yxxx-xxxxxxxxxxxx'.replace(/[xy]/g, c => {
+            const r = Math.random() * 16 | 0;
+            return (c === 'x' ? r : (r & 0x3 | 0x8)).toString(16);
+        });
+    }
+
+
+    // live stage/percent of the upload from the server-sent events stream
+    function watchProgress(token) {
+        const source = new EventSource(`/uploads/${token}/events/`);
+        source.onmessage = (event) => {
+            const state = JSON.parse(event.data);
+            if (state.status === 'running') {
+                submitBtn.textContent = `Processing... ${state.percent}% (${state.stage})`;
+            } else {
+                source.close();
+            }
+        };
+        return source;
+    }
+
+
+    // queued uploads: poll the job until it is done or failed
+    async function pollJob(statusUrl) {
+        while (true) {
+            await new Promise(resolve => setTimeout(resolve, 1000));
+            const response = await fetch(statusUrl, {
+                headers: {
+                    'X-Requested-With': 'XMLHttpRequest'
+                }
+            });
+            const data = await response.json();
+            if (data.error || data.redirect_url) {
+                return data;
+            }
+            submitBtn.textContent = data.status === 'queued' ? 'Queued...' : `Processing... ${data.progress}%`;
+        }
+    }
+
+
     function showMessage(message, type) {
         uploadMessage.textContent = message;
         uploadMessage.className = `upload-message ${type}`;
@@ -0,0 +1,144 @@
+from django.test import RequestFactory, TestCase, override_settings
+from django.contrib.auth.models import AnonymousUser, User
+from django.contrib.sessions.backends.db import SessionStore
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.files.uploadhandler import MemoryFileUploadHandler
+import os
+import tempfile
+from mould_calculator.admission import SizeLimitUploadHandler, admit, process_semaphore
+from mould_calculator.middleware import user_key
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-01 {h:02d}:00,22,{85 + h % 5}" for h in range(24)
+)
+
+class AdmissionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.admission = {
+            'MAX_UPLOAD_BYTES': 64 * 1024,
+            'PROCESS_SLOTS': 2,
+            'USER_SLOTS': 1,
+            'GLOBAL_SLOTS': 2,
+            'SLOT_DIRECTORY': os.path.join(self.tmp.name, 'slots'),
+            'RETRY_AFTER': 7,
+        }
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_ADMISSION=self.admission,
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user('uploader', password='pw-123456')
+        self.client.force_login(self.user)
+        self.held = []
+
+    def tearDown(self):
+        for admission in self.held:
+            admission.release()
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self, content=CSV):
+        return self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv', content.encode(), content_type='text/csv'),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def hold(self, user_key, anonymous=False, **options):
+        self.held.append(admit(user_key, dict(self.admission, **options), anonymous=anonymous))
+
+    def test_declared_oversized_uploads_are_refused(self):
+        response = self.upload(CSV + "\n" * (64 * 1024))
+        self.assertEqual(response.status_code, 413)
+        self.assertIn('0.0625 MB', response.json()['error'])
+
+    def test_streaming_limit_stops_the_upload(self):
+        request = RequestFactory().post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv', b"x" * 200_000, content_type='text/csv'),
+        })
+        request.upload_handlers = [SizeLimitUploadHandler(request), MemoryFileUploadHandler(request)]
+        self.assertNotIn('file', request.FILES)
+        self.assertTrue(request.upload_too_large)
+
+    def test_user_over_their_slots_gets_429(self):
+        self.hold(f"user:{self.user.pk}", GLOBAL_SLOTS=None, PROCESS_SLOTS=None)
+        response = self.upload()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '7')
+        #other users and cheap pages are not affected
+        self.hold("user:someone-else", GLOBAL_SLOTS=None, PROCESS_SLOTS=None)
+        self.assertEqual(self.client.get('/about/').status_code, 200)
+        self.held.pop(0).release()
+        self.assertEqual(self.upload().status_code, 200)
+
+    def test_saturated_host_gets_503(self):
+        self.hold("user:a", PROCESS_SLOTS=None)
+        self.hold("user:b", PROCESS_SLOTS=None)
+        response = self.upload()
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '7')
+        self.assertEqual(self.client.get('/uploadpage/').status_code, 200)
+
+    def test_saturated_process_gets_503(self):
+        semaphore = process_semaphore(self.admission['PROCESS_SLOTS'])
+        for _ in range(2):
+            semaphore.acquire()
+        try:
+            self.assertEqual(self.upload().status_code, 503)
+        finally:
+            semaphore.release()
+            semaphore.release()
+        self.assertEqual(self.upload().status_code, 200)
+
+    def test_anonymous_clients_are_keyed_by_session_or_csrf_cookie(self):
+        request = RequestFactory().post('/uploadpage/', REMOTE_ADDR='10.0.0.1')
+        request.session = SessionStore()
+        #behind a proxy every client has its address, so that is no identity
+        self.assertIsNone(user_key(request, AnonymousUser()))
+        request.COOKIES['csrftoken'] = 'abc'
+        self.assertEqual(user_key(request, AnonymousUser()), 'csrf:abc')
+        request.session.create()
+        self.assertEqual(user_key(request, AnonymousUser()), f'session:{request.session.session_key}')
+
+        #clients without any identity don't share a per-user pool keyed on their (proxy's) address
+        self.client.logout()
+        self.hold("anonymous:127.0.0.1", GLOBAL_SLOTS=None, PROCESS_SLOTS=None)
+        self.assertEqual(self.upload().status_code, 200)
+
+    def test_result_and_surface_need_a_slot(self):
+        self.upload()
+        self.hold("user:a", PROCESS_SLOTS=None)
+        self.hold("user:b", PROCESS_SLOTS=None)
+        for path in ('/result/', '/surface/'):
+            response = self.client.get(path)
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '7')
+        self.held.pop().release()
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+        self.assertEqual(self.client.get('/surface/', {'temp_steps': 4, 'rh_steps': 4}).status_code, 200)
+
+    def test_current_conditional_gets_skip_admission(self):
+        self.upload()
+        etag = self.client.get('/result/')['ETag']
+        self.hold("user:a", PROCESS_SLOTS=None)
+        self.hold("user:b", PROCESS_SLOTS=None)
+        revalidated = self.client.get('/result/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(revalidated.status_code, 304)
+        self.assertIn('private', revalidated['Cache-Control'])
+        self.assertIn('Cookie', revalidated['Vary'])
+        #a stale copy needs the page built, and that needs a slot
+        self.assertEqual(self.client.get('/result/', HTTP_IF_NONE_MATCH='"stale"').status_code, 503)
+
+    def test_anonymous_clients_share_a_pool(self):
+        self.admission['ANONYMOUS_SLOTS'] = 1
+        self.hold("csrf:first", GLOBAL_SLOTS=None, PROCESS_SLOTS=None, anonymous=True)
+        #a fresh cookie is a fresh per-user identity, but not a way around the anonymous pool
+        self.client.logout()
+        self.client.cookies['csrftoken'] = 'rotated'
+        self.assertEqual(self.upload().status_code, 503)
+        self.client.force_login(self.user)
+        self.assertEqual(self.upload().status_code, 200)
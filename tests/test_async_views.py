@@ -0,0 +1,135 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+from asgiref.sync import sync_to_async
+import asyncio
+import json
+import os
+import tempfile
+import threading
+import time
+import uuid
+from mould_calculator import views
+from mould_calculator.compute import run_compute
+from mould_calculator.models import MouldAnalysis
+from mould_calculator.progress import ProgressBoard, progress_board
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-01 {h:02d}:00,22,{85 + h % 5}" for h in range(24)
+)
+
+class AsyncViewTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_COMPUTE_THREADS=2,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_PROGRESS_DIR=os.path.join(self.tmp.name, 'progress'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+        progress_board.clear()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def post_upload(self, token=None):
+        data = {'file': SimpleUploadedFile('readings.csv', CSV.encode(), content_type='text/csv')}
+        if token:
+            data['progress_token'] = token
+        return self.async_client.post('/uploadpage/', data, headers={'X-Requested-With': 'XMLHttpRequest'})
+
+    async def test_async_upload_stores_analysis_and_publishes_progress(self):
+        user = await sync_to_async(User.objects.create_user)('alice', password='pw-123456')
+        await self.async_client.aforce_login(user)
+        token = str(uuid.uuid4())
+
+        response = await self.post_upload(token)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), {'redirect_url': '/result'})
+        self.assertEqual(await MouldAnalysis.objects.filter(user=user).acount(), 1)
+        _, state = progress_board.snapshot(token)
+        self.assertEqual(state['status'], 'done')
+
+        result = await self.async_client.get('/result/')
+        self.assertEqual(result.status_code, 200)
+
+    async def test_anonymous_upload_reaches_result_page(self):
+        response = await self.post_upload()
+        self.assertEqual(response.status_code, 200)
+        result = await self.async_client.get('/result/')
+        self.assertEqual(result.status_code, 200)
+
+    async def test_events_stream_progress_until_done(self):
+        token = str(uuid.uuid4())
+        progress_board.publish(token, status='running', percent=40, stage='simulating')
+        response = await self.async_client.get(f'/uploads/{token}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+
+        events = []
+        async for chunk in response.streaming_content:
+            events.append(json.loads(chunk.decode().removeprefix('data: ')))
+            if len(events) == 1:
+                progress_board.publish(token, status='done', percent=100, stage='done', redirect_url='/result')
+        self.assertEqual([e['status'] for e in events], ['running', 'done'])
+        self.assertEqual(events[0]['stage'], 'simulating')
+
+    def test_events_poll_under_wsgi(self):
+        token = str(uuid.uuid4())
+        response = self.client.get(f'/uploads/{token}/events/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        self.assertEqual(response.content.decode(), f"retry: {views.EVENT_RETRY_MS}\n\n")
+
+        progress_board.publish(token, status='running', percent=40, stage='simulating')
+        body = self.client.get(f'/uploads/{token}/events/').content.decode()
+        data = body.split('data: ', 1)[1]
+        self.assertEqual(json.loads(data)['stage'], 'simulating')
+
+    def test_progress_is_shared_between_boards(self):
+        token = str(uuid.uuid4())
+        other_worker = ProgressBoard()
+        other_worker.publish(token, status='running', percent=10, stage='parsing')
+        other_worker.publish(token, status='done', percent=100, stage='done')
+        version, state = progress_board.snapshot(token)
+        self.assertEqual(version, 2)
+        self.assertEqual(state['status'], 'done')
+
+    async def test_compute_pool_is_bounded(self):
+        running, peak = [0], [0]
+        lock = threading.Lock()
+
+        def work():
+            with lock:
+                running[0] += 1
+                peak[0] = max(peak[0], running[0])
+            time.sleep(0.05)
+            with lock:
+                running[0] -= 1
+
+        await asyncio.gather(*(run_compute(work) for _ in range(6)))
+        self.assertEqual(peak[0], 2)
+
+    async def test_slow_upload_does_not_stall_other_requests(self):
+        release = threading.Event()
+        compute_upload = views.compute_upload
+
+        def slow_compute(*args):
+            release.wait(5)
+            return compute_upload(*args)
+
+        with mock.patch.object(views, 'compute_upload', slow_compute):
+            upload = asyncio.ensure_future(self.post_upload())
+            await asyncio.sleep(0.2)
+            self.assertFalse(upload.done())
+            about = await asyncio.wait_for(self.async_client.get('/about/'), timeout=2)
+            self.assertEqual(about.status_code, 200)
+            release.set()
+            response = await upload
+        self.assertEqual(response.status_code, 200)
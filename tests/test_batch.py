@@ -0,0 +1,100 @@
+from django.test import TestCase
+from django.core.files.uploadedfile import SimpleUploadedFile
+import io
+import os
+from unittest import mock
+import tempfile
+import zipfile
+from mould_calculator.batch import analyse_batch, analyse_sensor, building_summary
+
+def readings(humidity):
+    return "time,temperature,humidity\n" + "\n".join(
+        f"2025-01-{1 + h // 24:02d} {h % 24:02d}:00,22,{humidity}" for h in range(72)
+    )
+
+def crash_on_broken(args):
+    #stands in for a worker that dies (segfault, OOM kill) on one file
+    if args[0] == 'broken.csv':
+        os._exit(1)
+    return analyse_sensor(*args)
+
+class BatchAnalysisTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.paths = {}
+        for name, content in [('dry.csv', readings(40)), ('damp.csv', readings(97)), ('broken.csv', "a,b\n1,2\n")]:
+            path = os.path.join(self.tmp.name, name)
+            with open(path, 'w') as f:
+                f.write(content)
+            self.paths[name] = path
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_failures_are_isolated(self):
+        report = analyse_batch(self.paths.values(), processes=1)
+        sensors = {result['sensor']: result for result in report['sensors']}
+
+        self.assertEqual([result['sensor'] for result in report['sensors']], ['dry.csv', 'damp.csv', 'broken.csv'])
+        self.assertTrue(sensors['dry.csv']['ok'])
+        self.assertFalse(sensors['broken.csv']['ok'])
+        self.assertIn('Missing required columns', sensors['broken.csv']['error'])
+
+        summary = report['summary']
+        self.assertEqual((summary['sensors'], summary['analysed'], summary['failed']), (3, 2, 1))
+        self.assertEqual(summary['worst_sensor']['sensor'], 'damp.csv')
+        self.assertEqual(sum(summary['risk_levels'].values()), 2)
+
+    def test_process_pool_matches_inline(self):
+        sources = [(name, path) for name, path in self.paths.items()]
+        self.assertEqual(analyse_batch(sources, processes=2), analyse_batch(sources, processes=1))
+
+    def test_crashed_worker_only_fails_its_own_file(self):
+        sources = [(name, path) for name, path in self.paths.items()]
+        with mock.patch('mould_calculator.batch._analyse_sensor_args', crash_on_broken):
+            report = analyse_batch(sources, processes=2)
+        sensors = {result['sensor']: result for result in report['sensors']}
+        self.assertTrue(sensors['dry.csv']['ok'])
+        self.assertTrue(sensors['damp.csv']['ok'])
+        self.assertEqual(sensors['broken.csv'], {'sensor': 'broken.csv', 'ok': False,
+                                                 'error': "Worker process stopped unexpectedly."})
+
+    def test_empty_summary(self):
+        summary = building_summary([])
+        self.assertIsNone(summary['worst_sensor'])
+        self.assertEqual(summary['risk_levels'], {'Low': 0, 'Moderate': 0, 'High': 0})
+
+    def test_batch_endpoint_accepts_zip_and_csv(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('floor1/dry.csv', readings(40))
+            zf.writestr('floor1/broken.csv', "a,b\n1,2\n")
+            zf.writestr('notes.txt', "not a sensor")
+        response = self.client.post('/batch/', {'files': [
+            SimpleUploadedFile('sensors.zip', archive.getvalue(), content_type='application/zip'),
+            SimpleUploadedFile('damp.csv', readings(97).encode(), content_type='text/csv'),
+        ]})
+        self.assertEqual(response.status_code, 200)
+        report = response.json()
+        self.assertEqual([result['sensor'] for result in report['sensors']],
+                         ['floor1/dry.csv', 'floor1/broken.csv', 'damp.csv'])
+        self.assertEqual(report['summary']['failed'], 1)
+
+    def test_zip_bombs_fail_only_their_own_member(self):
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w', zipfile.ZIP_DEFLATED) as zf:
+            zf.writestr('bomb.csv', "time,temperature,humidity\n" + "0" * (8 * 1024 * 1024))
+            zf.writestr('dry.csv', readings(40))
+        self.assertLess(len(archive.getvalue()), 64 * 1024)
+        response = self.client.post('/batch/', {'files': [
+            SimpleUploadedFile('sensors.zip', archive.getvalue(), content_type='application/zip'),
+        ]})
+        self.assertEqual(response.status_code, 200)
+        bomb, dry = response.json()['sensors']
+        self.assertEqual((bomb['sensor'], bomb['ok']), ('bomb.csv', False))
+        self.assertIn('decompresses to more than', bomb['error'])
+        self.assertTrue(dry['ok'])
+
+    def test_batch_endpoint_requires_files(self):
+        self.assertEqual(self.client.post('/batch/').status_code, 400)
+        self.assertEqual(self.client.get('/batch/').status_code, 405)
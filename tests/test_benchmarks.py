@@ -0,0 +1,42 @@
+from django.test import SimpleTestCase
+import numpy as np
+import pandas as pd
+from benchmarks.generator import HEADERS, generate_readings
+from benchmarks.golden import check_golden
+from benchmarks.run import compare
+from mould_calculator.utils import standardize_dataframe
+
+class GeneratorTests(SimpleTestCase):
+    def test_generator_is_deterministic(self):
+        pd.testing.assert_frame_equal(generate_readings(500, seed=4), generate_readings(500, seed=4))
+
+    def test_every_header_variant_standardizes(self):
+        for header in HEADERS:
+            standardized = standardize_dataframe(generate_readings(200, header=header))
+            self.assertEqual(len(standardized), 200, header)
+
+    def test_gaps_skip_readings(self):
+        df = generate_readings(5000, interval_minutes=10, gap_rate=0.01, gap_length=36)
+        steps = pd.to_datetime(df['Timestamp']).diff().dt.total_seconds().dropna() / 60
+        self.assertEqual(set(np.unique(steps)), {10, 370})
+        self.assertTrue(df['Humidity'].between(0, 100).all())
+
+class RegressionCompareTests(SimpleTestCase):
+    def test_compare_flags_slowdowns_beyond_threshold(self):
+        baseline = {
+            'process_mold_index[1000]': {'seconds': 0.2, 'peak_mb': 50.0},
+            'mould_score[1000]': {'seconds': 0.001, 'peak_mb': 0.1},
+        }
+        results = {
+            'process_mold_index[1000]': {'seconds': 0.3, 'peak_mb': 52.0},
+            #tiny absolute changes are noise
+            'mould_score[1000]': {'seconds': 0.002, 'peak_mb': 0.3},
+            'new_case[1000]': {'seconds': 9.0, 'peak_mb': 9.0},
+        }
+        regressions = compare(results, baseline, threshold=0.25)
+        self.assertEqual(len(regressions), 1)
+        self.assertIn('process_mold_index[1000] seconds', regressions[0])
+
+class GoldenOutputTests(SimpleTestCase):
+    def test_engines_match_golden_outputs(self):
+        self.assertEqual(check_golden(), [])
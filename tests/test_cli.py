@@ -0,0 +1,82 @@
+from django.test import SimpleTestCase
+import csv
+import io
+import json
+import os
+import subprocess
+import sys
+import tempfile
+from unittest import mock
+from mould_calculator import api
+from mould_calculator.__main__ import main
+from mould_calculator.utils import analyse_dataframe
+from benchmarks.generator import generate_csv, generate_readings
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(code, stdin=None):
+    env = {key: value for key, value in os.environ.items() if key not in ('DJANGO_SETTINGS_MODULE', 'DATABASE_URL')}
+    env['PYTHONPATH'] = REPO
+    return subprocess.run([sys.executable, '-c', code], input=stdin, capture_output=True, env=env, check=True).stdout
+
+class CliTests(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'readings.csv')
+        with open(self.path, 'wb') as f:
+            f.write(generate_csv(2000))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_main(self, *argv):
+        out = io.StringIO()
+        return main(list(argv), stdout=out), out.getvalue()
+
+    def test_json_matches_the_web_analysis(self):
+        status, out = self.run_main(self.path)
+        self.assertEqual(status, 0)
+        [result] = json.loads(out)
+        expected = analyse_dataframe(generate_readings(2000))
+        self.assertTrue(result['ok'])
+        self.assertAlmostEqual(result['mould_index'], expected['mould_index'], places=9)
+        self.assertEqual(result['used_timeframe'], expected['used_timeframe'])
+
+    def test_json_is_a_list_for_any_number_of_inputs(self):
+        for sources in ([self.path], [self.path, self.path]):
+            status, out = self.run_main('--format', 'json', *sources)
+            results = json.loads(out)
+            self.assertIsInstance(results, list)
+            self.assertEqual([result['source'] for result in results], sources)
+
+    def test_jsonl_and_csv_report_failures(self):
+        status, out = self.run_main('--format', 'jsonl', self.path, os.path.join(self.tmp.name, 'missing.csv'))
+        self.assertEqual(status, 1)
+        lines = [json.loads(line) for line in out.splitlines()]
+        self.assertEqual([line['ok'] for line in lines], [True, False])
+        self.assertIn('No such file', lines[1]['error'])
+
+        status, out = self.run_main('--format', 'csv', '--timing', self.path)
+        rows = list(csv.DictReader(io.StringIO(out)))
+        self.assertEqual((status, rows[0]['ok'], rows[0]['risk_level']), (0, 'True', 'High'))
+        self.assertGreater(float(rows[0]['seconds']), 0)
+
+    def test_stdin_and_resampling(self):
+        with open(self.path) as f, mock.patch('sys.stdin', f):
+            status, out = self.run_main('--resample', '60')
+        self.assertEqual(status, 0)
+        self.assertEqual(json.loads(out)[0]['resampling']['output_rows'], 334)
+        self.assertEqual(self.run_main('--resample', '-5')[0], 2)
+
+    def test_runs_without_django_and_imports_lazily(self):
+        out = run_python("import sys, mould_calculator.api; print(sorted(m for m in ('pandas', 'numpy', 'django') if m in sys.modules))")
+        self.assertEqual(out.decode().strip(), '[]')
+
+        with open(self.path, 'rb') as f:
+            out = run_python(
+                "import sys; from mould_calculator.__main__ import main; status = main(['-']); "
+                "print('django' in sys.modules, status)",
+                stdin=f.read(),
+            )
+        self.assertTrue(out.decode().strip().endswith('False 0'))
+        self.assertEqual(api.score_file(self.path)['risk_level'], 'High')
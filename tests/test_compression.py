@@ -0,0 +1,124 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+import bz2
+import gzip
+import io
+import lzma
+import os
+import tempfile
+import zipfile
+from mould_calculator.ingest import (MAX_COMPRESSION_RATIO, analyse_file, detect_compression, read_standardized,
+                                     stream_analysis, uncompressed_size)
+from mould_calculator.models import MouldAnalysis
+
+CSV = ("time,temperature,humidity\n" + "\n".join(
+    f"2025-01-{1 + h // 24:02d} {h % 24:02d}:00,21,{84 + h % 7}" for h in range(24 * 20)
+) + "\n").encode()
+
+def zipped(*members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name in members:
+            archive.writestr(name, CSV)
+    return buffer.getvalue()
+
+COMPRESSED = {
+    'gzip': gzip.compress(CSV),
+    'bz2': bz2.compress(CSV),
+    'xz': lzma.compress(CSV),
+    'zip': zipped('__MACOSX/._readings.csv', 'readings.csv'),
+}
+
+class CompressedInputTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def write(self, name, content):
+        path = os.path.join(self.tmp.name, name)
+        with open(path, 'wb') as f:
+            f.write(content)
+        return path
+
+    def test_formats_are_detected_by_content_and_read_as_csv(self):
+        plain = self.write('plain.csv', CSV)
+        expected = read_standardized(plain)
+        self.assertIsNone(detect_compression(plain))
+        for compression, content in COMPRESSED.items():
+            #the names say nothing about the compression
+            path = self.write(f'{compression}.csv', content)
+            self.assertEqual(detect_compression(path), compression)
+            self.assertEqual(read_standardized(path, chunksize=50)['Humidity'].tolist(), expected['Humidity'].tolist())
+            self.assertEqual(stream_analysis(path, chunksize=50), stream_analysis(plain, chunksize=50))
+            self.assertEqual(analyse_file(path), analyse_file(plain))
+
+    def test_uncompressed_size(self):
+        self.assertEqual(uncompressed_size(self.write('a.gz', COMPRESSED['gzip'])), len(CSV))
+        self.assertEqual(uncompressed_size(self.write('a.zip', COMPRESSED['zip'])), len(CSV))
+        self.assertEqual(uncompressed_size(self.write('a.csv', CSV)), len(CSV))
+
+    def test_zip_must_hold_one_csv(self):
+        path = self.write('two.zip', zipped('a.csv', 'b.csv'))
+        with self.assertRaisesRegex(ValueError, 'exactly one CSV'):
+            read_standardized(path)
+
+    def test_uploads_are_stored_compressed(self):
+        user = User.objects.create_user('owner', password='pw-123456')
+        self.client.force_login(user)
+        response = self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv.gz', COMPRESSED['gzip'], content_type='application/gzip'),
+        })
+        self.assertRedirects(response, '/result/', fetch_redirect_response=False)
+        analysis = MouldAnalysis.objects.get()
+        self.assertEqual(os.path.getsize(analysis.file.path), len(COMPRESSED['gzip']))
+        self.assertEqual(detect_compression(analysis.file.path), 'gzip')
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+
+    def test_anonymous_zip_upload_shows_result(self):
+        response = self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.zip', COMPRESSED['zip'], content_type='application/zip'),
+        })
+        self.assertRedirects(response, '/result/', fetch_redirect_response=False)
+        response = self.client.get('/result/')
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, '21')
+
+    def test_decompression_bombs_are_stopped(self):
+        #a valid header over megabytes of one repeated byte compresses about 1000:1
+        payload = b"time,temperature,humidity\n" + b"0" * (16 * 1024 * 1024)
+        for compression, compress in (('gzip', gzip.compress), ('bz2', bz2.compress), ('zip', None)):
+            if compress is None:
+                buffer = io.BytesIO()
+                with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+                    archive.writestr('readings.csv', payload)
+                content = buffer.getvalue()
+            else:
+                content = compress(payload)
+            self.assertGreater(len(payload), len(content) * MAX_COMPRESSION_RATIO)
+            path = self.write(f'bomb.{compression}', content)
+            with self.assertRaisesRegex(ValueError, 'decompresses to more than'):
+                read_standardized(path)
+            with self.assertRaisesRegex(ValueError, 'decompresses to more than'):
+                stream_analysis(path)
+
+        user = User.objects.create_user('owner', password='pw-123456')
+        self.client.force_login(user)
+        response = self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv.gz', gzip.compress(payload), content_type='application/gzip'),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+        self.assertEqual(response.status_code, 500)
+        self.assertIn('decompresses to more than', response.json()['error'])
+        self.assertFalse(MouldAnalysis.objects.exists())
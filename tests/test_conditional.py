@@ -0,0 +1,96 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+import os
+import tempfile
+from mould_calculator.models import MouldAnalysis
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-{1 + h // 24:02d} {h % 24:02d}:00,22,{85 + h % 5}" for h in range(24 * 3)
+)
+
+class ConditionalRequestTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self, content=CSV, name='readings.csv'):
+        self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile(name, content.encode(), content_type='text/csv'),
+        })
+
+    def login(self):
+        user = User.objects.create_user('owner', password='pw-123456')
+        self.client.force_login(user)
+        return user
+
+    def assert_private(self, response):
+        self.assertIn('private', response['Cache-Control'])
+        self.assertIn('no-cache', response['Cache-Control'])
+        self.assertIn('Cookie', response['Vary'])
+
+    def test_result_revalidates_without_computing(self):
+        self.login()
+        self.upload()
+        response = self.client.get('/result/')
+        self.assertEqual(response.status_code, 200)
+        self.assert_private(response)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+        self.assertFalse(etag.startswith('W/'))
+
+        with mock.patch('mould_calculator.views.cached_analysis', side_effect=AssertionError("computed")):
+            cached = self.client.get('/result/', HTTP_IF_NONE_MATCH=etag)
+            self.assertEqual(cached.status_code, 304)
+            self.assertEqual(cached['ETag'], etag)
+            self.assert_private(cached)
+            self.assertEqual(self.client.get('/result/', HTTP_IF_MODIFIED_SINCE=last_modified).status_code, 304)
+
+        #another dataset, or another resampling of the same one, is a different response
+        self.upload(CSV.replace(',22,', ',23,'), name='other.csv')
+        other = self.client.get('/result/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(other.status_code, 200)
+        self.assertNotEqual(other['ETag'], etag)
+        first = MouldAnalysis.objects.order_by('id').first()
+        with override_settings(MOULD_RESAMPLE={'INTERVAL_MINUTES': 60}):
+            resampled = self.client.get('/result/', {'dataset_id': first.id})
+        self.assertNotEqual(resampled['ETag'], self.client.get('/result/', {'dataset_id': first.id})['ETag'])
+
+    def test_anonymous_result_gets_validators(self):
+        self.upload()
+        response = self.client.get('/result/')
+        self.assertEqual(self.client.get('/result/', HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+    def test_series_and_rollups_answer_304(self):
+        self.login()
+        self.upload()
+        series = self.client.get('/result/series/?points=100')
+        self.assertEqual(series.status_code, 200)
+        self.assert_private(series)
+        with mock.patch('mould_calculator.views.load_or_build_pyramid', side_effect=AssertionError("built")):
+            self.assertEqual(
+                self.client.get('/result/series/?points=100', HTTP_IF_NONE_MATCH=series['ETag']).status_code, 304
+            )
+
+        analysis = MouldAnalysis.objects.get()
+        rollups = self.client.get('/analyses/rollups/', {'ids': analysis.id})
+        self.assertEqual(rollups.status_code, 200)
+        self.assert_private(rollups)
+        self.assertEqual(
+            self.client.get('/analyses/rollups/', {'ids': analysis.id}, HTTP_IF_NONE_MATCH=rollups['ETag']).status_code,
+            304,
+        )
+        self.assertEqual(self.client.get('/analyses/rollups/', {'ids': 'x'}).status_code, 400)
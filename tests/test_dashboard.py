@@ -0,0 +1,90 @@
+from django.test import TestCase
+from django.contrib.auth.models import User
+from django.utils import timezone
+from datetime import timedelta
+from mould_calculator.models import MouldAnalysis, MouldSummary
+from mould_calculator import views
+
+class DashboardTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('alice', password='pw-123456')
+        self.client.force_login(self.user)
+
+    def add(self, mould_index, risk_level='Low'):
+        return MouldAnalysis.objects.create(
+            user=self.user, filename=f'{mould_index}.csv', file='uploads/x.csv', temperature=20,
+            humidity=80, mould_index=mould_index, risk_level=risk_level, risk_message='',
+        )
+
+    def test_summary_follows_creates_and_deletes(self):
+        first = self.add(10)
+        worst = self.add(50, 'High')
+        latest = self.add(20, 'Moderate')
+        summary = MouldSummary.objects.get(user=self.user)
+        self.assertEqual((summary.total, summary.low_count, summary.moderate_count, summary.high_count), (3, 1, 1, 1))
+        self.assertEqual((summary.latest_id, summary.worst_id), (latest.id, worst.id))
+        self.assertAlmostEqual(summary.trend, -30)
+
+        worst.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total, summary.high_count, summary.worst_id), (2, 0, latest.id))
+        self.assertAlmostEqual(summary.trend, 10)
+
+        latest.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.latest_id, summary.worst_id, summary.trend), (first.id, first.id, None))
+
+        first.delete()
+        summary.refresh_from_db()
+        self.assertEqual((summary.total, summary.latest_id, summary.worst_id), (0, None, None))
+
+    def test_summary_is_rebuilt_for_existing_analyses(self):
+        self.add(10)
+        self.add(40, 'High')
+        MouldSummary.objects.all().delete()
+        self.client.get('/dashboard/')
+        summary = MouldSummary.objects.get(user=self.user)
+        self.assertEqual((summary.total, summary.worst_index), (2, 40))
+
+    def test_keyset_pagination(self):
+        now = timezone.now()
+        created = [self.add(i) for i in range(7)]
+        #two analyses share a timestamp, so the id breaks the tie
+        for i, analysis in enumerate(created):
+            MouldAnalysis.objects.filter(id=analysis.id).update(uploaded_at=now - timedelta(minutes=min(i, 5)))
+        newest_first = list(MouldAnalysis.objects.order_by('-uploaded_at', '-id').values_list('id', flat=True))
+
+        original = views.DASHBOARD_PAGE_SIZE
+        views.DASHBOARD_PAGE_SIZE = 3
+        try:
+            seen = []
+            response = self.client.get('/dashboard/')
+            self.assertIsNone(response.context['newer_cursor'])
+            while True:
+                seen += [a.id for a in response.context['analyses']]
+                if response.context['older_cursor'] is None:
+                    break
+                response = self.client.get('/dashboard/', {'after': response.context['older_cursor']})
+            self.assertEqual(seen, newest_first)
+
+            back = self.client.get('/dashboard/', {'before': response.context['newer_cursor']})
+            self.assertEqual([a.id for a in back.context['analyses']], newest_first[3:6])
+            self.assertEqual(self.client.get('/dashboard/', {'after': 'junk'}).status_code, 200)
+            #cursors past what timedelta or the id column can hold are ignored like junk
+            for cursor in ('99999999999999999999.1', '-99999999999999999999.1', f'0.{2 ** 64}'):
+                response = self.client.get('/dashboard/', {'after': cursor})
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual([a.id for a in response.context['analyses']], newest_first[:3])
+        finally:
+            views.DASHBOARD_PAGE_SIZE = original
+
+    def test_dashboard_query_count_does_not_grow(self):
+        for i in range(5):
+            self.add(i)
+        self.client.get('/dashboard/')
+        with self.assertNumQueries(4):
+            self.client.get('/dashboard/')
+        for i in range(30):
+            self.add(i)
+        with self.assertNumQueries(4):
+            self.client.get('/dashboard/')
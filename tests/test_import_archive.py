@@ -0,0 +1,79 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from io import StringIO
+from unittest import mock
+import os
+import tempfile
+from mould_calculator.models import AnalysisRollup, MouldAnalysis, MouldSummary
+
+def csv_text(days, humidity):
+    return "time,temperature,humidity\n" + "\n".join(
+        f"2025-01-{1 + h // 24:02d} {h % 24:02d}:00,21,{humidity + h % 3}" for h in range(days * 24)
+    )
+
+class ImportArchiveTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.media = os.path.join(self.tmp.name, 'media')
+        self.archive = os.path.join(self.tmp.name, 'archive')
+        self.settings_override = override_settings(MEDIA_ROOT=self.media)
+        self.settings_override.enable()
+        self.user = User.objects.create_user('archivist', password='pw-123456')
+
+        self.write('2023/kitchen.csv', csv_text(3, 88))
+        self.write('2023/attic.CSV', csv_text(2, 60))
+        self.write('2024/kitchen-copy.csv', csv_text(3, 88))
+        self.write('2024/broken.csv', "a,b\n1,2\n")
+        self.write('2024/notes.txt', "not a logger file")
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def write(self, name, text):
+        path = os.path.join(self.archive, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w') as f:
+            f.write(text)
+
+    def run_import(self, *args):
+        out, err = StringIO(), StringIO()
+        call_command('import_archive', self.archive, '--user', 'archivist', *args, stdout=out, stderr=err)
+        return out.getvalue(), err.getvalue()
+
+    def test_import_writes_analyses_rollups_and_summary(self):
+        out, err = self.run_import('--processes', '2', '--batch-size', '1')
+        self.assertIn("Imported 2 files, skipped 1, failed 1", out)
+        self.assertIn("files/s", out)
+        self.assertIn("broken.csv", err)
+
+        analyses = MouldAnalysis.objects.filter(user=self.user).order_by('filename')
+        self.assertEqual([a.filename for a in analyses], ['2023/attic.CSV', '2023/kitchen.csv'])
+        for analysis in analyses:
+            self.assertTrue(os.path.exists(analysis.file.path))
+            self.assertEqual(len(analysis.content_hash), 64)
+        self.assertEqual(AnalysisRollup.objects.filter(analysis__user=self.user, period='day').count(), 5)
+        summary = MouldSummary.objects.get(user=self.user)
+        self.assertEqual(summary.total, 2)
+        #the duplicate's copy doesn't stay behind
+        stored = sorted(name for name in os.listdir(os.path.join(self.media, 'uploads', 'archive'))
+                        if not name.endswith('.mould'))
+        self.assertEqual(stored, sorted(os.path.basename(a.file.name) for a in analyses))
+
+    def test_summary_is_rebuilt_once(self):
+        with mock.patch.object(MouldSummary, 'rebuild', wraps=MouldSummary.rebuild) as rebuild:
+            self.run_import('--processes', '1', '--batch-size', '1')
+        rebuild.assert_called_once_with(self.user.id)
+        self.assertEqual(MouldSummary.objects.get(user=self.user).total, 2)
+
+    def test_rerun_skips_imported_files(self):
+        self.run_import('--processes', '1')
+        self.write('2025/new.csv', csv_text(1, 95))
+        out, _ = self.run_import('--processes', '1')
+        self.assertIn("Imported 1 files, skipped 3, failed 1", out)
+        self.assertEqual(MouldAnalysis.objects.filter(user=self.user).count(), 3)
+
+    def test_unknown_user_is_an_error(self):
+        with self.assertRaises(CommandError):
+            call_command('import_archive', self.archive, '--user', 'nobody', stdout=StringIO())
@@ -0,0 +1,60 @@
+from django.test import TestCase
+from collections import Counter
+import numpy as np
+import os
+import pandas as pd
+import tempfile
+from mould_calculator.ingest import analyse_file, median_interval_minutes, read_standardized, stream_analysis
+from mould_calculator.utils import analyse_dataframe
+
+class ChunkedIngestionTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_csv(self, rows=2000, seed=0, shuffle=False):
+        rng = np.random.default_rng(seed)
+        steps = rng.choice([10, 10, 10, 20, 60], size=rows)
+        df = pd.DataFrame({
+            'Local Date/Time': (pd.Timestamp('2025-03-01') + pd.to_timedelta(np.cumsum(steps), unit='min')).strftime('%Y-%m-%d %H:%M'),
+            'Temp (°C)': (18 + 6 * np.sin(np.arange(rows) / 40) + rng.normal(0, 1, rows)).round(1),
+            'RH (%)': (82 + 10 * np.sin(np.arange(rows) / 90) + rng.normal(0, 3, rows)).round(1),
+        })
+        df.loc[5, 'RH (%)'] = np.nan
+        if shuffle:
+            df = df.sample(frac=1, random_state=seed)
+        path = os.path.join(self.tmp.name, f'readings_{seed}.csv')
+        df.to_csv(path, index=False)
+        return path
+
+    def test_streamed_result_matches_in_memory(self):
+        for seed, rolling_window in [(0, None), (1, 3), (2, 1)]:
+            path = self.write_csv(seed=seed)
+            expected = analyse_dataframe(pd.read_csv(path), rolling_window)
+            streamed = stream_analysis(path, rolling_window, chunksize=137)
+
+            self.assertAlmostEqual(streamed['mould_index'], expected['mould_index'], delta=1e-6)
+            for key in ('risk_level', 'status', 'current_temperature', 'current_humidity', 'used_timeframe'):
+                self.assertEqual(streamed[key], expected[key])
+
+    def test_unsorted_input_falls_back_to_in_memory(self):
+        path = self.write_csv(shuffle=True)
+        self.assertIsNone(stream_analysis(path, chunksize=100))
+        expected = analyse_dataframe(pd.read_csv(path))
+        self.assertEqual(analyse_file(path, streaming_threshold=0, chunksize=100), expected)
+
+    def test_median_interval_from_histogram(self):
+        deltas = [60, 60, 120, 600, 600, 600]
+        counts = Counter(int(d * 1e9) for d in deltas)
+        expected = pd.Series(deltas).median() / 60.0
+        self.assertEqual(median_interval_minutes(counts), expected)
+        self.assertEqual(median_interval_minutes(Counter()), 60.0)
+
+    def test_sparse_metadata_column_keeps_rows(self):
+        path = os.path.join(self.tmp.name, 'logger.csv')
+        pd.DataFrame({'Timestamp': pd.date_range('2025-01-01', periods=24, freq='h').strftime('%Y-%m-%d %H:%M'),
+                      'Temperature': 20.0, 'Humidity': 95.0, 'Serial': ['SN-0042'] + [None] * 23}).to_csv(path, index=False)
+        self.assertEqual(len(read_standardized(path, chunksize=5)), 24)
+        self.assertAlmostEqual(stream_analysis(path, None, chunksize=5)['mould_index'], 5.333, places=3)
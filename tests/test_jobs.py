@@ -0,0 +1,98 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from datetime import timedelta
+import os
+import tempfile
+from mould_calculator.jobs import MAX_ATTEMPTS, claim_next_job, requeue_stale_jobs, run_job
+from mould_calculator.models import AnalysisJob, MouldAnalysis
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-01 {h:02d}:00,22,{85 + h % 5}" for h in range(24)
+)
+
+class AnalysisJobTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_BACKGROUND_JOBS=True,
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self, content=CSV):
+        return self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv', content.encode(), content_type='text/csv'),
+        }, HTTP_X_REQUESTED_WITH='XMLHttpRequest')
+
+    def test_ajax_upload_is_queued(self):
+        response = self.upload()
+        self.assertEqual(response.status_code, 202)
+        job = AnalysisJob.objects.get()
+        self.assertEqual(job.status, AnalysisJob.QUEUED)
+        self.assertEqual(response.json()['status_url'], f'/jobs/{job.id}/')
+
+        status = self.client.get(response.json()['status_url']).json()
+        self.assertEqual(status, {'status': 'queued', 'progress': 0})
+
+    def test_worker_runs_job_and_status_redirects_to_result(self):
+        user = User.objects.create_user('alice', password='pw-123456')
+        self.client.force_login(user)
+        status_url = self.upload().json()['status_url']
+
+        job = claim_next_job('test-worker')
+        self.assertEqual(job.status, AnalysisJob.RUNNING)
+        self.assertEqual(job.attempts, 1)
+        self.assertIsNone(claim_next_job('test-worker'))
+        run_job(job)
+
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual(status['progress'], 100)
+        self.assertEqual(status['redirect_url'], '/result/')
+        self.assertEqual(AnalysisJob.objects.get().analysis, MouldAnalysis.objects.get(user=user))
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+
+    def test_anonymous_job_result(self):
+        status_url = self.upload().json()['status_url']
+        run_job(claim_next_job('test-worker'))
+        self.assertEqual(self.client.get(status_url).json()['status'], 'done')
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+
+    def test_failed_job_reports_error(self):
+        status_url = self.upload("a,b\n1,2\n").json()['status_url']
+        run_job(claim_next_job('test-worker'))
+        status = self.client.get(status_url).json()
+        self.assertEqual(status['status'], 'failed')
+        self.assertIn('Missing required columns', status['error'])
+
+    def test_other_sessions_cannot_see_job(self):
+        status_url = self.upload().json()['status_url']
+        self.client.cookies.clear()
+        self.assertEqual(self.client.get(status_url).status_code, 404)
+
+    def test_stale_running_jobs_are_requeued(self):
+        self.upload()
+        job = claim_next_job('crashed-worker')
+        AnalysisJob.objects.filter(id=job.id).update(heartbeat_at=timezone.now() - timedelta(minutes=10))
+
+        self.assertEqual(requeue_stale_jobs(stale_after=60), (1, 0))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.QUEUED)
+        self.assertEqual(claim_next_job('test-worker').attempts, 2)
+
+        AnalysisJob.objects.filter(id=job.id).update(
+            attempts=MAX_ATTEMPTS, heartbeat_at=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(requeue_stale_jobs(stale_after=60), (0, 1))
+        job.refresh_from_db()
+        self.assertEqual(job.status, AnalysisJob.FAILED)
@@ -0,0 +1,102 @@
+from django.test import TestCase, override_settings
+from unittest import mock
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import pandas as pd
+from mould_calculator import metrics
+from mould_calculator.utils import process_mold_index
+
+#value of one sample line in a Prometheus text page, 0 when it is missing
+def sample(text, name, **labels):
+    selector = name + ('{' + ','.join(f'{k}="{v}"' for k, v in labels.items()) + '}' if labels else '')
+    for line in text.splitlines():
+        if line.startswith(selector + ' '):
+            return float(line.rsplit(' ', 1)[1])
+    return 0
+
+class MetricsTests(TestCase):
+    def test_histogram_buckets_are_cumulative(self):
+        histogram = metrics.histogram('test_latency_seconds', "Test histogram", ('view',), buckets=(0.1, 1.0))
+        for value in (0.05, 0.5, 0.5, 5):
+            histogram.observe(value, 'a"b')
+        text = metrics.render()
+        self.assertIn('# TYPE test_latency_seconds histogram', text)
+        self.assertEqual(sample(text, 'test_latency_seconds_bucket', view='a\\"b', le='0.1'), 1)
+        self.assertEqual(sample(text, 'test_latency_seconds_bucket', view='a\\"b', le='1.0'), 3)
+        self.assertEqual(sample(text, 'test_latency_seconds_bucket', view='a\\"b', le='+Inf'), 4)
+        self.assertEqual(sample(text, 'test_latency_seconds_count', view='a\\"b'), 4)
+        self.assertEqual(sample(text, 'test_latency_seconds_sum', view='a\\"b'), 6.05)
+
+    def test_requests_and_pipeline_are_recorded(self):
+        before = metrics.render()
+        self.client.get('/about/')
+        frame = pd.DataFrame({
+            'time': pd.date_range('2025-01-01', periods=48, freq='h'),
+            'temperature': [20.0] * 48,
+            'humidity': [90.0] * 48,
+        })
+        process_mold_index(frame)
+        process_mold_index(pd.DataFrame({'nothing': [1]}))
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+        for name, labels, delta in [
+            ('mould_http_requests_total', {'view': 'about', 'method': 'GET', 'status': '200'}, 1),
+            ('mould_http_request_duration_seconds_count', {'view': 'about', 'method': 'GET'}, 1),
+            ('mould_pipeline_rows_total', {'stage': 'simulation'}, 48),
+            ('mould_pipeline_stage_seconds_count', {'stage': 'simulation'}, 1),
+            ('mould_pipeline_failures_total', {'function': 'process_mold_index'}, 1),
+        ]:
+            self.assertEqual(sample(text, name, **labels) - sample(before, name, **labels), delta, name)
+
+    def test_snapshots_of_other_processes_are_added(self):
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.configure(directory)
+            try:
+                local = sample(metrics.render(), 'mould_pipeline_failures_total', function='elsewhere')
+                code = ("from mould_calculator import metrics; metrics.configure(%r); "
+                        "metrics.count_failure('elsewhere'); metrics.count_failure('elsewhere')" % directory)
+                #the other process only writes its snapshot at exit
+                subprocess.run([sys.executable, '-c', code], check=True, cwd=os.getcwd())
+                metrics.count_failure('elsewhere')
+                total = sample(metrics.render(), 'mould_pipeline_failures_total', function='elsewhere')
+                self.assertEqual(total - local, 3)
+                self.assertEqual(len([name for name in os.listdir(directory) if name.endswith('.json')]), 2)
+            finally:
+                metrics.configure(None)
+
+    def test_scrapes_are_restricted(self):
+        with override_settings(MOULD_METRICS_ACCESS={'TOKEN': 's3cret', 'ALLOWED_IPS': ['10.0.0.5']}):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer wrong'}).status_code, 403)
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer s3cret'}).status_code, 200)
+            self.assertEqual(self.client.get('/metrics', REMOTE_ADDR='10.0.0.5').status_code, 200)
+        with override_settings(MOULD_METRICS_ACCESS={'TOKEN': None, 'ALLOWED_IPS': []}):
+            self.assertEqual(self.client.get('/metrics', headers={'Authorization': 'Bearer '}).status_code, 403)
+
+    def test_snapshots_are_written_in_the_background(self):
+        with tempfile.TemporaryDirectory() as directory:
+            metrics.configure(directory)
+            try:
+                with mock.patch('mould_calculator.metrics.FLUSH_INTERVAL', 0.05):
+                    metrics.count_failure('background')
+                    with mock.patch('mould_calculator.metrics.flush', side_effect=AssertionError("flushed")):
+                        self.assertEqual(sample(metrics.render(), 'mould_pipeline_failures_total',
+                                                function='background'), 1)
+                    deadline = time.monotonic() + 5
+                    while time.monotonic() < deadline:
+                        written = [os.path.join(directory, name) for name in os.listdir(directory)
+                                   if name.endswith('.json')]
+                        with open(written[0]) as f:
+                            if 'background' in f.read():
+                                break
+                        time.sleep(0.05)
+                    else:
+                        self.fail("snapshot was not flushed")
+            finally:
+                metrics.configure(None)
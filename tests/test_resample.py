@@ -0,0 +1,77 @@
+from django.test import SimpleTestCase, override_settings
+import numpy as np
+import pandas as pd
+from mould_calculator.cache import configured_resampling, result_key
+from mould_calculator.resample import Resampling, resample_readings
+from mould_calculator.utils import analyse_dataframe, process_mold_index, standardize_dataframe
+
+def readings(rows, freq, start='2025-01-01'):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Timestamp': pd.date_range(start, periods=rows, freq=freq),
+        'Temperature': (18 + rng.normal(0, 1, rows)).round(1),
+        'Humidity': (84 + 6 * np.sin(np.arange(rows) / 500)).round(1),
+    })
+
+class ResampleTests(SimpleTestCase):
+    def test_high_frequency_readings_are_averaged_into_buckets(self):
+        standardized = standardize_dataframe(readings(6000, '10s'))
+        resampled, report = resample_readings(standardized, Resampling(10))
+        self.assertEqual(len(resampled), 100)
+        self.assertEqual(report['reduction'], 60)
+        self.assertEqual((report['gaps'], report['interpolated_buckets']), (0, 0))
+        self.assertEqual(resampled['Timestamp'][1], pd.Timestamp('2025-01-01 00:10'))
+        self.assertAlmostEqual(resampled['Temperature'][0], standardized['Temperature'][:60].mean())
+
+    def test_resampling_on_the_logger_grid_changes_nothing(self):
+        df = readings(2000, '10min')
+        raw = process_mold_index(df.copy())[0]
+        resampled = process_mold_index(df.copy(), resampling=Resampling(10))[0]
+        self.assertAlmostEqual(raw, resampled, places=9)
+
+    def gapped(self, gap_minutes):
+        df = readings(200, '10min')
+        df.loc[100:, 'Timestamp'] += pd.Timedelta(minutes=gap_minutes)
+        return standardize_dataframe(df)
+
+    def test_short_gaps_are_interpolated(self):
+        standardized = self.gapped(30)
+        resampled, report = resample_readings(standardized, Resampling(10, 'interpolate', 60))
+        self.assertEqual((report['gaps'], report['interpolated_buckets'], len(resampled)), (1, 3, 203))
+        before, after = standardized['Humidity'].iloc[99], standardized['Humidity'].iloc[100]
+        self.assertAlmostEqual(resampled['Humidity'][100], before + (after - before) / 4)
+
+    def test_long_gaps_are_masked(self):
+        for policy in ('mask', 'interpolate'):
+            resampled, report = resample_readings(self.gapped(600), Resampling(10, policy, 60))
+            self.assertEqual((report['long_gaps'], report['interpolated_buckets'], len(resampled)), (1, 0, 200))
+            self.assertEqual(report['longest_gap_minutes'], 600)
+
+    def test_segment_policy_keeps_the_latest_segment(self):
+        resampled, report = resample_readings(self.gapped(600), Resampling(10, 'segment', 60))
+        self.assertEqual((report['segments'], report['dropped_rows'], len(resampled)), (2, 100, 100))
+
+    def test_timezones_are_kept(self):
+        df = readings(120, '1min')
+        df['Timestamp'] = df['Timestamp'].dt.tz_localize('Europe/London')
+        resampled, _ = resample_readings(standardize_dataframe(df), Resampling(60))
+        self.assertEqual(str(resampled['Timestamp'].dt.tz), 'Europe/London')
+        self.assertEqual(resampled['Timestamp'][1], pd.Timestamp('2025-01-01 01:00', tz='Europe/London'))
+
+    def test_bad_settings_are_rejected(self):
+        standardized = standardize_dataframe(readings(10, '10min'))
+        with self.assertRaises(ValueError):
+            resample_readings(standardized, Resampling(0))
+        with self.assertRaises(ValueError):
+            resample_readings(standardized, Resampling(10, 'guess'))
+
+    def test_summary_reports_resampling_and_cache_key_changes(self):
+        summary = analyse_dataframe(readings(6000, '10s'), resampling=Resampling(10))
+        self.assertEqual(summary['resampling']['output_rows'], 100)
+        self.assertNotIn('resampling', analyse_dataframe(readings(600, '10s')))
+        with override_settings(MOULD_RESAMPLE={'INTERVAL_MINUTES': 10}):
+            resampling = configured_resampling()
+        self.assertEqual(resampling, Resampling(10, 'interpolate', 60))
+        self.assertNotEqual(result_key('abc'), result_key('abc', resampling=resampling))
+        with override_settings(MOULD_RESAMPLE={'INTERVAL_MINUTES': None}):
+            self.assertIsNone(configured_resampling())
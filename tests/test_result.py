@@ -0,0 +1,49 @@
+from django.test import TestCase
+import numpy as np
+import pandas as pd
+from mould_calculator.tracing import Trace, tracing
+from mould_calculator.utils import MouldResult, compute_mould_result, mould_score, process_mold_index
+
+def readings(rows=300):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'time': pd.date_range('2025-01-01', periods=rows, freq='h'),
+        'temperature': (18 + rng.normal(0, 2, rows)).round(1),
+        'humidity': (85 + rng.normal(0, 4, rows)).round(1),
+    })
+
+class MouldResultTests(TestCase):
+    def test_derived_views_are_built_on_first_access(self):
+        with tracing(Trace()) as trace:
+            result = compute_mould_result(readings())
+            self.assertIsInstance(result, MouldResult)
+            self.assertNotIn('records', result.__dict__)
+            self.assertNotIn('series', result.__dict__)
+            stages = [s['stage'] for s in trace.summary()['stages']]
+            self.assertNotIn('serialization', stages)
+            self.assertNotIn('smoothing', stages)
+
+            self.assertIs(result.records, result.records)
+            self.assertIs(result.series, result.series)
+            self.assertEqual(len(result.records), 300)
+
+    def test_tuple_shim_matches_result(self):
+        for engine in ('vectorized', 'reference'):
+            df = readings()
+            expected = process_mold_index(df.copy(), engine=engine)
+            result = compute_mould_result(df.copy(), engine=engine)
+            mould_index, series, timeframe, records = result
+            self.assertEqual((mould_index, series, timeframe, records), expected)
+            self.assertEqual(result.series_columns['mould_index'], [point['mould_index'] for point in series])
+
+    def test_mould_score_takes_the_result(self):
+        df = readings()
+        result = compute_mould_result(df.copy())
+        self.assertEqual(mould_score(result), mould_score(result.mould_index, df.copy()))
+        self.assertIs(mould_score(result), result.score)
+        self.assertEqual(result.current_humidity, df['humidity'].iloc[-1])
+
+    def test_failures_return_none(self):
+        bad = pd.DataFrame({'time': ['not a date'], 'temperature': ['x'], 'humidity': ['y']})
+        self.assertIsNone(compute_mould_result(bad))
+        self.assertEqual(process_mold_index(bad), (None, [], "No data", []))
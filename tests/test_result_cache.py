@@ -0,0 +1,77 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+import os
+import tempfile
+from mould_calculator import cache
+from mould_calculator.cache import DiskLRU, get_result_cache, result_key
+from mould_calculator.models import MouldAnalysis
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-01 {h:02d}:00,22,{85 + h % 5}" for h in range(24)
+)
+
+class ResultCacheTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self):
+        return self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile('readings.csv', CSV.encode(), content_type='text/csv'),
+        })
+
+    def test_repeat_result_views_hit_the_cache(self):
+        user = User.objects.create_user('alice', password='pw-123456')
+        self.client.force_login(user)
+        self.assertEqual(self.upload().status_code, 302)
+
+        analysis = MouldAnalysis.objects.get(user=user)
+        self.assertEqual(len(analysis.content_hash), 64)
+
+        with mock.patch('mould_calculator.cache.analyse_file') as analyse:
+            for _ in range(3):
+                response = self.client.get(f'/result/?dataset_id={analysis.id}')
+                self.assertEqual(response.status_code, 200)
+            analyse.assert_not_called()
+        self.assertEqual(get_result_cache().stats['memory_hits'], 3)
+
+    def test_anonymous_upload_is_cached(self):
+        self.upload()
+        stats = get_result_cache().stats
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+        self.assertEqual(stats['memory_hits'], 1)
+
+    def test_disk_tier_is_shared_and_versioned(self):
+        directory = os.path.join(self.tmp.name, 'disk')
+        DiskLRU(directory, 1024).set('ab' * 32, {'mould_index': 1.0})
+        self.assertEqual(DiskLRU(directory, 1024).get('ab' * 32), {'mould_index': 1.0})
+
+        # a new algorithm version drops the old entries
+        DiskLRU(directory, 1024, version=cache.ALGORITHM_VERSION + 1)
+        self.assertIsNone(DiskLRU(directory, 1024).get('ab' * 32))
+
+    def test_disk_tier_evicts_by_size(self):
+        disk = DiskLRU(os.path.join(self.tmp.name, 'disk'), max_bytes=2000)
+        for i in range(20):
+            disk.set(f"{i:064d}", {'payload': 'x' * 200})
+        self.assertLessEqual(disk._scan_size(), 2000)
+        self.assertIsNotNone(disk.get(f"{19:064d}"))
+        self.assertIsNone(disk.get(f"{0:064d}"))
+
+    def test_key_depends_on_parameters(self):
+        self.assertNotEqual(result_key('abc'), result_key('abc', rolling_window=7))
@@ -0,0 +1,175 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from datetime import date
+import io
+from unittest import mock
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from mould_calculator import rollups
+from mould_calculator.models import AnalysisRollup, MouldAnalysis
+from mould_calculator.rollups import combine_rollups, compute_rollups, reading_frame
+from mould_calculator.ingest import stream_to_sidecar
+from mould_calculator.sidecar import load_series, load_standardized
+from mould_calculator.utils import analyse_dataframe, standardize_dataframe
+
+def readings(days=10, start='2025-01-01', humidity=None):
+    times = pd.date_range(start, periods=days * 24, freq='h')
+    return pd.DataFrame({
+        'Timestamp': times,
+        'Temperature': 20.0,
+        #humid from 06:00 to 17:59, dry at night
+        'Humidity': humidity if humidity is not None else np.where((times.hour >= 6) & (times.hour < 18), 90.0, 60.0),
+    })
+
+class RollupTests(TestCase):
+    def test_reading_frame_ends_at_the_analysed_index(self):
+        df = readings()
+        frame = reading_frame(standardize_dataframe(df.copy()))
+        self.assertEqual(len(frame), len(df))
+        self.assertAlmostEqual(frame['M'].iloc[-1] / 6 * 100, analyse_dataframe(df)['mould_index'])
+
+    def test_daily_and_weekly_rollups(self):
+        rollups = compute_rollups(reading_frame(standardize_dataframe(readings())))
+
+        days = rollups['day']
+        self.assertEqual(len(days), 10)
+        first = days.loc[date(2025, 1, 1)]
+        self.assertEqual(first['readings'], 24)
+        self.assertEqual((first['rh_min'], first['rh_max'], first['rh_mean']), (60, 90, 75))
+        #RH_crit is 80 at 20 °C: the twelve humid hours count
+        self.assertEqual(first['hours_above_rh_crit'], 12)
+        self.assertLessEqual(first['m_min'], first['m_mean'])
+
+        weeks = rollups['week']
+        #2025-01-01 is a Wednesday; weeks start on Monday
+        self.assertEqual(list(weeks.index), [date(2024, 12, 30), date(2025, 1, 6)])
+        self.assertEqual(weeks['readings'].tolist(), [5 * 24, 5 * 24])
+        self.assertEqual(weeks['m_max'].max(), days['m_max'].max())
+
+class StoredRollupTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+        self.user = User.objects.create_user('alice', password='pw-123456')
+        self.client.force_login(self.user)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self, df, name='r.csv'):
+        self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile(name, df.to_csv(index=False).encode(), content_type='text/csv'),
+        })
+        return MouldAnalysis.objects.filter(user=self.user).latest('id')
+
+    def test_upload_stores_series_and_rollups(self):
+        analysis = self.upload(readings())
+        self.assertEqual(analysis.rollups.filter(period='day').count(), 10)
+        self.assertEqual(analysis.rollups.filter(period='week').count(), 2)
+
+        timestamps, mould_index = load_series(analysis.file.path)
+        self.assertEqual(len(timestamps), 240)
+        self.assertAlmostEqual(float(mould_index[-1]) / 6 * 100, analysis.mould_index, places=4)
+
+    def test_compare_analyses_over_a_range(self):
+        damp = self.upload(readings(humidity=95.0), 'damp.csv')
+        dry = self.upload(readings(humidity=50.0), 'dry.csv')
+        other = User.objects.create_user('bob', password='pw-123456')
+        foreign = MouldAnalysis.objects.create(user=other, filename='x.csv', file='uploads/x.csv', temperature=0,
+                                               humidity=0, mould_index=0, risk_level='Low', risk_message='')
+
+        response = self.client.get('/analyses/rollups/', {
+            'ids': f'{damp.id},{dry.id},{foreign.id}', 'start': '2025-01-03', 'end': '2025-01-05',
+        })
+        payload = response.json()
+        self.assertEqual(set(payload['analyses']), {str(damp.id), str(dry.id)})
+        damp_days = payload['analyses'][str(damp.id)]
+        self.assertEqual(damp_days['start'], ['2025-01-03', '2025-01-04', '2025-01-05'])
+        self.assertEqual(damp_days['hours_above_rh_crit'], [24, 24, 24])
+        self.assertEqual(payload['analyses'][str(dry.id)]['hours_above_rh_crit'], [0, 0, 0])
+
+        weekly = self.client.get('/analyses/rollups/', {'ids': damp.id, 'period': 'week'}).json()
+        self.assertEqual(len(weekly['analyses'][str(damp.id)]['start']), 2)
+        self.assertEqual(self.client.get('/analyses/rollups/', {'ids': damp.id, 'period': 'month'}).status_code, 400)
+        self.assertEqual(self.client.get('/analyses/rollups/', {'ids': 'a'}).status_code, 400)
+
+    def test_resampled_upload_simulates_once(self):
+        df = readings(humidity=80 + 15 * np.sin(np.arange(240) / 7))
+        with override_settings(MOULD_RESAMPLE={'INTERVAL_MINUTES': 180}), \
+                mock.patch('mould_calculator.rollups.mould_index_trajectory',
+                           wraps=rollups.mould_index_trajectory) as simulated, \
+                mock.patch('mould_calculator.utils.mould_index_trajectory', side_effect=AssertionError("twice")):
+            analysis = self.upload(df)
+        self.assertEqual(simulated.call_count, 1)
+
+        timestamps, mould_index = load_series(analysis.file.path)
+        self.assertEqual(len(mould_index), 80)
+        self.assertEqual(int(timestamps[1] - timestamps[0]), 3 * 3600 * 10**9)
+        self.assertAlmostEqual(float(mould_index[-1]) / 6 * 100, analysis.mould_index, places=4)
+        self.assertEqual(sum(row.readings for row in analysis.rollups.filter(period='day')), 80)
+
+    def test_backfill_rollups(self):
+        analysis = self.upload(readings())
+        AnalysisRollup.objects.all().delete()
+        out = io.StringIO()
+        call_command('backfill_rollups', stdout=out)
+        self.assertIn("Built rollups for 1 analyses", out.getvalue())
+        self.assertEqual(analysis.rollups.count(), 12)
+
+    def test_backfill_reuses_the_stored_series(self):
+        analysis = self.upload(readings())
+        expected = {(row.period, row.start): row.m_mean for row in analysis.rollups.all()}
+        AnalysisRollup.objects.all().delete()
+        with mock.patch('mould_calculator.rollups.mould_index_trajectory', side_effect=AssertionError("simulated")):
+            call_command('backfill_rollups', stdout=io.StringIO())
+        for row in analysis.rollups.all():
+            self.assertAlmostEqual(row.m_mean, expected[(row.period, row.start)], places=5)
+
+    def test_large_upload_is_streamed_into_the_sidecar(self):
+        df = readings(humidity=80 + 15 * np.sin(np.arange(240) / 7))
+        with override_settings(MOULD_STREAMING_THRESHOLD=0, MOULD_INGEST_CHUNKSIZE=50), \
+                mock.patch('mould_calculator.uploads.series_readings', side_effect=AssertionError("read whole")):
+            analysis = self.upload(df)
+
+        standardized = standardize_dataframe(df.copy())
+        frame = reading_frame(standardized)
+        self.assertAlmostEqual(analysis.mould_index, analyse_dataframe(df)['mould_index'], places=6)
+        pd.testing.assert_frame_equal(load_standardized(analysis.file.path).reset_index(drop=True),
+                                      standardized.reset_index(drop=True))
+        _, mould_index = load_series(analysis.file.path)
+        np.testing.assert_allclose(mould_index, frame['M'], rtol=1e-6)
+        days = compute_rollups(frame)['day']
+        stored = analysis.rollups.filter(period='day').order_by('start')
+        self.assertEqual([row.start for row in stored], list(days.index))
+        for row, (_, expected) in zip(stored, days.iterrows()):
+            self.assertEqual(row.readings, expected['readings'])
+            self.assertAlmostEqual(row.m_mean, expected['m_mean'], places=6)
+            self.assertAlmostEqual(row.rh_max, expected['rh_max'])
+            self.assertAlmostEqual(row.hours_above_rh_crit, expected['hours_above_rh_crit'])
+
+    def test_streamed_window_and_combined_rollups(self):
+        df = readings(humidity=80 + 15 * np.sin(np.arange(240) / 7))
+        path = os.path.join(self.tmp.name, 'window.csv')
+        df.to_csv(path, index=False)
+        summary, rollups = stream_to_sidecar(path, rolling_window=3, chunksize=37)
+        frame = reading_frame(standardize_dataframe(df.copy()), rolling_window=3)
+        self.assertAlmostEqual(summary['mould_index'], analyse_dataframe(df, 3)['mould_index'], places=6)
+        self.assertEqual(len(load_series(path)[1]), len(frame))
+        for period, table in compute_rollups(frame).items():
+            pd.testing.assert_frame_equal(rollups[period], table, check_dtype=False, check_index_type=False)
+        halves = combine_rollups(compute_rollups(frame.iloc[:30]), compute_rollups(frame.iloc[30:]))
+        pd.testing.assert_frame_equal(halves['day'], compute_rollups(frame)['day'], check_dtype=False,
+                                      check_index_type=False)
@@ -0,0 +1,42 @@
+from django.test import TestCase
+import pandas as pd
+from mould_calculator.schema import clear_schema_cache, resolve_schema, schema_cache_stats
+from mould_calculator.utils import is_standardized, standardize_dataframe
+
+class SchemaCacheTests(TestCase):
+    def setUp(self):
+        clear_schema_cache()
+
+    def make_df(self, stamps):
+        return pd.DataFrame({
+            'Local Date/Time': stamps,
+            'Temp (°C)': [20.5] * len(stamps),
+            'RH (%)': [81.0] * len(stamps),
+        })
+
+    def test_same_header_resolves_once(self):
+        standardize_dataframe(self.make_df(['2025-01-01 00:00', '2025-01-01 01:00']))
+        standardize_dataframe(self.make_df(['2025-01-02 00:00', '2025-01-02 01:00']))
+        self.assertEqual(schema_cache_stats, {'hits': 1, 'misses': 1})
+
+        df = self.make_df(['2025-01-01 00:00'])
+        df.columns = df.columns.str.lower()
+        schema = resolve_schema(df)
+        self.assertEqual((schema.timestamp, schema.temperature, schema.humidity),
+                         ('local date/time', 'temp (°c)', 'rh (%)'))
+        self.assertEqual(schema.datetime_format, '%Y-%m-%d %H:%M')
+
+    def test_format_change_falls_back_to_inference(self):
+        standardize_dataframe(self.make_df(['2025-01-01 00:00', '2025-01-01 01:00']))
+        std = standardize_dataframe(self.make_df(['2025-01-01T00:00:00', '2025-01-01T01:00:00']))
+        self.assertEqual(std['Timestamp'].iloc[1], pd.Timestamp('2025-01-01 01:00'))
+
+        df = self.make_df(['2025-01-01 00:00'])
+        df.columns = df.columns.str.lower()
+        self.assertIsNone(resolve_schema(df).datetime_format)
+
+    def test_standardized_frame_is_passed_through(self):
+        std = standardize_dataframe(self.make_df(['2025-01-01 01:00', '2025-01-01 00:00']))
+        self.assertTrue(is_standardized(std))
+        self.assertIs(standardize_dataframe(std), std)
+        self.assertEqual(list(std['Timestamp']), sorted(std['Timestamp']))
@@ -0,0 +1,159 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+import io
+import json
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from mould_calculator.__main__ import main
+from mould_calculator.batch import analyse_batch
+from mould_calculator.cache import get_result_cache
+from mould_calculator.ingest import analyse_file
+from mould_calculator.models import MouldAnalysis
+from mould_calculator.engine import mould_index_matrix, mould_index_trajectory
+from mould_calculator.schema import clear_schema_cache, resolve_schema
+from mould_calculator.utils import process_mold_index, process_sensors, sensor_matrices, standardize_dataframe
+
+class MultiSensorTests(TestCase):
+    """
+    Sensors simulated together as a matrix must match one process_mold_index run per sensor.
+    """
+    def setUp(self):
+        clear_schema_cache()
+
+    def make_long_df(self, sensors, rows=300, seed=0):
+        rng = np.random.default_rng(seed)
+        times = pd.date_range('2025-01-01', periods=rows, freq='30min')
+        frames = [pd.DataFrame({
+            'Device ID': sensor,
+            'Timestamp': times,
+            'Temperature': (17 + rng.normal(0, 2, rows)).round(1),
+            'Humidity': (70 + 10 * i + rng.normal(0, 4, rows)).round(1),
+        }) for i, sensor in enumerate(sensors)]
+        #readings of all sensors interleaved, as exported
+        return pd.concat(frames).sample(frac=1, random_state=seed).reset_index(drop=True)
+
+    def test_sensor_column_is_detected(self):
+        df = self.make_long_df(['a'], rows=5)
+        df.columns = df.columns.str.lower()
+        self.assertEqual(resolve_schema(df).sensor, 'device id')
+        self.assertIn('Sensor', standardize_dataframe(df).columns)
+
+    def test_matrix_matches_single_trajectories(self):
+        rng = np.random.default_rng(1)
+        rh = rng.normal(85, 8, (200, 4))
+        temp = rng.normal(15, 4, (200, 4))
+        deltas = np.full(200, 0.5)
+        matrix = mould_index_matrix(rh, temp, deltas, 48)
+        for column in range(4):
+            np.testing.assert_allclose(matrix[:, column],
+                                       mould_index_trajectory(rh[:, column], temp[:, column], deltas, 48),
+                                       rtol=0, atol=1e-12)
+
+    def test_process_sensors_matches_per_sensor_runs(self):
+        df = self.make_long_df(['s1', 's2', 's3'])
+        results = process_sensors(df.copy())
+        self.assertEqual(list(results), ['s1', 's2', 's3'])
+
+        for sensor, result in results.items():
+            single = df[df['Device ID'] == sensor].drop(columns='Device ID')
+            mould_index, series, used_timeframe, _ = process_mold_index(single)
+            self.assertAlmostEqual(result['mould_index'], mould_index, places=9)
+            self.assertEqual(result['used_timeframe'], used_timeframe)
+            self.assertEqual(result['series'], series)
+
+    def test_sensors_on_different_grids_are_grouped_separately(self):
+        df = self.make_long_df(['s1', 's2', 's3'])
+        #s3 misses some readings, so it can't share the matrix
+        df = df.drop(df[df['Device ID'] == 's3'].index[:10])
+        df.columns = df.columns.str.lower()
+        groups = sensor_matrices(standardize_dataframe(df))
+        self.assertEqual(sorted(list(group.sensors) for group in groups), [['s1', 's2'], ['s3']])
+        self.assertEqual(groups[0].temperature.shape, (300, 2))
+
+    def test_no_sensor_column(self):
+        df = pd.DataFrame({'Timestamp': pd.date_range('2025-01-01', periods=5, freq='h'),
+                           'Temperature': 20.0, 'Humidity': 80.0})
+        self.assertIsNone(process_sensors(df))
+
+    def test_sparse_serial_column_is_metadata(self):
+        #a single-logger export with its serial number filled in on the first row only
+        df = pd.DataFrame({'Timestamp': pd.date_range('2025-01-01', periods=24, freq='h').strftime('%Y-%m-%d %H:%M'),
+                           'Temperature': 20.0, 'Humidity': 95.0, 'Serial': ['SN-0042'] + [None] * 23})
+        standardized = standardize_dataframe(df.copy())
+        self.assertEqual(len(standardized), 24)
+        self.assertNotIn('Sensor', standardized.columns)
+        mould_index, _, _, _ = process_mold_index(df)
+        self.assertAlmostEqual(mould_index, 5.333, places=3)
+
+    def test_long_format_keeps_readings_without_id_out_of_sensors(self):
+        df = self.make_long_df(['s1', 's2'], rows=10)
+        df.loc[0, 'Device ID'] = None
+        df.columns = df.columns.str.lower()
+        standardized = standardize_dataframe(df)
+        self.assertEqual(len(standardized), 20)
+        groups = sensor_matrices(standardized)
+        self.assertEqual(sum(len(group.timestamps) * len(group.sensors) for group in groups), 19)
+
+
+class MultiSensorFileTests(TestCase):
+    """
+    Files with a sensor/device id column are analysed per sensor by every entry point.
+    """
+    def setUp(self):
+        clear_schema_cache()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+        times = pd.date_range('2025-01-01', periods=240, freq='h')
+        #a damp cellar and a dry living room, interleaved
+        self.df = pd.concat([
+            pd.DataFrame({'Timestamp': times, 'Sensor ID': 'cellar', 'Temperature': 18.0, 'Humidity': 95.0}),
+            pd.DataFrame({'Timestamp': times, 'Sensor ID': 'living', 'Temperature': 21.0, 'Humidity': 45.0}),
+        ]).sort_values('Timestamp', kind='stable')
+        self.path = os.path.join(self.tmp.name, 'sensors.csv')
+        self.df.to_csv(self.path, index=False)
+        self.expected = process_sensors(self.df.copy(), with_series=False)
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_upload_scores_the_sensor_at_highest_risk(self):
+        user = User.objects.create_user('alice', password='pw-123456')
+        self.client.force_login(user)
+        with open(self.path, 'rb') as f:
+            self.client.post('/uploadpage/', {'file': SimpleUploadedFile('sensors.csv', f.read(), content_type='text/csv')})
+        analysis = MouldAnalysis.objects.get(user=user)
+        self.assertAlmostEqual(analysis.mould_index, self.expected['cellar']['mould_index'], places=6)
+        self.assertEqual(analysis.humidity, 95.0)
+        self.assertEqual(analysis.rollups.filter(period='day').count(), 10)
+        self.assertEqual(analysis.rollups.filter(period='day').first().rh_max, 95.0)
+
+        #without the cached summary the result is analysed per sensor again, not from the sidecar's readings
+        get_result_cache().clear()
+        summary = analyse_file(analysis.file.path)
+        self.assertEqual(summary['worst_sensor'], 'cellar')
+        self.assertAlmostEqual(summary['sensors']['living']['mould_index'], self.expected['living']['mould_index'])
+        self.assertEqual(self.client.get('/result/').status_code, 200)
+
+    def test_batch_and_cli_analyse_per_sensor(self):
+        batch = analyse_batch([self.path], processes=1)
+        self.assertEqual(batch['sensors'][0]['worst_sensor'], 'cellar')
+        self.assertEqual(set(batch['sensors'][0]['sensors']), {'cellar', 'living'})
+
+        out = io.StringIO()
+        self.assertEqual(main([self.path], stdout=out), 0)
+        result = json.loads(out.getvalue())[0]
+        self.assertEqual(result['worst_sensor'], 'cellar')
+        self.assertAlmostEqual(result['mould_index'], self.expected['cellar']['mould_index'])
@@ -0,0 +1,103 @@
+from django.test import TestCase, override_settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from unittest import mock
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+from mould_calculator import series
+from mould_calculator.series import build_pyramid, build_series, lttb, query_pyramid
+from mould_calculator.utils import process_mold_index, standardize_dataframe
+
+def readings(rows, freq='10min'):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'Timestamp': pd.date_range('2025-01-01', periods=rows, freq=freq),
+        'Temperature': (18 + rng.normal(0, 2, rows)).round(1),
+        'Humidity': (82 + 8 * np.sin(np.arange(rows) / 200)).round(1),
+    })
+
+class SeriesTests(TestCase):
+    def test_series_matches_process_mold_index(self):
+        df = readings(500)
+        _, expected, _, _ = process_mold_index(df.copy())
+        full = build_series(standardize_dataframe(df))
+        self.assertEqual(full['mould_index'].tolist(), [point['mould_index'] for point in expected])
+        self.assertEqual(full['t'][0], int(pd.Timestamp('2025-01-01').timestamp()))
+
+    def test_lttb_keeps_endpoints_and_peaks(self):
+        x = np.arange(1000)
+        y = np.zeros(1000)
+        y[437] = 10
+        picked = lttb(x, y, 50)
+        self.assertEqual(len(picked), 50)
+        self.assertEqual((picked[0], picked[-1]), (0, 999))
+        self.assertIn(437, picked)
+        self.assertTrue((np.diff(picked) > 0).all())
+
+    def test_pyramid_levels_keep_extremes(self):
+        full = build_series(standardize_dataframe(readings(20_000)))
+        pyramid = build_pyramid(full)
+        self.assertEqual(len(pyramid['L1_t']), 5000)
+        top = max(int(key[1:-2]) for key in pyramid if key.endswith('_t'))
+        self.assertLessEqual(len(pyramid[f'L{top}_t']), series.MIN_LEVEL_POINTS)
+        self.assertEqual(pyramid[f'L{top}_humidity_max'].max(), full['humidity'].max())
+        self.assertEqual(pyramid[f'L{top}_temperature_min'].min(), full['temperature'].min())
+
+    def test_query_range_and_point_budget(self):
+        full = build_series(standardize_dataframe(readings(20_000)))
+        pyramid = build_pyramid(full)
+
+        overview = query_pyramid(pyramid, points=300)
+        self.assertLessEqual(len(overview['t']), 300)
+        self.assertGreater(overview['level'], 0)
+        self.assertEqual(max(overview['humidity']['max']), full['humidity'].max())
+
+        start, end = int(full['t'][1000]), int(full['t'][1100])
+        zoomed = query_pyramid(pyramid, start, end, points=300)
+        self.assertEqual(zoomed['level'], 0)
+        self.assertEqual(zoomed['t'], full['t'][1000:1101].tolist())
+
+        picked = query_pyramid(pyramid, start, end, points=20, method='lttb')
+        self.assertEqual(len(picked['t']), 20)
+        self.assertEqual(len(picked['temperature']), 20)
+
+class SeriesEndpointTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def test_series_endpoint(self):
+        self.assertEqual(self.client.get('/result/series/').status_code, 404)
+        csv = readings(2000).to_csv(index=False)
+        self.client.post('/uploadpage/', {'file': SimpleUploadedFile('r.csv', csv.encode(), content_type='text/csv')})
+
+        payload = self.client.get('/result/series/?points=100').json()
+        self.assertLessEqual(len(payload['t']), 100)
+        self.assertEqual(set(payload['mould_index']), {'min', 'max'})
+        self.assertIsInstance(payload['t'][0], int)
+
+        self.assertEqual(self.client.get('/result/series/?method=spline').status_code, 400)
+        self.assertEqual(self.client.get('/result/series/?points=lots').status_code, 400)
+
+    def test_pyramid_is_built_from_the_stored_series(self):
+        df = readings(2000)
+        self.client.post('/uploadpage/', {'file': SimpleUploadedFile('r.csv', df.to_csv(index=False).encode(),
+                                                                     content_type='text/csv')})
+        with mock.patch('mould_calculator.series.mould_index_trajectory', side_effect=AssertionError("simulated")):
+            payload = self.client.get('/result/series/?points=5000&method=lttb').json()
+        expected = build_series(standardize_dataframe(df))['mould_index']
+        np.testing.assert_allclose(payload['mould_index'], expected, rtol=1e-5)
@@ -0,0 +1,70 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from io import StringIO
+from unittest import mock
+import os
+import pandas as pd
+import tempfile
+from mould_calculator.ingest import analyse_file, read_standardized
+from mould_calculator.models import MouldAnalysis
+from mould_calculator.sidecar import load_standardized, remove_sidecar, sidecar_meta, write_sidecar
+from mould_calculator.utils import analyse_dataframe
+
+CSV = "Timestamp,Temperature,Humidity\n" + "\n".join(
+    f"2025-01-01 {h:02d}:{m:02d}:00+01:00,{19 + m / 30:.1f},{80 + h % 7}" for h in range(24) for m in (0, 30)
+)
+
+class SidecarTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'readings.csv')
+        with open(self.path, 'w') as f:
+            f.write(CSV)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_round_trip_matches_csv(self):
+        standardized = read_standardized(self.path)
+        self.assertTrue(write_sidecar(self.path, standardized))
+        loaded = load_standardized(self.path)
+
+        pd.testing.assert_series_equal(loaded['Timestamp'], standardized['Timestamp'].reset_index(drop=True))
+        self.assertEqual(analyse_dataframe(loaded), analyse_dataframe(pd.read_csv(self.path)))
+
+    def test_analyse_file_skips_csv_parsing_with_sidecar(self):
+        write_sidecar(self.path, read_standardized(self.path))
+        with mock.patch('mould_calculator.ingest.pd.read_csv') as read_csv:
+            summary = analyse_file(self.path)
+            read_csv.assert_not_called()
+        self.assertEqual(summary['risk_level'], analyse_dataframe(pd.read_csv(self.path))['risk_level'])
+
+    def test_stale_or_outdated_sidecar_is_ignored(self):
+        write_sidecar(self.path, read_standardized(self.path))
+        with open(self.path, 'a') as f:
+            f.write("\n2025-01-02 00:00:00+01:00,20.0,85")
+        self.assertIsNone(sidecar_meta(self.path))
+        self.assertIsNone(load_standardized(self.path))
+
+        write_sidecar(self.path, read_standardized(self.path))
+        with mock.patch('mould_calculator.sidecar.SIDECAR_VERSION', 2):
+            self.assertIsNone(load_standardized(self.path))
+
+    @override_settings(MOULD_RESULT_CACHE={'MEMORY_ENTRIES': 0})
+    def test_upload_writes_sidecar_and_backfill_rebuilds(self):
+        with override_settings(MEDIA_ROOT=self.tmp.name):
+            user = User.objects.create_user('bob', password='pw-123456')
+            self.client.force_login(user)
+            self.client.post('/uploadpage/', {
+                'file': SimpleUploadedFile('upload.csv', CSV.encode(), content_type='text/csv'),
+            })
+            analysis = MouldAnalysis.objects.get(user=user)
+            self.assertIsNotNone(sidecar_meta(analysis.file.path))
+
+            remove_sidecar(analysis.file.path)
+            out = StringIO()
+            call_command('backfill_sidecars', stdout=out)
+            self.assertIn("Built 1 sidecars", out.getvalue())
+            self.assertIsNotNone(load_standardized(analysis.file.path))
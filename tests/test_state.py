@@ -0,0 +1,53 @@
+from django.test import TestCase
+import json
+import numpy as np
+import pandas as pd
+from mould_calculator.state import MouldIndexState
+from mould_calculator.utils import process_mold_index
+
+class MouldIndexStateTests(TestCase):
+    """
+    Advancing a state in batches must match a single pass over all readings.
+    """
+    def make_df(self, rows, seed=0):
+        rng = np.random.default_rng(seed)
+        return pd.DataFrame({
+            'Timestamp': pd.date_range('2025-01-01', periods=rows, freq='10min'),
+            'Temperature': 18 + 6 * np.sin(np.arange(rows) / 40) + rng.normal(0, 1, rows),
+            'Humidity': 82 + 10 * np.sin(np.arange(rows) / 90) + rng.normal(0, 3, rows),
+        })
+
+    def test_from_frame_matches_process_mold_index(self):
+        df = self.make_df(rows=500)
+        state, series = MouldIndexState.from_frame(df.copy(), rolling_window=2)
+        final_pct, expected_series, _, _ = process_mold_index(df.copy(), rolling_window=2)
+
+        self.assertAlmostEqual(state.mould_index, final_pct, delta=1e-6)
+        self.assertEqual(series, expected_series)
+
+    def test_advance_in_batches_matches_single_pass(self):
+        df = self.make_df(rows=1000, seed=3)
+        single = MouldIndexState(window_points=144, default_time_delta_hours=1 / 6)
+        single_series = single.advance(df)
+
+        state = MouldIndexState(window_points=144, default_time_delta_hours=1 / 6)
+        batched_series = []
+        for start in range(0, len(df), 70):
+            # round-trip through JSON between batches, as a stored state would
+            state = MouldIndexState.from_dict(json.loads(json.dumps(state.to_dict())))
+            batched_series += state.advance(df.iloc[start:start + 70])
+
+        self.assertAlmostEqual(state.M, single.M, delta=1e-9)
+        self.assertEqual(len(batched_series), len(single_series))
+        for a, b in zip(batched_series, single_series):
+            self.assertEqual(a['timestamp'], b['timestamp'])
+            self.assertAlmostEqual(a['mould_index'], b['mould_index'], delta=0.01 + 1e-9)
+
+    def test_advance_skips_already_processed_readings(self):
+        df = self.make_df(rows=100)
+        state = MouldIndexState(window_points=50)
+        state.advance(df)
+        M = state.M
+        self.assertEqual(state.advance(df.iloc[-10:]), [])
+        self.assertEqual(state.M, M)
+        self.assertEqual(state.rows_processed, 100)
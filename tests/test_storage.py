@@ -0,0 +1,104 @@
+from django.test import TestCase, override_settings
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from io import StringIO
+import json
+import os
+import tempfile
+import time
+from mould_calculator.models import AnalysisJob, MouldAnalysis
+from mould_calculator.sidecar import sidecar_dir
+from mould_calculator.storage import enforce_user_quota, path_size, sweep_storage, sweep_temp
+
+CSV = "time,temperature,humidity\n" + "\n".join(
+    f"2025-01-{1 + h // 24:02d} {h % 24:02d}:00,22,{85 + h % 5}" for h in range(24 * 5)
+)
+
+class StorageLifecycleTests(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.tmp.name,
+            MOULD_SERIES_DIR=os.path.join(self.tmp.name, 'series'),
+            MOULD_RESULT_CACHE={
+                'MEMORY_ENTRIES': 8,
+                'DIRECTORY': os.path.join(self.tmp.name, 'cache'),
+                'MAX_BYTES': 1024 * 1024,
+            },
+        )
+        self.settings_override.enable()
+        self.temp = os.path.join(self.tmp.name, 'temp')
+
+    def tearDown(self):
+        self.settings_override.disable()
+        self.tmp.cleanup()
+
+    def upload(self, content=CSV, name='readings.csv'):
+        return self.client.post('/uploadpage/', {
+            'file': SimpleUploadedFile(name, content.encode(), content_type='text/csv'),
+        })
+
+    def temp_uploads(self):
+        return [name for name in os.listdir(self.temp) if not name.endswith('.mould')]
+
+    def age(self, path, seconds):
+        then = time.time() - seconds
+        os.utime(path, (then, then))
+
+    def test_authenticated_uploads_are_moved_and_deduplicated(self):
+        user = User.objects.create_user('owner', password='pw-123456')
+        self.client.force_login(user)
+        self.upload()
+        self.upload(name='again.csv')
+        first, second = MouldAnalysis.objects.order_by('id')
+        self.assertEqual(first.file.name, second.file.name)
+        self.assertTrue(os.path.exists(first.file.path))
+        self.assertTrue(os.path.isdir(sidecar_dir(first.file.path)))
+        self.assertEqual(os.listdir(self.temp), [])
+
+    def test_expired_temp_uploads_are_swept(self):
+        self.upload()
+        self.upload(name='queued.csv')
+        old, queued = sorted(self.temp_uploads(), key=lambda name: 'queued' in name)
+        for name in (old, queued):
+            self.age(os.path.join(self.temp, name), 7200)
+        AnalysisJob.objects.create(filename='queued.csv', file_path=f'temp/{queued}', content_hash='x')
+        size = path_size(os.path.join(self.temp, old)) + path_size(sidecar_dir(os.path.join(self.temp, old)))
+
+        self.assertEqual(sweep_temp(3600, dry_run=True), {'files': 1, 'bytes': size})
+        self.assertEqual(len(self.temp_uploads()), 2)
+        self.assertEqual(sweep_temp(3600), {'files': 1, 'bytes': size})
+        self.assertEqual(sorted(os.listdir(self.temp)), [queued, f'{queued}.mould'])
+        self.assertEqual(sweep_temp(3600)['files'], 0)
+
+    def test_user_quota_evicts_least_recently_used_artefacts(self):
+        user = User.objects.create_user('owner', password='pw-123456')
+        self.client.force_login(user)
+        self.upload()
+        self.upload(CSV.replace(',22,', ',23,'), name='other.csv')
+        older, newer = [analysis.file.path for analysis in MouldAnalysis.objects.order_by('id')]
+        self.age(sidecar_dir(older), 600)
+        originals = path_size(older) + path_size(newer)
+
+        reclaimed = enforce_user_quota(user.id, quota=originals + path_size(sidecar_dir(newer)))
+        self.assertEqual(reclaimed['files'], 1)
+        self.assertFalse(os.path.exists(sidecar_dir(older)))
+        self.assertTrue(os.path.exists(sidecar_dir(newer)))
+        #the uploads themselves are never evicted
+        self.assertEqual(enforce_user_quota(user.id, quota=0)['files'], 1)
+        self.assertTrue(os.path.exists(older) and os.path.exists(newer))
+
+    def test_sweep_reports_reclaimed_space(self):
+        self.upload()
+        self.age(os.path.join(self.temp, self.temp_uploads()[0]), 7200)
+        with override_settings(MOULD_STORAGE={'TEMP_TTL': 3600, 'GLOBAL_QUOTA_BYTES': 0}):
+            report = sweep_storage(dry_run=True)
+            self.assertEqual(report['temp']['files'], 1)
+            self.assertGreater(report['reclaimed_bytes'], 0)
+            out = StringIO()
+            call_command('sweep_storage', '--json', stdout=out)
+        report = json.loads(out.getvalue())
+        self.assertEqual(report['used_after'], 0)
+        self.assertEqual(report['reclaimed_bytes'], report['used_before'])
+        self.assertEqual(os.listdir(self.temp), [])
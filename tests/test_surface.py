@@ -0,0 +1,81 @@
+from django.test import TestCase
+import json
+import time
+from unittest import mock
+import numpy as np
+import pandas as pd
+from mould_calculator.surface import risk_cube, risk_surface
+from mould_calculator.utils import process_mold_index
+
+def constant_readings(temp, rh, days):
+    rows = days * 24
+    return pd.DataFrame({
+        'time': pd.date_range('2025-01-01', periods=rows, freq='h'),
+        'temperature': [temp] * rows,
+        'humidity': [rh] * rows,
+    })
+
+class RiskSurfaceTests(TestCase):
+    def test_cells_match_process_mold_index(self):
+        scenarios = [(15, 40, 3), (15, 90, 5), (20, 85, 30), (25, 70, 10), (30, 95, 2), (5, 75, 4), (0, 69, 30)]
+        temps = sorted({temp for temp, _, _ in scenarios})
+        rhs = sorted({rh for _, rh, _ in scenarios})
+        days = sorted({d for _, _, d in scenarios})
+        cube = risk_cube(temps, rhs, days)
+        self.assertEqual(cube.shape, (len(days), len(temps), len(rhs)))
+        for temp, rh, d in scenarios:
+            expected, _, _, _ = process_mold_index(constant_readings(temp, rh, d))
+            self.assertAlmostEqual(cube[days.index(d), temps.index(temp), rhs.index(rh)], expected, places=9)
+
+    def test_large_grid_is_fast_and_memoized(self):
+        risk_surface.cache_clear()
+        start = time.perf_counter()
+        surface = risk_surface(0, 35, 100, 40, 100, 100, tuple(range(1, 31)))
+        self.assertLess(time.perf_counter() - start, 1.0)
+        self.assertEqual(surface.mould_index.shape, (30, 100, 100))
+        self.assertIs(risk_surface(0, 35, 100, 40, 100, 100, tuple(range(1, 31))), surface)
+        self.assertFalse(surface.mould_index.flags.writeable)
+        #above RH_crit, longer exposure never lowers the index
+        self.assertTrue((np.diff(surface.mould_index[:, :, -1], axis=0) >= 0).all())
+        self.assertTrue((surface.mould_index >= 0).all() and (surface.mould_index <= 100).all())
+
+    def test_view_returns_heatmap(self):
+        response = self.client.get('/surface/', {'temp_steps': 8, 'rh_steps': 13, 'days': '1,30'})
+        self.assertEqual(response.status_code, 200)
+        payload = response.json()
+        self.assertEqual(len(payload['temperature']), 8)
+        self.assertEqual(payload['humidity'][0], 40)
+        self.assertEqual(payload['days'], [1, 30])
+        self.assertEqual(np.array(payload['mould_index']).shape, (2, 8, 13))
+
+    def test_view_rejects_bad_grids(self):
+        self.assertEqual(self.client.get('/surface/', {'rh_steps': 'many'}).status_code, 400)
+        self.assertEqual(self.client.get('/surface/', {'days': '-1'}).status_code, 400)
+        self.assertEqual(self.client.get('/surface/', {'temp_steps': 2000, 'rh_steps': 2000}).status_code, 400)
+        for bounds in ({'temp_min': 'nan'}, {'rh_max': 'inf'}, {'temp_steps': 'inf'}):
+            self.assertEqual(self.client.get('/surface/', bounds).status_code, 400)
+
+    def test_view_rejects_unbounded_simulations(self):
+        for step_hours in (0.0001, 0.01, 0.1):
+            with mock.patch('mould_calculator.surface.simulate', side_effect=AssertionError("simulated")):
+                response = self.client.get('/surface/', {'days': '3650', 'step_hours': step_hours})
+            self.assertEqual(response.status_code, 400)
+        self.assertEqual(self.client.get('/surface/', {'days': '30', 'step_hours': 0.25}).status_code, 200)
+
+    def test_library_bounds_steps_and_cells(self):
+        with self.assertRaises(ValueError):
+            risk_cube([20], [90], [3650], step_hours=0.01)
+        with self.assertRaises(ValueError):
+            risk_cube([20], [90], [3651 * 4], step_hours=1)
+        with self.assertRaises(ValueError):
+            risk_surface(0, 35, 1000, 40, 100, 1000, (1, 2))
+
+    def test_nan_axes_give_an_empty_surface(self):
+        cube = risk_cube([np.nan, np.nan], [80, np.nan, 95], [1, 7])
+        self.assertEqual(cube.shape, (2, 0, 2))
+        np.testing.assert_array_equal(risk_cube([20, np.nan], [90, np.nan], [7]), risk_cube([20], [90], [7]))
+
+        surface = risk_surface(np.nan, np.nan, 5, 40, 100, 7, (1,))
+        self.assertEqual(len(surface.temperature), 0)
+        self.assertEqual(surface.mould_index.shape, (1, 0, 7))
+        self.assertEqual(json.loads(json.dumps(surface.mould_index.tolist())), [[]])
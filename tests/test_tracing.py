@@ -0,0 +1,39 @@
+from django.test import TestCase
+import json
+import pandas as pd
+from mould_calculator.tracing import Trace, current_trace, tracing
+from mould_calculator.utils import process_mold_index
+
+class TracingTests(TestCase):
+    def make_df(self, rows=24):
+        return pd.DataFrame({
+            'time': pd.date_range('2025-01-01', periods=rows, freq='h'),
+            'temperature': [22] * rows,
+            'humidity': [90] * rows,
+        })
+
+    def test_tracing_is_off_by_default(self):
+        self.assertIsNone(current_trace())
+        idx, series, _, _ = process_mold_index(self.make_df())
+        self.assertIsInstance(idx, float)
+
+    def test_trace_records_stages_and_rows(self):
+        for engine in ('vectorized', 'reference'):
+            with tracing(Trace()) as trace:
+                process_mold_index(self.make_df(), engine=engine)
+            self.assertIsNone(current_trace())
+
+            stages = [s['stage'] for s in trace.summary()['stages']]
+            self.assertEqual(stages, ['standardize', 'windowing', 'simulation', 'smoothing', 'serialization'])
+            self.assertEqual(trace.summary()['stages'][0]['rows'], 24)
+
+            events = [json.loads(line) for line in trace.getvalue().splitlines()]
+            rows = [e for e in events if e['event'] == 'row' and e['stage'] == 'simulation']
+            self.assertEqual(len(rows), 24)
+
+    def test_trace_without_row_detail(self):
+        with tracing(Trace(rows=False)) as trace:
+            process_mold_index(self.make_df())
+        events = [json.loads(line) for line in trace.getvalue().splitlines()]
+        self.assertFalse(any(e['event'] == 'row' for e in events))
+        self.assertTrue(any(e['event'] == 'schema' for e in events))
@@ -0,0 +1,46 @@
+from django.test import TestCase
+import numpy as np
+import pandas as pd
+from mould_calculator.engine import rolling_means, rh_crit_array
+from mould_calculator.utils import process_mold_index, calculate_rh_crit
+
+class VectorizedEngineTests(TestCase):
+    """
+    The vectorized engine must reproduce the reference iterrows engine.
+    """
+    def make_df(self, rows, seed=0, freq_minutes=10):
+        rng = np.random.default_rng(seed)
+        # irregular sampling with occasional gaps
+        steps = rng.choice([1, 1, 1, 2, 6], size=rows) * freq_minutes
+        times = pd.Timestamp('2025-01-01') + pd.to_timedelta(np.cumsum(steps), unit='min')
+        return pd.DataFrame({
+            'Timestamp': times,
+            'Temperature (°C)': (18 + 6 * np.sin(np.arange(rows) / 40) + rng.normal(0, 1, rows)).round(1),
+            'RH (%)': (80 + 12 * np.sin(np.arange(rows) / 90) + rng.normal(0, 3, rows)).round(1),
+        })
+
+    def test_rolling_means_match_window_mean(self):
+        values = np.arange(10, dtype=float) ** 2
+        expected = [np.mean(values[max(0, i - 2):i + 1]) for i in range(10)]
+        np.testing.assert_allclose(rolling_means(values, 3), expected)
+
+    def test_rh_crit_array_matches_scalar(self):
+        temps = np.array([-5.0, 0.0, 12.5, 20.0, 20.1, 35.0])
+        expected = [calculate_rh_crit(t) for t in temps]
+        np.testing.assert_allclose(rh_crit_array(temps), expected)
+
+    def test_engines_agree(self):
+        for seed, rolling_window in [(0, None), (1, 2), (2, 1), (3, None)]:
+            df = self.make_df(rows=600, seed=seed)
+            ref = process_mold_index(df.copy(), rolling_window=rolling_window, engine='reference')
+            vec = process_mold_index(df.copy(), rolling_window=rolling_window, engine='vectorized')
+
+            self.assertAlmostEqual(ref[0], vec[0], delta=1e-6)
+            self.assertEqual(ref[2], vec[2])
+            self.assertEqual([p['timestamp'] for p in ref[1]], [p['timestamp'] for p in vec[1]])
+            for a, b in zip(ref[1], vec[1]):
+                self.assertAlmostEqual(a['mould_index'], b['mould_index'], delta=0.01 + 1e-9)
+
+    def test_unknown_engine_rejected(self):
+        with self.assertRaises(ValueError):
+            process_mold_index(self.make_df(rows=10), engine='numba')